@@ -12,7 +12,7 @@ REM --- Start browser ---
 start "" http://localhost:5000
 
 REM --- Run the server using the virtual environment Python explicitly ---
-..\myst_venv\Scripts\python.exe app.py
+..\myst_venv\Scripts\python.exe app.py --prod
 
 echo.
 echo Server stopped. Press any key to exit...
@@ -1,21 +1,213 @@
 import os
+import json
 import re
+import asyncio
+import bisect
+import functools
+import sys
+import time
 import shutil
+import mimetypes
+import tempfile
+import threading
 from collections import defaultdict
-from fastapi import FastAPI, File, Form, UploadFile, Request, Query, Body
-from fastapi.responses import JSONResponse, FileResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, UploadFile, Request, Query, Body, WebSocket
+from fastapi.responses import JSONResponse, FileResponse, Response, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Optional, List
-from git import Repo, GitCommandError
+from typing import Callable, Optional, List
+
+_IMPORT_STARTED = time.perf_counter()
 
 # ---------------------- CONFIG ----------------------
+# Default docs root; MYST_EDITOR_ROOTS (or --roots) points to a JSON file describing several roots
 DOCS_DIR = "docs"
-BASE_DIR = os.path.abspath("../../" + DOCS_DIR)
+REPO_DIR = "../../"
 STATIC_FOLDER = "../dist"
+SPHINX_SOURCE_DIR = os.path.abspath("../../sphinx/source")
+CONFIG_WATCH_INTERVAL = 2.0  # seconds between checks of the Sphinx JSON config files
+
+# docs_config lives next to conf.py so Sphinx and the editor share one loader
+sys.path.insert(0, SPHINX_SOURCE_DIR)
+import docs_config  # noqa: E402
+from coordination import FileLock, SharedCache  # noqa: E402
+from caches import cache_registry  # noqa: E402
+from docs_roots import DocsRoot, registry, current_root, use_root, reset_root  # noqa: E402
+from metrics import metrics, span, install_audit_hook  # noqa: E402
+from profiling import profiler, ProfilingMiddleware  # noqa: E402
+from pathguard import normalize_relative_path, safe_join, validate_paths, resolve_base  # noqa: E402
+from tree_payload import TreeJournal, flatten, encode_compact  # noqa: E402
+from object_store import read_pointer  # noqa: E402
+from remote_tracker import RemoteTracker  # noqa: E402
+from git_history import file_history, file_blame  # noqa: E402
+from collab_relay import CollabRelay  # noqa: E402
+from prefetch import AccessStats, Prefetcher, nearest_siblings  # noqa: E402
+from docs_checker import DocsChecker  # noqa: E402
+from export_bundle import BundleStore, Exporter  # noqa: E402
+from outline_index import OutlineIndex, read_heading_anchors  # noqa: E402
+
+docs_config_store = docs_config.get_config(SPHINX_SOURCE_DIR)
+
+
+def configure_roots(config_path: Optional[str] = None):
+    """Register the docs roots from a roots config file, or the single default root."""
+    registry.roots.clear()
+    registry.default_name = None
+    object_store_dir = os.environ.get("MYST_EDITOR_OBJECT_STORE") or None
+    if config_path:
+        registry.load_config(config_path, object_store_dir)
+    else:
+        registry.add(DocsRoot("default", REPO_DIR, DOCS_DIR, object_store_dir=object_store_dir))
+
+
+configure_roots(os.environ.get("MYST_EDITOR_ROOTS"))
+
+
+def configure_profiling():
+    """
+    Enable slow-request profiling when MYST_EDITOR_PROFILE_MS is set (threshold in ms).
+    MYST_EDITOR_PROFILE_MODE picks "sample" (default) or "cprofile".
+    """
+    threshold = os.environ.get("MYST_EDITOR_PROFILE_MS")
+    if not threshold:
+        profiler.disable()
+        return
+    profiler.configure(
+        os.path.join(registry.get().state_dir, "profiles"),
+        threshold_ms=float(threshold),
+        mode=os.environ.get("MYST_EDITOR_PROFILE_MODE", "sample"),
+    )
+
+
+configure_profiling()
+
+# Background cache warm-up after startup; disable with MYST_EDITOR_WARMUP=0 or --warmup off
+WARMUP_ON_STARTUP = os.environ.get("MYST_EDITOR_WARMUP", "1") != "0"
+# Add a Server-Timing header (route spans, git/fs call counts) to every response
+SERVER_TIMING = os.environ.get("MYST_EDITOR_SERVER_TIMING", "0") == "1"
+# Uploads of at least this many bytes go to the object store behind a pointer file; 0 disables.
+# Docs roots with a git remote need a shared store (MYST_EDITOR_OBJECT_STORE or "object_store"
+# in the roots config) that clones can reach; otherwise their uploads stay in git
+LARGE_FILE_THRESHOLD = int(os.environ.get("MYST_EDITOR_LARGE_FILE_THRESHOLD", "0"))
+# Background fetch of origin every N seconds (0 disables); commits fetch first only if the
+# last fetch is older than MYST_EDITOR_FETCH_MAX_AGE seconds
+remote_tracker = RemoteTracker(float(os.environ.get("MYST_EDITOR_FETCH_INTERVAL", "60")))
+REMOTE_MAX_AGE = float(os.environ.get("MYST_EDITOR_FETCH_MAX_AGE", "300"))
+# Pages warmed in the background after each opened page; 0 disables prefetching
+PREFETCH_LIMIT = int(os.environ.get("MYST_EDITOR_PREFETCH", "8"))
+
+
+def configure_cache_budget():
+    """
+    Global memory budget of all in-process caches (MYST_EDITOR_CACHE_BUDGET_MB, 0 = unlimited)
+    and how entries are picked for eviction across caches (MYST_EDITOR_CACHE_POLICY: lru or lfu).
+    """
+    budget_mb = os.environ.get("MYST_EDITOR_CACHE_BUDGET_MB")
+    cache_registry.configure(
+        budget=int(float(budget_mb) * 1024 * 1024) if budget_mb else None,
+        policy=os.environ.get("MYST_EDITOR_CACHE_POLICY"),
+    )
+
+
+configure_cache_budget()
+
+
+# ---------------------- STARTUP TIMING ----------------------
+startup_timings = {}  # phase name -> milliseconds, in the order the phases ran
+
+
+def record_phase(name: str, started: float) -> float:
+    """Store how long a startup phase took and return the current clock value."""
+    now = time.perf_counter()
+    startup_timings[name] = round((now - started) * 1000, 2)
+    return now
+
+
+def warm_up():
+    """Open the repo and prime the caches that the first requests would otherwise pay for."""
+    started = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        repo = get_repo()
+        t = record_phase("warmup.open_repo", t)
+        try:
+            repo.head.commit.tree
+        except ValueError:
+            pass  # empty repository
+        t = record_phase("warmup.head_tree", t)
+        shared_cache().purge_expired()
+        t = record_phase("warmup.shared_cache", t)
+        base_dir = current_root().base_dir
+        scan_dir(base_dir, base_dir, [".md"])
+        record_phase("warmup.docs_tree", t)
+    except Exception as e:
+        print(f"Warning: cache warm-up failed: {e}")
+    record_phase("warmup.total", started)
+    print("Startup breakdown (ms): " + ", ".join(f"{k}={v}" for k, v in startup_timings.items()))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    t = time.perf_counter()
+    install_audit_hook()
+    docs_config_store.refresh()
+    docs_config_store.start_watcher(CONFIG_WATCH_INTERVAL)
+    record_phase("lifespan.docs_config", t)
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="cache-warmup", daemon=True).start()
+    remote_tracker.start(registry)
+    yield
+    remote_tracker.stop()
+    docs_config_store.stop_watcher()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def select_docs_root(request: Request, call_next):
+    """Pick the docs root for this request from the X-Docs-Root header or ``root`` query parameter."""
+    name = request.headers.get("x-docs-root") or request.query_params.get("root")
+    try:
+        root = registry.get(name)
+    except KeyError:
+        return JSONResponse({"error": f"Unknown docs root: {name}"}, status_code=404)
+    token = use_root(root)
+    root.active_requests += 1
+    try:
+        return await call_next(request)
+    finally:
+        root.active_requests -= 1
+        reset_root(token)
+        root.enforce_budget()
+        registry.evict_idle()
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Per-route latency, body sizes and git/filesystem call counts for /metrics."""
+    stats, token = metrics.start()
+    started = time.perf_counter()
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        seconds = time.perf_counter() - started
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or ("/" if route is not None else "unmatched")
+        metrics.finish(
+            token, stats, route_path, request.method, status, seconds,
+            int(request.headers.get("content-length") or 0),
+            int(response.headers.get("content-length") or 0) if response is not None else 0,
+        )
+        if SERVER_TIMING and response is not None:
+            response.headers["Server-Timing"] = metrics.server_timing(stats, seconds)
 
-app = FastAPI()
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +217,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last, so it is the outermost middleware and a kept profile covers the whole request
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
 
 # ---------------------- MODELS ----------------------
 class PathModel(BaseModel):
@@ -38,97 +233,373 @@ class RenameModel(BaseModel):
     action: str = "check"  # "check" | "overwrite" | "increment"
 
 
+class BatchOperation(BaseModel):
+    op: str  # "create" | "delete" | "move" | "copy"
+    path: Optional[str] = None  # create / delete
+    type: Optional[str] = None  # create: "file" | "folder"
+    oldPath: Optional[str] = None  # move / copy source
+    newPath: Optional[str] = None  # move / copy destination
+    action: Optional[str] = None  # per-operation override of BatchRequest.action
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    action: str = "check"  # collision handling, same values as RenameModel.action
+    stage: bool = False  # stage every touched path with one `git add`
+
+
+class CacheAdminRequest(BaseModel):
+    caches: str = "*"  # glob over cache names, "<root>:<cache>" (e.g. "*:blobs")
+    max_mb: Optional[float] = None  # resize: new limit of each matching cache
+    budget_mb: Optional[float] = None  # resize: new global budget, 0 = unlimited
+    policy: Optional[str] = None  # resize: "lru" | "lfu"
+
+
+class ExportRequest(BaseModel):
+    commit: str = "HEAD"
+
+
+class FilesRequest(BaseModel):
+    paths: List[str]
+    head: bool = True  # also return each file's content at HEAD
+
+
 # ---------------------- HELPERS ----------------------
-def normalize_relative_path(path: str) -> str:
-    """Normalize and sanitize a relative path."""
-    # Convert backslashes → forward slashes
-    path = path.replace("\\", "/").strip()
-    # Remove any dangerous prefixes
-    while path.startswith("../") or path.startswith("./") or path.startswith("/"):
-        path = path.lstrip("./").lstrip("/")
-    # Collapse redundant separators
-    path = os.path.normpath(path).replace("\\", "/")
-    # Prevent navigating above root
-    if ".." in path.split("/"):
-        raise ValueError("Invalid path: directory traversal detected")
-    return path
-
-
-def safe_join(base: str, *paths) -> str:
-    """Join paths safely to prevent directory traversal."""
-    paths = [normalize_relative_path(p) for p in paths]
-    final_path = os.path.abspath(os.path.join(base, *paths))
-    if not final_path.startswith(base):
-        raise ValueError("Unsafe path")
-    return final_path
+# normalize_relative_path / safe_join live in pathguard.py
+
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg"}
+LIST_PAGE_SIZE = 500  # default page size of /api/list
+RACY_MTIME_WINDOW = 2.0  # seconds; listings and files modified more recently are not cached
+
+
+def read_dir_entries(path: str):
+    """
+    Sorted ``(name, is_dir)`` pairs of a directory from one ``os.scandir`` pass.
+    Cached per docs root and keyed by the directory mtime, which changes whenever
+    an entry is added, removed or renamed.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cache = current_root().cache("listings")
+    cached = cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with os.scandir(path) as it:
+        entries = sorted((entry.name, entry.is_dir()) for entry in it)
+    # Coarse mtime resolution could hide a change made in the same tick
+    if time.time() - mtime / 1e9 > RACY_MTIME_WINDOW:
+        cache.set(path, (mtime, entries))
+    return entries
+
+
+def read_doc_text(full_path: str):
+    """``(text, mtime)`` of a page, cached per docs root and keyed by mtime and size."""
+    st = os.stat(full_path)
+    cache = current_root().cache("files")
+    cached = cache.get(full_path)
+    if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1], st.st_mtime
+    with open(full_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if time.time() - st.st_mtime > RACY_MTIME_WINDOW:
+        cache.set(full_path, ((st.st_mtime_ns, st.st_size), text))
+    return text, st.st_mtime
+
+
+def visible_entries(path: str, ext_filter=None):
+    return [(name, is_dir) for name, is_dir in read_dir_entries(path)
+            if is_dir or not ext_filter or os.path.splitext(name)[1].lower() in ext_filter]
 
 
 def scan_dir(path: str, base: str, ext_filter: Optional[List[str]] = None):
     entries = []
-    for entry in os.listdir(path):
-        full_path = os.path.join(path, entry)
-        rel_path = os.path.relpath(full_path, base).replace("\\", "/")
-        if os.path.isdir(full_path):
+    rel_dir = os.path.relpath(path, base).replace("\\", "/")
+    prefix = "" if rel_dir == "." else rel_dir + "/"
+    for entry, is_dir in visible_entries(path, ext_filter):
+        if is_dir:
             entries.append({
                 "type": "folder",
                 "name": entry,
-                "path": rel_path,
-                "children": scan_dir(full_path, base, ext_filter)
+                "path": prefix + entry,
+                "children": scan_dir(os.path.join(path, entry), base, ext_filter)
             })
-        elif not ext_filter or os.path.splitext(entry)[1].lower() in ext_filter:
-            entries.append({"type": "file", "name": entry, "path": rel_path})
+        else:
+            entries.append({"type": "file", "name": entry, "path": prefix + entry})
     return entries
 
 
+def list_dir(path: str, base: str, ext_filter=None, depth: int = 1,
+             cursor: str = "", limit: int = LIST_PAGE_SIZE) -> dict:
+    """
+    One page of a directory, ``depth`` levels deep. Folders carry ``child_count``;
+    when a page is cut short ``next_cursor`` holds the name to continue after.
+    """
+    rel_dir = os.path.relpath(path, base).replace("\\", "/")
+    prefix = "" if rel_dir == "." else rel_dir + "/"
+    entries = visible_entries(path, ext_filter)
+    start = bisect.bisect_right(entries, (cursor, True)) if cursor else 0
+    page = entries[start:start + limit]
+    items = []
+    for entry, is_dir in page:
+        if not is_dir:
+            items.append({"type": "file", "name": entry, "path": prefix + entry})
+            continue
+        full_path = os.path.join(path, entry)
+        folder = {"type": "folder", "name": entry, "path": prefix + entry,
+                  "child_count": len(visible_entries(full_path, ext_filter))}
+        if depth > 1:
+            sub = list_dir(full_path, base, ext_filter, depth - 1, "", limit)
+            folder["children"] = sub["entries"]
+            folder["next_cursor"] = sub["next_cursor"]
+        items.append(folder)
+    more = start + limit < len(entries)
+    return {"path": rel_dir if prefix else "", "entries": items,
+            "next_cursor": page[-1][0] if more else None}
+
+
 def sanitize_filename(filename):
     name, ext = os.path.splitext(filename)
     name = re.sub(r"[^a-zA-Z0-9_\-]", "_", name)  # Replace unsafe chars
     return f"{name}{ext}"
 
 
-def increment_filename(path, filename):
+NUMBER_SUFFIX_RE = re.compile(r"(.*?)(\d+)$")
+INCREMENT_ATTEMPTS = 5  # exclusive-create retries before giving up
+suffix_index_lock = threading.Lock()
+
+
+def _suffix_key(prefix: str, ext: str) -> str:
+    # Case-folded so names that collide on case-insensitive filesystems share a counter
+    return f"{prefix}\0{ext}".casefold()
+
+
+def suffix_index(path: str, rebuild: bool = False) -> dict:
+    """
+    Highest numeric suffix per (name prefix, extension) in a directory, built
+    with one scandir and kept in the root's "suffixes" cache.
+    """
+    cache = current_root().cache("suffixes")
+    index = None if rebuild else cache.get(path)
+    if index is None:
+        index = {}
+        if os.path.isdir(path):
+            with os.scandir(path) as it:
+                for entry in it:
+                    name, ext = os.path.splitext(entry.name)
+                    match = NUMBER_SUFFIX_RE.search(name)
+                    if match:
+                        key = _suffix_key(match.group(1), ext)
+                        index[key] = max(index.get(key, 0), int(match.group(2)))
+        cache.set(path, index)
+    return index
+
+
+def increment_filename(path, filename, rebuild=False):
+    """
+    Next free numbered variant of ``filename`` in ``path``: one above both its own
+    number and the highest suffix already used there. The number is reserved in
+    the index, so concurrent callers in this process get different names.
+    """
     name, ext = os.path.splitext(filename)
-    match = re.search(r"(.*?)(\d+)$", name)
+    match = NUMBER_SUFFIX_RE.search(name)
     if match:
         prefix, number = match.groups()
         i = int(number) + 1
         width = len(number)
     else:
         prefix, i, width = name + "_", 1, 4
+    key = _suffix_key(prefix, ext)
+    with suffix_index_lock:
+        index = suffix_index(path, rebuild)
+        i = max(i, index.get(key, 0) + 1)
+        index[key] = i
+        current_root().cache("suffixes").set(path, index)  # refresh size accounting
+    return f"{prefix}{i:0{width}d}{ext}"
+
+
+def claim_incremented_path(dir_path: str, filename: str, folder: bool = False) -> str:
+    """
+    Create an empty file (or folder) under the next incremented name with an
+    exclusive create. Other workers or tools may have added files the index has
+    not seen, so on a clash the index is rebuilt and the next number tried.
+    """
+    for attempt in range(INCREMENT_ATTEMPTS):
+        final_path = os.path.join(dir_path, increment_filename(dir_path, filename, rebuild=attempt > 0))
+        try:
+            if folder:
+                os.mkdir(final_path)
+            else:
+                with open(final_path, "xb"):
+                    pass
+            return final_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No free incremented name for {filename} after {INCREMENT_ATTEMPTS} attempts")
+
+
+object_store_refused = set()  # docs root names already warned about
+
+
+def store_if_large(full_path: str):
+    """Swap a large uploaded binary for a pointer file (see object_store.py); .md files stay in git."""
+    if not LARGE_FILE_THRESHOLD or full_path.lower().endswith(".md"):
+        return
+    root = current_root()
+    if root.object_store_dir is None and root.repo().remotes:
+        # The default store in .git never leaves this machine: clones would get dangling pointers
+        if root.name not in object_store_refused:
+            object_store_refused.add(root.name)
+            print(f"Warning: docs root '{root.name}' has a git remote but no shared object store "
+                  f"(MYST_EDITOR_OBJECT_STORE); large uploads are committed as is")
+        return
+    root.object_store().store_large_file(full_path, LARGE_FILE_THRESHOLD)
+
+
+# ---------------------- WORKER COORDINATION ----------------------
+# Lock and shared cache live in <repo>/.git/myst-editor of each docs root, shared by all workers
+BLOB_CACHE_TTL = 24 * 3600  # blobs and trees are immutable, the TTL only bounds the cache file
+STATUS_CACHE_TTL = 2.0  # working tree status may change outside the editor
+
+def git_write_lock() -> FileLock:
+    """Lock held for every operation that writes to the git index, refs or working tree."""
+    return current_root().write_lock()
+
+
+def shared_cache() -> SharedCache:
+    return current_root().shared_cache()
+
+
+def mark_worktree_changed():
+    """Invalidate cached working tree status in every worker."""
+    shared_cache().bump("worktree")
+
+
+async def acquire_lock_async(lock: FileLock) -> bool:
+    """
+    Take a FileLock from the event loop without blocking it: single attempts,
+    with an asyncio sleep in between. False once the lock's timeout has passed.
+    """
+    deadline = time.monotonic() + lock.timeout
     while True:
-        new_name = f"{prefix}{i:0{width}d}{ext}"
-        if not os.path.exists(os.path.join(path, new_name)):
-            return new_name
-        i += 1
+        try:
+            lock.acquire(timeout=0)
+            return True
+        except TimeoutError:
+            if time.monotonic() > deadline:
+                return False
+        await asyncio.sleep(lock.poll)
+
+
+def with_git_write_lock(func):
+    """
+    Serialize a git-writing route: an asyncio lock orders requests inside this
+    worker, the file lock orders them across workers. Waiting for either one
+    never blocks the event loop.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        async with current_root().git_async_lock:
+            lock = git_write_lock()
+            if not await acquire_lock_async(lock):
+                return JSONResponse(
+                    {"error": "GIT_BUSY", "detail": "Another git operation is still running. Please retry."},
+                    status_code=503,
+                )
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                lock.release()
+                mark_worktree_changed()
+    return wrapper
+
 
 # ---------------------- ROUTES ----------------------
 
 
+def docs_tree_journal() -> TreeJournal:
+    """
+    Journal of the current root's .md tree, rescanned when the editor changed
+    the working tree or the last scan is older than STATUS_CACHE_TTL.
+    """
+    root = current_root()
+    journal = root.index("tree", TreeJournal)
+    generation = shared_cache().generation("worktree")
+    if (not journal.version or generation != journal.scanned_generation
+            or time.monotonic() - journal.scanned_at > STATUS_CACHE_TTL):
+        journal.update(flatten(scan_dir(root.base_dir, root.base_dir, [".md"])), generation)
+    return journal
+
+
 @app.get("/api/tree")
-async def get_file_tree():
-    return scan_dir(BASE_DIR, BASE_DIR, [".md"])
+async def get_file_tree(format: str = "nested"):
+    if format == "compact":
+        journal = docs_tree_journal()
+        return {**encode_compact(journal.entries), "version": journal.token()}
+    base_dir = current_root().base_dir
+    return scan_dir(base_dir, base_dir, [".md"])
+
+
+@app.get("/api/tree/delta")
+async def get_file_tree_delta(since: str = ""):
+    """
+    Tree changes since a version returned by ``/api/tree?format=compact`` or an
+    earlier delta. Answers with the full compact tree and ``"reset": true``
+    when the version is unknown (other worker, restart) or too old.
+    """
+    journal = docs_tree_journal()
+    changes = journal.changes_since(since)
+    if changes is None:
+        return {"reset": True, "version": journal.token(), **encode_compact(journal.entries)}
+    return {"reset": False, "version": journal.token(), **changes}
+
+
+@app.get("/api/list")
+async def list_folder(tree: str = "docs", path: str = "", depth: int = 1,
+                      cursor: str = "", limit: int = LIST_PAGE_SIZE):
+    """
+    Lazy alternative to /api/tree (tree=docs, .md files) and /api/image_tree
+    (tree=images, the _static folder): one folder ``depth`` levels deep, paged
+    with ``cursor``/``limit``.
+    """
+    if tree == "docs":
+        base, ext_filter = current_root().base_dir, [".md"]
+    elif tree == "images":
+        base, ext_filter = os.path.join(current_root().base_dir, "_static"), None
+    else:
+        return JSONResponse({"error": f"Unknown tree: {tree}"}, status_code=400)
+    try:
+        folder_path = safe_join(base, path)
+    except ValueError:
+        return JSONResponse({"error": "Invalid path"}, status_code=400)
+    if not os.path.isdir(folder_path):
+        return JSONResponse({"error": "Folder not found"}, status_code=404)
+    if depth < 1 or limit < 1:
+        return JSONResponse({"error": "depth and limit must be positive"}, status_code=400)
+    return list_dir(folder_path, base, ext_filter, depth, cursor, limit)
 
 
 @app.get("/api/file")
 async def get_file(path: str):
     try:
-        full_path = safe_join(BASE_DIR, path)
-        mtime = os.path.getmtime(full_path)  # seconds since epoch
-        with open(full_path, "r", encoding="utf-8") as f:
-            return {
-                "content": f.read(),
-                "last_modified": int(mtime * 1000)  # ms
-            }
+        full_path = safe_join(current_root().base_dir, path)
+        content, mtime = read_doc_text(full_path)  # mtime in seconds since epoch
     except FileNotFoundError:
         return JSONResponse({"error": "File not found"}, status_code=404)
     except ValueError:
         return JSONResponse({"error": "Invalid path"}, status_code=400)
+    page = normalize_relative_path(path)
+    root_access_stats().record(page)
+    prefetcher.schedule(current_root(), page)
+    return {
+        "content": content,
+        "last_modified": int(mtime * 1000)  # ms
+    }
 
 
 @app.get("/api/file/meta")
 async def get_file_meta(path: str):
     try:
-        full_path = safe_join(BASE_DIR, path)
+        full_path = safe_join(current_root().base_dir, path)
         mtime = os.path.getmtime(full_path)
         return {"last_modified": int(mtime * 1000)}
     except FileNotFoundError:
@@ -137,18 +608,30 @@ async def get_file_meta(path: str):
         return JSONResponse({"error": "Invalid path"}, status_code=400)
 
 
+def write_doc_file(full_path: str, content: str) -> float:
+    """Write a page and invalidate cached worktree status; returns the new mtime."""
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    root = current_root()
+    root.cache("files").pop(full_path)
+    page = os.path.relpath(full_path, root.base_dir).replace(os.sep, "/")
+    if page.endswith(".md"):
+        outline_index().update(page, content)
+    mark_worktree_changed()
+    return os.path.getmtime(full_path)
+
+
 @app.post("/api/file")
+@with_git_write_lock
 async def save_file(path: str, request: Request):
     try:
-        full_path = safe_join(BASE_DIR, path)
+        full_path = safe_join(current_root().base_dir, path)
     except ValueError:
         return JSONResponse({"error": "Invalid path"}, status_code=400)
     data = await request.json()
     content = data.get("content", "")
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-    with open(full_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    mtime = os.path.getmtime(full_path)
+    mtime = write_doc_file(full_path, content)
     return {
         "status": "saved",
         "last_modified": int(mtime * 1000)
@@ -161,18 +644,18 @@ async def images_in_folder(folder: str = ""):
         folder = normalize_relative_path(folder)
     except ValueError:
         return []
-    static_dir = os.path.join(BASE_DIR, "_static")
+    static_dir = os.path.join(current_root().base_dir, "_static")
     folder_path = os.path.join(static_dir, folder)
     if not os.path.isdir(folder_path):
         return []
-    allowed_exts = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg"}
-    return scan_dir(folder_path, static_dir, allowed_exts)
+    return scan_dir(folder_path, static_dir, IMAGE_EXTS)
 
 
 @app.post("/api/create")
+@with_git_write_lock
 async def create_file_or_folder(data: PathModel):
     try:
-        full_path = safe_join(BASE_DIR, data.path)
+        full_path = safe_join(current_root().base_dir, data.path)
     except ValueError:
         return JSONResponse({"error": "Invalid path"}, status_code=400)
     if data.type == "folder":
@@ -180,13 +663,15 @@ async def create_file_or_folder(data: PathModel):
     elif data.type == "file":
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         open(full_path, "w", encoding="utf-8").close()
+    mark_worktree_changed()
     return {"status": "created", "path": data.path}
 
 
 @app.post("/api/delete")
+@with_git_write_lock
 async def delete_path(data: PathModel):
     try:
-        full_path = safe_join(BASE_DIR, data.path)
+        full_path = safe_join(current_root().base_dir, data.path)
     except ValueError:
         return JSONResponse({"error": "Invalid path"}, status_code=400)
     if not os.path.exists(full_path):
@@ -195,64 +680,79 @@ async def delete_path(data: PathModel):
         os.remove(full_path)
     else:
         shutil.rmtree(full_path)
+    mark_worktree_changed()
     return {"status": "deleted", "path": data.path}
 
 
 # ------------------------------ COLLISION HANDLER ------------------------------
-def handle_collision(base_dir, old_path=None, file: UploadFile = None,
-                     new_path=None, action="check", move_file=False):
-    try:
-        new_full_path = safe_join(base_dir, new_path)
-        os.makedirs(os.path.dirname(new_full_path), exist_ok=True)
+COLLISION_ACTIONS = {"check", "overwrite", "increment"}
 
-        if action == "check":
-            if os.path.exists(new_full_path):
-                return JSONResponse({"collision": True}, status_code=409)
-            if move_file:
-                old_full_path = safe_join(base_dir, old_path)
-                if not os.path.exists(old_full_path):
-                    return JSONResponse({"error": "Source does not exist"}, status_code=404)
-                os.rename(old_full_path, new_full_path)
-            else:
-                with open(new_full_path, "wb") as f:
-                    shutil.copyfileobj(file.file, f)
-            return {"status": "saved", "newPath": new_path}
 
-        elif action == "overwrite":
-            old_full_path = safe_join(base_dir, old_path)
-
-            # If source and destination are the same file → do nothing
-            if os.path.abspath(old_full_path) == os.path.abspath(new_full_path):
-                return {"status": "no_change", "newPath": new_path}
+def write_with_collision(full_path: str, action: str, write: Callable[[str], None],
+                         source_full_path: Optional[str] = None, folder: bool = False):
+    """
+    Run ``write(final_path)`` for a destination under one of COLLISION_ACTIONS.
+    Shared by every route that writes a user-chosen path, so single and batch
+    operations resolve collisions the same way.
+    Returns (final_path, status): status is None once written, otherwise
+    "collision" (check mode) or "no_change" (overwrite onto itself).
+    """
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    if action == "check":
+        if os.path.exists(full_path):
+            return full_path, "collision"
+        write(full_path)
+        return full_path, None
+
+    if action == "overwrite":
+        if source_full_path and os.path.abspath(source_full_path) == os.path.abspath(full_path):
+            return full_path, "no_change"
+        if os.path.isdir(full_path):
+            raise IsADirectoryError(f"Refusing to overwrite folder: {os.path.basename(full_path)}")
+        if os.path.exists(full_path):
+            os.remove(full_path)
+        write(full_path)
+        return full_path, None
+
+    if action != "increment":
+        raise ValueError(f"Invalid action: {action}")
+    # Reserve the name first so concurrent writers never share it
+    final_path = claim_incremented_path(os.path.dirname(full_path), os.path.basename(full_path), folder)
+    if folder:
+        os.rmdir(final_path)  # folders are moved or copied onto the reserved name, not into it
+    try:
+        write(final_path)
+    except Exception:
+        if not folder and os.path.exists(final_path):  # drop the reserved name
+            os.remove(final_path)
+        raise
+    return final_path, None
 
-            # If destination exists → delete it first
-            if os.path.exists(new_full_path):
-                os.remove(new_full_path)
 
-            # Move or copy
-            if move_file:
-                os.rename(old_full_path, new_full_path)
-            else:
-                with open(new_full_path, "wb") as f:
-                    shutil.copyfileobj(file.file, f)
-
-            return {"status": "saved", "newPath": new_path}
+def handle_collision(base_dir, old_path=None, file: UploadFile = None,
+                     new_path=None, action="check", move_file=False):
+    try:
+        if action not in COLLISION_ACTIONS:
+            return JSONResponse({"error": "Invalid action"}, status_code=400)
+        new_full_path = safe_join(base_dir, new_path)
+        old_full_path = safe_join(base_dir, old_path) if move_file else None
+        if move_file and not os.path.exists(old_full_path):
+            return JSONResponse({"error": "Source does not exist"}, status_code=404)
 
-        elif action == "increment":
-            dir_path = os.path.dirname(new_full_path)
-            filename = os.path.basename(new_full_path)
-            new_name = increment_filename(dir_path, filename)
-            final_path = os.path.join(dir_path, new_name)
+        def write(final_path):
             if move_file:
-                old_full_path = safe_join(base_dir, old_path)
-                os.rename(old_full_path, final_path)
+                os.replace(old_full_path, final_path)
             else:
                 with open(final_path, "wb") as f:
                     shutil.copyfileobj(file.file, f)
-            rel_path = os.path.relpath(final_path, base_dir).replace("\\", "/")
-            return {"status": "saved", "newPath": rel_path}
 
-        return JSONResponse({"error": "Invalid action"}, status_code=400)
+        final_path, status = write_with_collision(
+            new_full_path, action, write, old_full_path,
+            folder=move_file and os.path.isdir(old_full_path))
+        if status == "collision":
+            return JSONResponse({"collision": True}, status_code=409)
+        rel_path = os.path.relpath(final_path, base_dir).replace("\\", "/")
+        return {"status": status or "saved", "newPath": rel_path}
 
     except Exception as e:
         import traceback
@@ -261,24 +761,28 @@ def handle_collision(base_dir, old_path=None, file: UploadFile = None,
 
 
 @app.post("/api/rename")
+@with_git_write_lock
 async def rename_path(data: RenameModel):
     try:
         # Normalize input paths
         old_path_clean = data.oldPath.lstrip("/").replace("\\", "/")
         new_path_clean = data.newPath.lstrip("/").replace("\\", "/")
 
-        return handle_collision(
-            base_dir=BASE_DIR,
+        result = handle_collision(
+            base_dir=current_root().base_dir,
             old_path=old_path_clean,
             new_path=new_path_clean,
             action=data.action,
             move_file=True
         )
+        mark_worktree_changed()
+        return result
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
 @app.post("/api/upload_image")
+@with_git_write_lock
 async def upload_image(
     file: UploadFile = File(...),
     path: str = Form(...),
@@ -295,45 +799,178 @@ async def upload_image(
     except ValueError:
         return JSONResponse({"error": "Invalid path"}, status_code=400)
 
-    return handle_collision(
-        base_dir=BASE_DIR,
+    result = handle_collision(
+        base_dir=current_root().base_dir,
         file=file,
         new_path=rel_path,
         action=action,
         move_file=False
     )
+    if isinstance(result, dict) and result.get("status") == "saved":
+        store_if_large(safe_join(current_root().base_dir, result["newPath"]))
+    mark_worktree_changed()
+    return result
 
 
 @app.get("/api/image_tree")
 async def get_image_tree():
-    static_root = os.path.join(BASE_DIR, "_static")
+    static_root = os.path.join(current_root().base_dir, "_static")
     return scan_dir(static_root, static_root)
 
 
 @app.post("/save")
+@with_git_write_lock
 async def save_uploaded_file(file: UploadFile = File(...), filename: str = ""):
     if not filename:
         return JSONResponse({"error": "Missing filename"}, status_code=400)
     try:
         safe_relative_path = normalize_relative_path(filename)
-        save_path = safe_join(BASE_DIR, safe_relative_path)
+        save_path = safe_join(current_root().base_dir, safe_relative_path)
     except ValueError:
         return JSONResponse({"error": "Invalid save path"}, status_code=400)
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     with open(save_path, "wb") as f:
         f.write(await file.read())
+    store_if_large(save_path)
+    mark_worktree_changed()
     return {"success": True, "path": save_path}
 
 
+# ---------------------- BATCH FILE OPERATIONS ----------------------
+BATCH_OPS = {"create", "delete", "move", "copy"}
+
+
+def apply_batch_operation(base_dir: str, op: BatchOperation, action: str) -> dict:
+    def rel(full_path):
+        return os.path.relpath(full_path, base_dir).replace("\\", "/")
+
+    if op.op == "delete":
+        full_path = safe_join(base_dir, op.path)
+        if not os.path.exists(full_path):
+            return {"status": "error", "path": rel(full_path), "error": "File or folder does not exist"}
+        if os.path.isdir(full_path):
+            shutil.rmtree(full_path)
+        else:
+            os.remove(full_path)
+        return {"status": "deleted", "path": rel(full_path)}
+
+    if op.op == "create":
+        def create(final_path):
+            if op.type == "folder":
+                os.mkdir(final_path)
+            else:
+                open(final_path, "w", encoding="utf-8").close()
+
+        target, status = write_with_collision(
+            safe_join(base_dir, op.path), action, create, folder=op.type == "folder")
+        return {"status": status or "created", "path": rel(target)}
+
+    # move / copy
+    source = safe_join(base_dir, op.oldPath)
+    if not os.path.exists(source):
+        return {"status": "error", "oldPath": rel(source), "error": "Source does not exist"}
+
+    def move_or_copy(final_path):
+        if op.op == "move":
+            os.replace(source, final_path)
+        elif os.path.isdir(source):
+            shutil.copytree(source, final_path)
+        else:
+            shutil.copy2(source, final_path)
+
+    target, status = write_with_collision(
+        safe_join(base_dir, op.newPath), action, move_or_copy, source, folder=os.path.isdir(source))
+    done = "moved" if op.op == "move" else "copied"
+    return {"status": status or done, "oldPath": rel(source), "newPath": rel(target)}
+
+
+@app.post("/api/batch")
+@with_git_write_lock
+async def batch_file_operations(req: BatchRequest):
+    """
+    Apply many create/delete/move/copy operations in one request.
+    Every path is validated before anything is touched; operations then run in
+    order and each one reports its own status (collisions do not stop the batch).
+    """
+    root = current_root()
+    base_dir = root.base_dir
+
+    # 1) Validate everything up front
+    errors = []
+    owners, paths = [], []  # operation index for each path to validate
+    for index, op in enumerate(req.operations):
+        action = op.action or req.action
+        if op.op not in BATCH_OPS:
+            errors.append({"index": index, "error": f"Unknown operation: {op.op}"})
+        elif action not in COLLISION_ACTIONS:
+            errors.append({"index": index, "error": f"Invalid action: {action}"})
+        else:
+            for p in ([op.path] if op.op in ("create", "delete") else [op.oldPath, op.newPath]):
+                owners.append(index)
+                paths.append(p)
+    resolved, path_errors = validate_paths(base_dir, paths)
+    base_abs = resolve_base(base_dir)
+    for i, full_path in enumerate(resolved):
+        if paths[i] is None:
+            errors.append({"index": owners[i], "error": "Invalid path: Missing path"})
+        elif full_path is None:
+            errors.append({"index": owners[i], "error": f"Invalid path: {path_errors[i]}"})
+        elif full_path == base_abs:
+            errors.append({"index": owners[i], "error": "Invalid path: Refusing to operate on the docs root"})
+    if errors:
+        return JSONResponse({"error": "Invalid batch", "details": errors}, status_code=400)
+
+    # 2) Apply in order
+    results = []
+    for index, op in enumerate(req.operations):
+        try:
+            result = apply_batch_operation(base_dir, op, op.action or req.action)
+        except OSError as e:
+            result = {"status": "error", "error": str(e)}
+        results.append({"index": index, "op": op.op, **result})
+    mark_worktree_changed()
+
+    applied = [r for r in results if r["status"] in ("created", "deleted", "moved", "copied")]
+    response = {
+        "status": "ok" if len(applied) == len(results) else "partial",
+        "applied": len(applied),
+        "results": results,
+    }
+
+    # 3) Optionally stage all touched paths as one change
+    if req.stage and applied:
+        touched = set()
+        for r in applied:
+            for key in ("path", "oldPath", "newPath"):
+                if r.get(key):
+                    touched.add(f"{root.docs_dir}/{r[key]}")
+        try:
+            with git_write_lock():
+                stage_paths(get_repo(), touched)
+            response["staged"] = sorted(touched)
+        except git_command_error() as e:
+            response["stage_error"] = str(e)
+    return response
+
+
 # ---------------------- STATIC FILE ROUTES ----------------------
 @app.get("/_static/{subpath:path}")
 async def serve_static_files(subpath: str):
     try:
-        full_path = safe_join(os.path.join(BASE_DIR, "_static"), subpath)
+        full_path = safe_join(os.path.join(current_root().base_dir, "_static"), subpath)
     except ValueError:
         return JSONResponse({"error": "Forbidden"}, status_code=403)
     if os.path.isfile(full_path):
         headers = {"Cache-Control": "no-cache, no-store, must-revalidate"}
+        pointer = read_pointer(full_path)
+        if pointer is not None:
+            # Large binary kept in the object store; serve its content under the original name
+            object_path = current_root().object_store().path_for(pointer[0])
+            if not os.path.isfile(object_path):
+                return JSONResponse({"error": "File content is missing from the object store"},
+                                    status_code=404)
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            return FileResponse(object_path, media_type=media_type, headers=headers)
         return FileResponse(full_path, headers=headers)
     return JSONResponse({"error": "File not found"}, status_code=404)
 
@@ -352,15 +989,192 @@ async def get_templates(path: str):
 async def serve_linked_template_list():
     return FileResponse(os.path.join(STATIC_FOLDER, "linkedtemplatelist.json"))
 
+
+@app.get("/api/startup")
+async def get_startup_report():
+    """Return the startup-time breakdown (imports, route setup, lifespan, warm-up) in ms."""
+    return {"phases": startup_timings, "repo_open": registry.get().is_open()}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus-style request metrics of this worker process."""
+    return Response(metrics.render() + cache_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profiles")
+async def list_profiles():
+    """Profiles captured for slow requests, newest first."""
+    return {
+        "enabled": profiler.enabled,
+        "mode": profiler.mode,
+        "threshold_ms": profiler.threshold_ms,
+        "profiles": profiler.list(),
+    }
+
+
+@app.get("/debug/profiles/{name}")
+async def download_profile(name: str):
+    path = profiler.path_for(name)
+    if path is None:
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    return FileResponse(path, filename=name)
+
+
+@app.get("/api/roots")
+async def list_docs_roots():
+    """List the docs roots served by this instance with their cache usage."""
+    return registry.info()
+
+
+@app.get("/api/admin/caches")
+async def get_cache_stats():
+    """Size, hit/miss and eviction counts of every in-process cache of this worker."""
+    return cache_registry.stats()
+
+
+@app.post("/api/admin/caches/flush")
+async def flush_caches(req: CacheAdminRequest):
+    """Empty the caches matching ``caches``; with several workers only this one is flushed."""
+    flushed = []
+    for cache in cache_registry.caches(req.caches):
+        cache.clear()
+        flushed.append(cache.name)
+    return {"flushed": flushed, "bytes": cache_registry.total_bytes()}
+
+
+@app.post("/api/admin/caches/resize")
+async def resize_caches(req: CacheAdminRequest):
+    """Change the limit of matching caches and/or the global budget and policy, evicting at once."""
+    resized = []
+    if req.max_mb is not None:
+        for cache in cache_registry.caches(req.caches):
+            cache.resize(int(req.max_mb * 1024 * 1024))
+            resized.append(cache.name)
+    try:
+        cache_registry.configure(
+            budget=int(req.budget_mb * 1024 * 1024) if req.budget_mb is not None else None,
+            policy=req.policy,
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"resized": resized, **cache_registry.stats()}
+
+
+@app.get("/api/substitutions")
+async def get_substitutions(request: Request):
+    """
+    Return the Sphinx substitutions and external links used by the docs build.
+    Served from the cached config; answers 304 when the client's ETag is current.
+    """
+    etag = docs_config_store.etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(docs_config_store.snapshot(), headers=headers)
+
 # ----------------------- Git integration ------------------------- #
 
-repo_dir = "../../"
+def get_repo():
+    """
+    Git repository of the current docs root, opened on first use.
+    GitPython is imported there rather than at module scope to keep server startup fast.
+    """
+    return current_root().repo()
+
+
+def git_command_error():
+    """GitCommandError class for ``except`` clauses, imported lazily like the rest of GitPython."""
+    from git import GitCommandError
+    return GitCommandError
+
+
+def read_blob_text(repo, commit_hash: str, target_file: str):
+    """Text of ``target_file`` at ``commit_hash``, or None if the file is not in that commit."""
+    sha = repo.commit(commit_hash).hexsha
+    key = f"{sha}:{target_file}"
+    memory = current_root().cache("blobs")
+    cached = memory.get(key) or shared_cache().get("blob", key)
+    if cached is not None:
+        memory.set(key, cached)
+        return cached["text"]
+    try:
+        blob = repo.commit(sha).tree / target_file
+        text = blob.data_stream.read().decode("utf-8").replace("\r", "")
+    except KeyError:
+        text = None
+    shared_cache().set("blob", key, {"text": text}, ttl=BLOB_CACHE_TTL)
+    memory.set(key, {"text": text})
+    return text
+
+
+def commit_md_files(repo, commit_hash: str) -> set:
+    """Paths (relative to the docs folder) of all .md files in a commit."""
+    docs_dir = current_root().docs_dir
+    sha = repo.commit(commit_hash).hexsha
+    cached = shared_cache().get("tree", sha)
+    if cached is not None:
+        return set(cached)
+    files = set()
+    try:
+        docs_tree = repo.commit(sha).tree / docs_dir
+        for item in docs_tree.traverse():
+            if item.type == 'blob' and item.path.endswith('.md'):
+                rel_path = os.path.relpath(item.path, docs_dir).replace("\\", "/")
+                files.add(rel_path)
+    except KeyError:
+        pass
+    shared_cache().set("tree", sha, sorted(files), ttl=BLOB_CACHE_TTL)
+    return files
+
+
+def working_tree_changes(repo, commit_hash: str) -> dict:
+    """
+    ``git diff --name-status <commit> -- docs`` output plus untracked docs files.
+    Cached briefly and invalidated whenever the editor writes to the working tree.
+    """
+    docs_dir = current_root().docs_dir
+    sha = repo.commit(commit_hash).hexsha
+    cache = shared_cache()
+    generation = cache.generation("worktree")
+    cached = cache.get("status", sha, generation=generation)
+    if cached is not None:
+        return cached
+    status = {
+        "diff": repo.git.diff("--name-status", sha, docs_dir),
+        "untracked": repo.git.ls_files("--others", "--exclude-standard", docs_dir).splitlines(),
+    }
+    cache.set("status", sha, status, ttl=STATUS_CACHE_TTL, generation=generation)
+    return status
 
-# Only open existing repo
-if not os.path.exists(os.path.join(repo_dir, ".git")):
-    raise FileNotFoundError(f"Git repo not found in {repo_dir}. Clone it manually first.")
 
-repo = Repo(repo_dir)
+def changed_docs_paths(repo) -> list:
+    """Repo-relative paths of every changed or untracked docs file, from the cached status."""
+    status = working_tree_changes(repo, "HEAD")
+    paths = set(status["untracked"])
+    for line in status["diff"].splitlines():
+        # "M\tpath", "D\tpath" or "R100\told\tnew": every column after the status is a path
+        paths.update(line.split("\t")[1:])
+    return sorted(paths)
+
+
+def stage_paths(repo, paths):
+    """
+    Stage exactly ``paths`` (repo-relative) with one ``git add`` and one ``git rm --cached``,
+    whatever their number. Pathspecs go through a file, so long lists never hit
+    command-line limits, and are literal, so names with glob characters stay exact.
+    """
+    present, removed = [], []
+    for path in sorted(set(paths)):
+        (present if os.path.exists(os.path.join(repo.working_tree_dir, path)) else removed).append(path)
+    for command, args, group in (("add", ["-A"], present),
+                                 ("rm", ["-r", "-q", "--cached", "--ignore-unmatch"], removed)):
+        if not group:
+            continue
+        with tempfile.TemporaryFile() as pathspecs:
+            pathspecs.write(b"\0".join(f":(literal){p}".encode("utf-8") for p in group))
+            pathspecs.seek(0)
+            getattr(repo.git, command)(*args, "--pathspec-from-file=-", "--pathspec-file-nul", istream=pathspecs)
 
 
 class FileRequest(BaseModel):
@@ -376,9 +1190,11 @@ class CompareRequest(BaseModel):
 
 @app.post("/search-file")
 async def search_file(req: FileRequest):
+    repo = get_repo()
+    docs_dir = current_root().docs_dir
     branches = []
     commits = {}
-    target_file = f"{DOCS_DIR}/{req.filename.replace('\\', '/')}" if req.filename else None
+    target_file = f"{docs_dir}/{req.filename.replace('\\', '/')}" if req.filename else None
 
     try:
         # Handle case where repo has no branches
@@ -398,19 +1214,21 @@ async def search_file(req: FileRequest):
                 commits[branch_name] = []
 
                 # Handle case where branch has no commits
-                branch_commits = list(repo.iter_commits(branch_name))
+                with span("iter_commits"):
+                    branch_commits = list(repo.iter_commits(branch_name))
                 if not branch_commits:
                     continue
 
                 for idx, c in enumerate(branch_commits):
                     file_exists = True
                     if target_file:
-                        try:
-                            _ = c.tree / target_file
-                        except KeyError:
-                            file_exists = False
-                        except Exception:
-                            file_exists = False
+                        with span("tree_lookup"):
+                            try:
+                                _ = c.tree / target_file
+                            except KeyError:
+                                file_exists = False
+                            except Exception:
+                                file_exists = False
 
                     commits[branch_name].append({
                         "hash": c.hexsha,
@@ -467,19 +1285,22 @@ class DiffRequest(BaseModel):
     
 @app.post("/get-file-from-git")
 async def get_file_from_git(req: DiffRequest):
-    target_file = f"{DOCS_DIR}/{req.filename.replace('\\', '/')}"
+    repo = get_repo()
+    docs_dir = current_root().docs_dir
+    target_file = f"{docs_dir}/{req.filename.replace('\\', '/')}"
     
     def read_file_from_commit(commit_hash: str) -> str:
         try:
-            blob = repo.commit(commit_hash).tree / target_file
-            return blob.data_stream.read().decode("utf-8").replace("\r", "")
-        except KeyError:
-            return f"// File not found in commit {commit_hash}"
+            text = read_blob_text(repo, commit_hash, target_file)
+            if text is None:
+                return f"// File not found in commit {commit_hash}"
+            return text
         except Exception as e:
             return f"// Error reading file: {e}"
 
-    left_content = read_file_from_commit(req.commit_left)
-    right_content = read_file_from_commit(req.commit_right)
+    with span("read_blobs"):
+        left_content = read_file_from_commit(req.commit_left)
+        right_content = read_file_from_commit(req.commit_right)
 
     return {
         "left_content": left_content,
@@ -487,12 +1308,51 @@ async def get_file_from_git(req: DiffRequest):
     }
 
 
+@app.get("/api/file-history")
+def get_file_history(path: str, limit: int = 200, offset: int = 0):
+    """Commits that touched a docs file, newest first, following renames."""
+    repo = get_repo()
+    docs_dir = current_root().docs_dir
+    try:
+        repo_path = f"{docs_dir}/{normalize_relative_path(path)}"
+        head_sha = repo.head.commit.hexsha
+    except ValueError:
+        return JSONResponse({"error": "Invalid path or empty repository"}, status_code=400)
+    with span("git_log"):
+        entries = file_history(repo, shared_cache(), repo_path, head_sha)
+    prefix = docs_dir + "/"
+    page = [
+        {**e, "path": e["path"][len(prefix):] if e["path"] and e["path"].startswith(prefix) else e["path"],
+         "old_path": e["old_path"][len(prefix):] if e["old_path"] and e["old_path"].startswith(prefix) else e["old_path"]}
+        for e in entries[offset:offset + limit]
+    ]
+    return {"path": path, "head": head_sha, "total": len(entries), "history": page}
+
+
+@app.get("/api/blame")
+def get_blame(path: str, commit: str = "HEAD"):
+    """Per-line authorship of a docs file at a commit (line ranges plus commit details)."""
+    repo = get_repo()
+    try:
+        repo_path = f"{current_root().docs_dir}/{normalize_relative_path(path)}"
+        commit_sha = repo.commit(commit).hexsha
+    except Exception as e:  # ValueError for the path, BadName for an unknown commit
+        return JSONResponse({"error": f"Invalid path or commit: {e}"}, status_code=400)
+    try:
+        with span("git_blame"):
+            result = file_blame(repo, shared_cache(), repo_path, commit_sha)
+    except KeyError:
+        return JSONResponse({"error": f"File not found in commit {commit}"}, status_code=404)
+    return {"path": path, "commit": commit_sha, **result}
+
+
 @app.get("/api/git-diff-tree")
 async def git_diff_tree_get(commit_left: str = Query(...), commit_right: str = Query(...)):
+    repo = get_repo()
     commit_left_obj = repo.commit(commit_left)
     commit_right_obj = repo.commit(commit_right)
 
-    diffs = commit_right_obj.diff(commit_left_obj, paths=DOCS_DIR)
+    diffs = commit_right_obj.diff(commit_left_obj, paths=current_root().docs_dir)
 
     result = []
     for d in diffs:
@@ -516,6 +1376,7 @@ async def git_head():
     """
     Return the HEAD commit hash and active branch of the current repo.
     """
+    repo = get_repo()
     try:
         return {
             "head": repo.head.commit.hexsha,
@@ -537,11 +1398,13 @@ async def git_diff_working_tree(commit: str = Query(...)):
     Returns a list of changed files with statuses (M/A/D/R).
     Includes both tracked changes and untracked files.
     """
+    repo = get_repo()
     try:
         result = []
         
         # Get tracked file changes: git diff --name-status <commit>
-        diff_output = repo.git.diff("--name-status", commit, DOCS_DIR)
+        changes = working_tree_changes(repo, commit)
+        diff_output = changes["diff"]
         for line in diff_output.splitlines():
             parts = line.split("\t")
             if not parts:
@@ -564,7 +1427,7 @@ async def git_diff_working_tree(commit: str = Query(...)):
                 })
         
         # Get untracked files (new files not in git)
-        untracked_files = repo.git.ls_files("--others", "--exclude-standard", DOCS_DIR).splitlines()
+        untracked_files = changes["untracked"]
         for file_path in untracked_files:
             # Only include .md files
             if file_path.endswith('.md'):
@@ -583,28 +1446,19 @@ async def git_diff_working_tree(commit: str = Query(...)):
 # Add this new endpoint to your FastAPI backend
 @app.get("/api/tree-union")
 async def get_tree_union(commit_left: str = Query(...), commit_right: str = Query(...)):
+    repo = get_repo()
     try:
         # --- Get all .md files from both commits ---
-        def get_md_files(commit_obj):
-            files = set()
-            try:
-                docs_tree = commit_obj.tree / DOCS_DIR
-                for item in docs_tree.traverse():
-                    if item.type == 'blob' and item.path.endswith('.md'):
-                        rel_path = os.path.relpath(item.path, DOCS_DIR).replace("\\", "/")
-                        files.add(rel_path)
-            except KeyError:
-                pass
-            return files
-
-        left_files = get_md_files(repo.commit(commit_left))
-        right_files = get_md_files(repo.commit(commit_right))
+        with span("git_trees"):
+            left_files = commit_md_files(repo, commit_left)
+            right_files = commit_md_files(repo, commit_right)
         
         # Union of files from both commits only (no untracked files for commit vs commit comparison)
         md_union = left_files | right_files
 
         # --- Get local tree ---
-        local_tree = scan_dir(BASE_DIR, BASE_DIR, [".md"])
+        base_dir = current_root().base_dir
+        local_tree = scan_dir(base_dir, base_dir, [".md"])
 
         # --- Filter local tree recursively ---
         def filter_tree(nodes):
@@ -637,6 +1491,8 @@ async def get_tree_local_diff():
     - Excludes deleted (D) and renamed (R) entries.
     - Returns: { tree: [...filtered tree nodes...], diffs: [...git-style diffs...] }
     """
+    repo = get_repo()
+    docs_dir = current_root().docs_dir
     try:
         result = []
         changed_trimmed = set()
@@ -649,7 +1505,8 @@ async def get_tree_local_diff():
 
         # 1) Get tracked changes compared to HEAD using same approach as git_diff_working_tree
         if head_commit:
-            diff_output = repo.git.diff("--name-status", head_commit, DOCS_DIR)
+            changes = working_tree_changes(repo, head_commit)
+            diff_output = changes["diff"]
             for line in diff_output.splitlines():
                 parts = line.split("\t")
                 if not parts:
@@ -684,20 +1541,23 @@ async def get_tree_local_diff():
                     continue
                 # Normalize slashes and drop "docs/" prefix if present
                 p = p.replace("\\", "/")
-                prefix = DOCS_DIR.rstrip("/") + "/"
+                prefix = docs_dir.rstrip("/") + "/"
                 if p.startswith(prefix):
                     p = p[len(prefix):]
                 changed_trimmed.add(p)
 
         # 2) Add untracked files (ls-files --others) -> treat as Added
         try:
-            untracked = repo.git.ls_files("--others", "--exclude-standard", DOCS_DIR).splitlines()
+            if head_commit:
+                untracked = changes["untracked"]
+            else:
+                untracked = repo.git.ls_files("--others", "--exclude-standard", docs_dir).splitlines()
             for file_path in untracked:
                 if not file_path.endswith(".md"):
                     continue
                 result.append({"old_path": None, "new_path": file_path, "status": "A"})
                 p = file_path.replace("\\", "/")
-                prefix = DOCS_DIR.rstrip("/") + "/"
+                prefix = docs_dir.rstrip("/") + "/"
                 if p.startswith(prefix):
                     p = p[len(prefix):]
                 changed_trimmed.add(p)
@@ -706,7 +1566,8 @@ async def get_tree_local_diff():
             pass
 
         # 3) Build local tree and filter it so only modified/added files and their folders remain
-        local_tree = scan_dir(BASE_DIR, BASE_DIR, [".md"])
+        base_dir = current_root().base_dir
+        local_tree = scan_dir(base_dir, base_dir, [".md"])
 
         def filter_tree(nodes):
             filtered = []
@@ -736,7 +1597,9 @@ async def get_tree_local_diff():
 
 
 @app.post("/api/git-commit-all")
+@with_git_write_lock
 async def git_commit_all(payload: dict = Body(...)):
+    repo = get_repo()
     message = payload.get("message", "").strip() or "(no message)"
     files = payload.get("files", [])
 
@@ -753,9 +1616,9 @@ async def git_commit_all(payload: dict = Body(...)):
 
         active_branch = repo.active_branch.name
 
-        # Attempt to fetch latest from remote
+        # Remote state comes from the background tracker; fetch only if it is too old
         try:
-            repo.remotes.origin.fetch()
+            remote_tracker.ensure_fresh(current_root(), REMOTE_MAX_AGE)
         except Exception as fetch_err:
             print(f"Warning: could not fetch remote: {fetch_err}")
 
@@ -789,12 +1652,15 @@ async def git_commit_all(payload: dict = Body(...)):
                     status_code=409,
                 )
 
-        # Stage changes
+        # Stage changes: the selected files, or every changed docs file from the cached status
+        docs_dir = current_root().docs_dir
         if files:
-            for f in files:
-                repo.git.add(os.path.join(DOCS_DIR, f))
+            stage_paths(repo, [f"{docs_dir}/{normalize_relative_path(f)}" for f in files])
         else:
-            repo.git.add(all=True)
+            try:
+                stage_paths(repo, changed_docs_paths(repo))
+            except ValueError:  # no commit yet, nothing cached to diff against
+                repo.git.add("-A", "--", docs_dir)
 
         # Commit
         new_commit = repo.index.commit(message)
@@ -805,14 +1671,16 @@ async def git_commit_all(payload: dict = Body(...)):
             "active_branch": active_branch,
         }
 
-    except GitCommandError as e:
+    except git_command_error() as e:
         return JSONResponse({"error": str(e)}, status_code=500)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
 @app.post("/api/git-push")
+@with_git_write_lock
 async def git_push():
+    repo = get_repo()
     try:
         if repo.head.is_detached:
             return JSONResponse(
@@ -828,12 +1696,14 @@ async def git_push():
         refspec = f"refs/heads/{active_branch}:refs/heads/{active_branch}"
         push_info = origin.push(refspec)
         return {"status": "success", "push_result": [str(info.summary) for info in push_info], "commit": repo.head.commit.hexsha, "active_branch": active_branch}
-    except GitCommandError as e:
+    except git_command_error() as e:
         return JSONResponse({"error": "NON_FAST_FORWARD" if "non-fast-forward" in str(e) else str(e)}, status_code=409)
 
 
 @app.post("/api/git-pull")
+@with_git_write_lock
 async def git_pull():
+    repo = get_repo()
     try:
         # --- Step 1: Handle detached HEAD early ---
         if repo.head.is_detached:
@@ -855,11 +1725,12 @@ async def git_pull():
 
         try:
             repo.git.pull("--rebase", "origin", active_branch)
-        except GitCommandError as e:
+        except git_command_error() as e:
             if "CONFLICT" in str(e) or "rebase" in str(e):
                 repo.git.rebase("--abort")  # abort immediately so files aren't modified
                 return JSONResponse({"error": "REBASE_CONFLICT"}, status_code=409)
             raise
+        remote_tracker.record_fetch(current_root())  # pull fetched origin
 
         return {
             "status": "success",
@@ -867,18 +1738,20 @@ async def git_pull():
             "active_branch": active_branch,
         }
 
-    except GitCommandError as e:
+    except git_command_error() as e:
         if "CONFLICT" in str(e):
             return JSONResponse({"error": "REBASE_CONFLICT"}, status_code=409)
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
 @app.post("/api/git-sync")
+@with_git_write_lock
 async def git_sync():
     """
     Perform a safe Git sync: pull (with rebase) + push.
     Handles broken refs, merge conflicts, and ensures the remote matches local HEAD.
     """
+    repo = get_repo()
     try:
         if repo.head.is_detached:
             if repo.head.is_detached:
@@ -914,8 +1787,7 @@ async def git_sync():
                 status_code=409,
             )
 
-        # --- Step 1: Fetch remote ---
-        origin.fetch()
+        # --- Step 1: no separate fetch, the pull below fetches origin ---
 
         # --- Step 2: Stash local changes if any ---
         has_changes = repo.is_dirty(untracked_files=True)
@@ -925,7 +1797,7 @@ async def git_sync():
         # --- Step 3: Pull with rebase ---
         try:
             repo.git.pull("--rebase", "--autostash", "origin", active_branch)
-        except GitCommandError as e:
+        except git_command_error() as e:
             err_msg = str(e)
             print("Pull error:", err_msg)
             if "ORIG_HEAD" in err_msg and "cannot lock ref" in err_msg:
@@ -941,11 +1813,13 @@ async def git_sync():
                     status_code=409,
                 )
 
+        remote_tracker.record_fetch(current_root())
+
         # --- Step 4: Pop stash if used ---
         if has_changes:
             try:
                 repo.git.stash("pop")
-            except GitCommandError as e:
+            except git_command_error() as e:
                 if "CONFLICT" in str(e):
                     return JSONResponse(
                         {"error": "UNSTASH_CONFLICT", "detail": "Rebase succeeded, but local edits conflicted."},
@@ -956,7 +1830,7 @@ async def git_sync():
         refspec = f"refs/heads/{active_branch}:refs/heads/{active_branch}"
         try:
             push_info_list = origin.push(refspec)
-        except GitCommandError as e:
+        except git_command_error() as e:
             err_msg = str(e)
             if "non-fast-forward" in err_msg.lower():
                 return JSONResponse({"error": "NON_FAST_FORWARD"}, status_code=409)
@@ -966,6 +1840,9 @@ async def git_sync():
         for info in push_info_list:
             summary_line = str(info.summary)
             push_summary.append(summary_line)
+            if info.flags & info.REJECTED:
+                # The remote moved between the fetch above and the push
+                return JSONResponse({"error": "NON_FAST_FORWARD"}, status_code=409)
             if info.flags & info.ERROR:
                 return JSONResponse(
                     {"error": f"Push failed: {summary_line or 'unknown error'}"},
@@ -973,7 +1850,7 @@ async def git_sync():
                 )
 
         # --- Step 6: Verify remote matches local ---
-        origin.fetch()
+        # A successful push updates origin/<branch> locally, so no second fetch is needed
         local_commit = repo.head.commit.hexsha
         try:
             remote_commit = repo.commit(f"origin/{active_branch}").hexsha
@@ -1001,15 +1878,444 @@ async def git_sync():
             "push_result": push_summary,
         }
 
-    except GitCommandError as e:
+    except git_command_error() as e:
         return JSONResponse({"error": f"Git error: {str(e)}"}, status_code=500)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+# ---------------------- PREFETCH ----------------------
+access_stats = {}  # docs root name -> AccessStats of the pages opened through /api/file
+MAX_FETCH_FILES = 100  # paths per /api/files request
+
+
+def root_access_stats() -> AccessStats:
+    root = current_root()
+    stats = access_stats.get(root.name)
+    if stats is None:
+        stats = access_stats.setdefault(root.name, AccessStats())
+    return stats
+
+
+def head_commit_sha(repo):
+    try:
+        return repo.head.commit.hexsha
+    except ValueError:
+        return None  # empty repository
+
+
+def prefetch_candidates(path: str, limit: Optional[int] = None) -> list:
+    """Pages likely to be opened after ``path``, most likely first (see prefetch.py)."""
+    limit = PREFETCH_LIMIT if limit is None else limit
+    stats = root_access_stats()
+    repo = get_repo()
+    prefix = current_root().docs_dir + "/"
+    changed = [p[len(prefix):] for p in (changed_docs_paths(repo) if head_commit_sha(repo) else [])
+               if p.startswith(prefix) and p.endswith(".md")]
+    candidates = dict.fromkeys(stats.likely_next(path, limit))
+    candidates.update(dict.fromkeys(nearest_siblings(docs_tree_journal().entries, path, max(2, limit // 2))))
+    candidates.update(dict.fromkeys(changed))
+    candidates.update(dict.fromkeys(stats.recently_opened(limit)))
+    candidates.pop(path, None)
+    return list(candidates)[:limit]
+
+
+def read_page_versions(path: str, head: Optional[str], worktree: bool = True) -> dict:
+    """Working tree content and HEAD content (None if not in HEAD) of a page, through the caches."""
+    root = current_root()
+    page = {}
+    if worktree:
+        content, mtime = read_doc_text(safe_join(root.base_dir, path))
+        page = {"content": content, "last_modified": int(mtime * 1000)}
+    if head:
+        page["head_content"] = read_blob_text(get_repo(), head, f"{root.docs_dir}/{path}")
+    return page
+
+
+def prefetch_after(path: str):
+    """Prefetcher job: warm the HEAD version of an opened page and the pages likely to follow it."""
+    head = head_commit_sha(get_repo())
+    read_page_versions(path, head, worktree=False)
+    for candidate in prefetch_candidates(path):
+        try:
+            read_page_versions(candidate, head)
+        except (OSError, ValueError):
+            pass  # deleted, replaced by a folder or unreadable since it was recorded
+
+
+prefetcher = Prefetcher(prefetch_after)
+prefetcher.enabled = PREFETCH_LIMIT > 0
+
+
+@app.get("/api/file/neighbours")
+async def get_file_neighbours(path: str, limit: Optional[int] = None):
+    """Pages the server expects to be opened after ``path``; fetch them with /api/files."""
+    try:
+        page = normalize_relative_path(path)
+    except ValueError:
+        return JSONResponse({"error": "Invalid path"}, status_code=400)
+    return {"path": page, "paths": prefetch_candidates(page, None if limit is None else max(0, limit))}
+
+
+@app.post("/api/files")
+async def get_files(req: FilesRequest):
+    """
+    Several pages in one response: ``files`` maps each path to the fields of
+    /api/file plus ``head_content`` (null for files not in HEAD); paths that
+    cannot be read are listed in ``errors`` instead.
+    """
+    if len(req.paths) > MAX_FETCH_FILES:
+        return JSONResponse({"error": f"At most {MAX_FETCH_FILES} paths per request"}, status_code=400)
+    head = head_commit_sha(get_repo()) if req.head else None
+    files, errors = {}, {}
+    with span("read_pages"):
+        for path in req.paths:
+            try:
+                files[path] = read_page_versions(normalize_relative_path(path), head)
+            except FileNotFoundError:
+                errors[path] = "File not found"
+            except IsADirectoryError:
+                errors[path] = "Not a file"
+            except OSError as e:
+                errors[path] = f"Cannot read file: {e.strerror or e}"
+            except UnicodeDecodeError:
+                errors[path] = "Not a UTF-8 text file"
+            except ValueError:
+                errors[path] = "Invalid path"
+    return {"head": head, "files": files, "errors": errors}
+
+
+# ---------------------- DOCS CHECKER ----------------------
+def docs_checker() -> DocsChecker:
+    """Checker of the current root's .md pages."""
+    root = current_root()
+    return root.index("checker", lambda: DocsChecker(root.base_dir, shared_cache()))
+
+
+@app.get("/api/check")
+async def check_docs(path: str = ""):
+    """
+    Broken links, missing images and invalid front-matter of every page, or of
+    the pages under ``path`` (a page or a folder). Only pages changed since the
+    previous check are parsed again, so calling this after each save is cheap.
+    """
+    try:
+        prefix = normalize_relative_path(path) if path else ""
+    except ValueError:
+        return JSONResponse({"error": "Invalid path"}, status_code=400)
+    checker = docs_checker()
+    with span("check_docs"):
+        counters = checker.check(p for p, flags in docs_tree_journal().entries if not flags)
+    return {**counters, "problems": checker.problems("" if prefix == "." else prefix)}
+
+
+# ---------------------- OUTLINE ----------------------
+# Anchors are generated like the Sphinx build does, for headings up to myst_heading_anchors
+HEADING_ANCHORS = read_heading_anchors(os.path.join(SPHINX_SOURCE_DIR, "conf.py"))
+MAX_OUTLINE_MATCHES = 500  # headings per /api/outline search
+def outline_index() -> OutlineIndex:
+    """Outline index of the current root's .md pages."""
+    root = current_root()
+    return root.index("outline", lambda: OutlineIndex(root.base_dir, HEADING_ANCHORS, shared_cache()))
+
+
+@app.get("/api/outline")
+async def get_outline(path: List[str] = Query([]), q: str = "", limit: int = 50):
+    """
+    Headings with their line, level, anchor and ``(label)=`` target for the pages
+    under each ``path`` (a page or a folder, repeatable; every page without one).
+    With ``q``, only the headings matching it across those pages are returned,
+    best first, for jump-to-heading and link completion.
+    """
+    try:
+        prefixes = [normalize_relative_path(p) for p in path]
+    except ValueError:
+        return JSONResponse({"error": "Invalid path"}, status_code=400)
+    prefixes = [p for p in prefixes if p not in ("", ".")]
+    folders = tuple(p + "/" for p in prefixes)
+    pages = [p for p, flags in docs_tree_journal().entries
+             if not flags and p.endswith(".md") and (not prefixes or p in prefixes or p.startswith(folders))]
+    index = outline_index()
+    with span("outline"):
+        counters = index.refresh(pages, complete=not prefixes)
+    result = {**counters, "anchor_level": index.anchor_level}
+    if q:
+        result["matches"] = index.search(q, pages, max(1, min(limit, MAX_OUTLINE_MATCHES)))
+    else:
+        result["outlines"] = index.outlines(pages)
+    return result
+
+
+# ---------------------- EXPORT BUNDLES ----------------------
+exporters = {}  # docs root name -> Exporter of its rendered commits
+FULL_SHA_RE = re.compile(r"[0-9a-f]{40}")
+
+
+def root_exporter() -> Exporter:
+    root = current_root()
+    exporter = exporters.get(root.name)
+    if exporter is None:
+        store = BundleStore(os.path.join(root.state_dir, "exports"))
+        exporter = exporters.setdefault(root.name, Exporter(store))
+    return exporter
+
+
+def export_config_dir(root: DocsRoot) -> str:
+    """Sphinx config folder: repo-relative (read from each commit) when it is in the root's repository."""
+    rel = os.path.relpath(SPHINX_SOURCE_DIR, root.repo_dir)
+    return SPHINX_SOURCE_DIR if rel.startswith("..") else rel.replace(os.sep, "/")
+
+
+def export_status(commit: str):
+    try:
+        sha = get_repo().commit(commit).hexsha
+    except Exception as e:  # BadName, ValueError for an empty repository
+        return None, JSONResponse({"error": f"Unknown commit: {e}"}, status_code=400)
+    return sha, {**root_exporter().status(sha), "url": f"/export/{sha}/"}
+
+
+@app.post("/api/export")
+async def request_export(req: ExportRequest):
+    """Build the rendered docs of a commit in the background (no-op if already built)."""
+    sha, status = export_status(req.commit)
+    if sha is None:
+        return status
+    root = current_root()
+    status.update(root_exporter().request(
+        get_repo(), sha, docs_dir=root.docs_dir, config_dir=export_config_dir(root),
+        object_store=root.object_store(),
+    ))
+    return status
+
+
+@app.get("/api/export")
+async def get_export_status(commit: str = "HEAD"):
+    """State of a commit's bundle: missing, queued, building, failed or ready (with build details)."""
+    return export_status(commit)[1]
+
+
+@app.get("/api/exports")
+async def list_exports():
+    """Built bundles, newest first."""
+    return [{k: v for k, v in manifest.items() if k != "entries"}
+            for manifest in root_exporter().store.bundles()]
+
+
+@app.get("/export/{commit}")
+async def export_root_redirect(commit: str):
+    return RedirectResponse(f"/export/{commit}/")  # relative links of the pages need the slash
+
+
+@app.get("/export/{commit}/{path:path}")
+async def serve_export(commit: str, path: str, request: Request):
+    """
+    Serve a page of a commit's bundle, precompressed when the client accepts it.
+    ``commit`` may be a branch or short SHA; full SHA URLs are cached as immutable.
+    """
+    if FULL_SHA_RE.fullmatch(commit):
+        sha = commit
+    else:
+        try:
+            sha = get_repo().commit(commit).hexsha
+        except Exception:
+            return JSONResponse({"error": f"Unknown commit: {commit}"}, status_code=404)
+    try:
+        page = normalize_relative_path(path) if path else ""
+    except ValueError:
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    store = root_exporter().store
+    found = store.resolve(sha, "" if page == "." else page, request.headers.get("accept-encoding", ""))
+    if found is None:
+        error = "File not found" if store.has(sha) else "Commit not exported, POST /api/export first"
+        return JSONResponse({"error": error}, status_code=404)
+    file_path, encoding, media_type = found
+    headers = {
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "public, max-age=31536000, immutable" if sha == commit else "no-cache",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(file_path, media_type=media_type, headers=headers)
+
+
+# ---------------------- COLLABORATION ----------------------
+collab_relays = {}  # docs root name -> CollabRelay
+COLLAB_STATUS_INTERVAL = 2.0  # seconds between room status messages
+
+
+def flush_collab_room(root: DocsRoot, room: str, text: str):
+    """
+    Write a room's text to its page (runs in the relay's flush thread). Rooms are
+    named "<repo>/<branch>/<commit>/<file>" by MystEditorGit; only rooms opened
+    at the HEAD commit of the checked-out branch are based on the working tree.
+    A room opened at an older commit holds historical text and is never flushed.
+    """
+    token = use_root(root)
+    try:
+        repo = root.repo()
+        if repo.head.is_detached:
+            return
+        prefix = f"{room.split('/', 1)[0]}/{repo.active_branch.name}/"
+        commit, _, path = room[len(prefix):].partition("/") if room.startswith(prefix) else ("", "", "")
+        if len(commit) < 7 or not repo.head.commit.hexsha.startswith(commit) or not path.endswith(".md"):
+            return
+        with root.write_lock():
+            write_doc_file(safe_join(root.base_dir, path), text)
+    finally:
+        reset_root(token)
+
+
+def collab_room_is_stale(root: DocsRoot, room: str) -> bool:
+    """
+    True if a room named "<repo>/<branch>/<commit>/<file>" was opened at a commit
+    that is no longer the tip of its branch; nobody opens it again, so the relay
+    deletes its files. Rooms that do not match a local branch are left alone.
+    """
+    rest = room.partition("/")[2]
+    for head in root.repo().heads:
+        if rest.startswith(head.name + "/"):
+            commit = rest[len(head.name) + 1:].partition("/")[0]
+            if len(commit) >= 7:
+                return not head.commit.hexsha.startswith(commit)
+    return False
+
+
+def collab_relay(root: DocsRoot) -> CollabRelay:
+    relay = collab_relays.get(root.name)
+    if relay is None:
+        relay = collab_relays.setdefault(root.name, CollabRelay(
+            os.path.join(root.state_dir, "collab"), on_flush=functools.partial(flush_collab_room, root),
+            is_stale=functools.partial(collab_room_is_stale, root)))
+    return relay
+
+
+@app.websocket("/ws/{room:path}")
+async def collaboration_socket(websocket: WebSocket, room: str):
+    """
+    y-websocket endpoint (wsUrl "ws://<host>/ws"). "<wsUrl>/<repo>?status" streams
+    the rooms of a repo with changes not yet written to disk.
+    """
+    try:
+        root = registry.get(websocket.query_params.get("root"))
+    except KeyError:
+        await websocket.close(code=1008)
+        return
+    relay = collab_relay(root)
+    await websocket.accept()
+    if "status" in websocket.query_params:
+        prefix = room.rstrip("/") + "/"
+        while True:
+            try:
+                await websocket.send_text(json.dumps(relay.status(prefix)))
+                event = await asyncio.wait_for(websocket.receive(), timeout=COLLAB_STATUS_INTERVAL)
+                if event["type"] == "websocket.disconnect":
+                    return
+            except asyncio.TimeoutError:
+                continue
+            except Exception:
+                return
+    try:
+        await relay.serve(websocket, room)
+    except ImportError:
+        print("Warning: collaborative editing needs pycrdt (pip install pycrdt)")
+        await websocket.close(code=1011)
+
+
+@app.get("/api/git-remote-status")
+async def git_remote_status():
+    """Ahead/behind counts against origin from the background tracker, without fetching."""
+    try:
+        return remote_tracker.status(current_root())
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
 # Mount frontend
+_routes_started = record_phase("module_setup", _IMPORT_STARTED)
 app.mount("/", StaticFiles(directory=STATIC_FOLDER, html=True), name="frontend")
+record_phase("mount_frontend", _routes_started)
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=5000, reload=True)
+
+    parser = argparse.ArgumentParser(description="MyST editor server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--prod", action="store_true",
+                        help="production mode: no auto-reload, serve the already imported app")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (implies --prod); git writes and caches are shared")
+    parser.add_argument("--roots", default=None,
+                        help="JSON file listing the docs roots to serve (default: ../../docs only)")
+    parser.add_argument("--server-timing", action="store_true",
+                        help="add Server-Timing headers with route spans and git/fs call counts")
+    parser.add_argument("--profile-slow", type=float, default=None, metavar="MS",
+                        help="keep a profile of every request slower than MS milliseconds")
+    parser.add_argument("--profile-mode", choices=["sample", "cprofile"], default="sample")
+    parser.add_argument("--warmup", choices=["on", "off"], default=None,
+                        help="warm caches in the background after startup (default: on)")
+    parser.add_argument("--fetch-interval", type=float, default=None, metavar="SECONDS",
+                        help="fetch origin in the background every SECONDS (default: 60, 0 disables)")
+    parser.add_argument("--large-file-threshold", type=int, default=None, metavar="BYTES",
+                        help="keep uploads of at least BYTES in the object store (default: off)")
+    parser.add_argument("--object-store", default=None, metavar="DIR",
+                        help="shared object store directory that clones can read (default: <repo>/.git/lfs/objects, "
+                             "used only for repositories without a remote)")
+    parser.add_argument("--cache-budget-mb", type=float, default=None, metavar="MB",
+                        help="memory budget shared by all in-process caches (default: 256, 0 = unlimited)")
+    parser.add_argument("--cache-policy", choices=["lru", "lfu"], default=None,
+                        help="how entries are evicted across caches when over budget (default: lru)")
+    parser.add_argument("--prefetch", type=int, default=None, metavar="PAGES",
+                        help="pages to warm in the background after each opened page (default: 8, 0 disables)")
+    args = parser.parse_args()
+
+    if args.object_store:
+        os.environ["MYST_EDITOR_OBJECT_STORE"] = os.path.abspath(args.object_store)
+    if args.roots:
+        os.environ["MYST_EDITOR_ROOTS"] = os.path.abspath(args.roots)
+    if args.roots or args.object_store:
+        configure_roots(os.environ.get("MYST_EDITOR_ROOTS"))
+
+    if args.profile_slow is not None:
+        os.environ["MYST_EDITOR_PROFILE_MS"] = str(args.profile_slow)
+        os.environ["MYST_EDITOR_PROFILE_MODE"] = args.profile_mode
+        configure_profiling()
+
+    if args.server_timing:
+        SERVER_TIMING = True
+        os.environ["MYST_EDITOR_SERVER_TIMING"] = "1"
+
+    if args.warmup is not None:
+        WARMUP_ON_STARTUP = args.warmup == "on"
+        os.environ["MYST_EDITOR_WARMUP"] = "1" if WARMUP_ON_STARTUP else "0"
+
+    if args.fetch_interval is not None:
+        remote_tracker.interval = args.fetch_interval
+        os.environ["MYST_EDITOR_FETCH_INTERVAL"] = str(args.fetch_interval)
+
+    if args.large_file_threshold is not None:
+        LARGE_FILE_THRESHOLD = args.large_file_threshold
+        os.environ["MYST_EDITOR_LARGE_FILE_THRESHOLD"] = str(args.large_file_threshold)
+
+    if args.cache_budget_mb is not None or args.cache_policy:
+        if args.cache_budget_mb is not None:
+            os.environ["MYST_EDITOR_CACHE_BUDGET_MB"] = str(args.cache_budget_mb)
+        if args.cache_policy:
+            os.environ["MYST_EDITOR_CACHE_POLICY"] = args.cache_policy
+        configure_cache_budget()
+
+    if args.prefetch is not None:
+        PREFETCH_LIMIT = args.prefetch
+        prefetcher.enabled = PREFETCH_LIMIT > 0
+        os.environ["MYST_EDITOR_PREFETCH"] = str(args.prefetch)
+
+    if args.workers > 1:
+        # Workers import the module by name; coordination.py keeps their git writes and caches consistent
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+    elif args.prod:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    else:
+        # Only watch the server sources; watching the whole checkout makes reloads slow
+        server_dir = os.path.dirname(os.path.abspath(__file__))
+        uvicorn.run("app:app", host=args.host, port=args.port, reload=True, reload_dirs=[server_dir])
@@ -0,0 +1,444 @@
+"""Benchmark harness for the editor server.
+
+Generate a synthetic docs repository, start the server on it and drive the
+main read/write routes with concurrent clients::
+
+    python benchmark.py generate --out /tmp/bench-repo --docs 2000 --depth 4 --images 500 --commits 300 --branches 4
+    python benchmark.py run --repo /tmp/bench-repo --concurrency 8 --requests 200 --label my-change
+    python benchmark.py compare bench_results/a.json bench_results/b.json
+    python benchmark.py paths --iterations 200000 --fuzz 100000
+
+``run`` prints p50/p99 latency and throughput per scenario and stores the
+results as JSON in ``bench_results/``. Each run is compared with the previous
+result file, so regressions between versions stand out.
+
+``paths`` needs no server: it times ``pathguard`` against the previous
+``safe_join`` implementation and fuzzes it with random inputs.
+
+Only the standard library is used on the client side.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(SERVER_DIR, "bench_results")
+DOCS_DIR = "docs"
+REGRESSION_THRESHOLD = 0.15  # flag scenarios whose p50 or p99 got 15% slower
+
+WORDS = ("render", "shot", "asset", "pipeline", "layout", "camera", "light", "texture",
+         "review", "publish", "version", "scene", "cache", "frame", "node", "artist")
+
+
+# ---------------------- REPO GENERATOR ----------------------
+def _paragraph(rng, words=40):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _doc_paths(count, depth, rng):
+    """Spread ``count`` docs over a folder tree ``depth`` levels deep (about 10 docs per folder)."""
+    folders = max(1, count // 10)
+    fanout = max(2, round(folders ** (1 / max(depth, 1))))
+    paths = []
+    for i in range(count):
+        parts, n = [], i // 10
+        for level in range(depth):
+            parts.append(f"section_{level}_{n % fanout}")
+            n //= fanout
+        paths.append("/".join(parts + [f"page_{i:05d}.md"]))
+    rng.shuffle(paths)
+    return paths
+
+
+def _doc_content(rng, title, links, images):
+    lines = [f"# {title}", "", _paragraph(rng)]
+    for h in range(rng.randint(2, 6)):
+        lines += ["", f"## {title} part {h}", "", _paragraph(rng)]
+        if links and rng.random() < 0.5:
+            target = rng.choice(links)
+            lines.append(f"See [{os.path.basename(target)}]({target}).")
+        if images and rng.random() < 0.3:
+            lines.append(f"![screenshot](/_static/{rng.choice(images)})")
+    return "\n".join(lines) + "\n"
+
+
+def _fake_png(rng, size):
+    return b"\x89PNG\r\n\x1a\n" + bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def generate_repo(out, docs=1000, depth=3, images=200, commits=100, branches=3, seed=1):
+    """Create a git repo at ``out`` using ``git fast-import`` (fast even for thousands of commits)."""
+    rng = random.Random(seed)
+    if os.path.exists(os.path.join(out, ".git")):
+        raise SystemExit(f"{out} already contains a git repo")
+    os.makedirs(out, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", out], check=True)
+
+    doc_paths = _doc_paths(docs, depth, rng)
+    image_paths = [f"images/group_{i % 20}/shot_{i:05d}.png" for i in range(images)]
+    stamp = 1700000000
+    chunks = []
+    mark = 0
+
+    def data(payload: bytes):
+        chunks.append(b"data %d\n" % len(payload))
+        chunks.append(payload + b"\n")
+
+    def commit(ref, message, changes, parent=None):
+        nonlocal mark, stamp
+        mark += 1
+        stamp += 60
+        chunks.append(f"commit {ref}\nmark :{mark}\n".encode())
+        chunks.append(f"committer Bench <bench@example.com> {stamp} +0000\n".encode())
+        data(message.encode())
+        if parent:
+            chunks.append(f"from :{parent}\n".encode())
+        for path, payload in changes:
+            chunks.append(f"M 100644 inline {path}\n".encode())
+            data(payload)
+        return mark
+
+    initial = [(f"{DOCS_DIR}/{p}", _doc_content(rng, f"Page {i}", doc_paths, image_paths).encode())
+               for i, p in enumerate(doc_paths)]
+    initial += [(f"{DOCS_DIR}/_static/{p}", _fake_png(rng, rng.randint(512, 4096))) for p in image_paths]
+    head = commit("refs/heads/main", "Initial docs", initial)
+    history = [head]
+    for n in range(1, commits):
+        touched = rng.sample(doc_paths, min(len(doc_paths), rng.randint(1, 5)))
+        changes = [(f"{DOCS_DIR}/{p}", _doc_content(rng, f"Revision {n}", doc_paths, image_paths).encode())
+                   for p in touched]
+        head = commit("refs/heads/main", f"Edit {len(touched)} pages (#{n})", changes, head)
+        history.append(head)
+    for b in range(branches):
+        branch_head = rng.choice(history)
+        for n in range(rng.randint(1, 5)):
+            path = rng.choice(doc_paths)
+            branch_head = commit(f"refs/heads/branch-{b}", f"Branch {b} edit {n}",
+                                 [(f"{DOCS_DIR}/{path}", _doc_content(rng, f"Branch {b}", [], []).encode())],
+                                 branch_head)
+
+    subprocess.run(["git", "fast-import", "--quiet"], input=b"".join(chunks), cwd=out, check=True)
+    subprocess.run(["git", "checkout", "-q", "-f", "main"], cwd=out, check=True)
+    with open(os.path.join(out, ".git", "bench_params.json"), "w", encoding="utf-8") as f:
+        json.dump({"docs": docs, "depth": depth, "images": images, "commits": commits,
+                   "branches": branches, "seed": seed, "doc_paths": sorted(doc_paths)}, f)
+    subprocess.run(["git", "update-index", "--refresh", "-q"], cwd=out)
+    print(f"Generated {docs} docs, {images} images, {commits} commits, {branches} branches in {out}")
+
+
+# ---------------------- SERVER ----------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(repo, workers=1, extra_args=()):
+    """Start app.py on ``repo`` in production mode and wait until it answers."""
+    port = _free_port()
+    roots_file = os.path.join(repo, ".git", "bench_roots.json")
+    with open(roots_file, "w", encoding="utf-8") as f:
+        json.dump({"roots": {"bench": {"repo": os.path.abspath(repo), "docs_dir": DOCS_DIR}}}, f)
+    cmd = [sys.executable, "app.py", "--prod", "--host", "127.0.0.1", "--port", str(port),
+           "--roots", roots_file, "--warmup", "off"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    cmd += list(extra_args)
+    proc = subprocess.Popen(cmd, cwd=SERVER_DIR)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + "/api/startup", timeout=1).read()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                raise SystemExit("Server exited during startup")
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("Server did not start within 30 seconds")
+
+
+def request(url, method="GET", body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method,
+                                 headers={"Content-Type": "application/json"} if data else {})
+    with urllib.request.urlopen(req, timeout=120) as resp:  # raises HTTPError on 4xx/5xx
+        return resp.read()
+
+
+# ---------------------- SCENARIOS ----------------------
+def build_scenarios(url, repo):
+    with open(os.path.join(repo, ".git", "bench_params.json"), encoding="utf-8") as f:
+        params = json.load(f)
+    doc_paths = params["doc_paths"]
+    revs = subprocess.run(["git", "rev-list", "--max-count=50", "main"], cwd=repo,
+                          capture_output=True, text=True, check=True).stdout.split()
+    head, old = revs[0], revs[-1]
+    quote = urllib.parse.quote
+
+    def pick(rng):
+        return rng.choice(doc_paths)
+
+    return {
+        "tree": lambda rng: request(f"{url}/api/tree"),
+        "tree_compact": lambda rng: request(f"{url}/api/tree?format=compact"),
+        "file": lambda rng: request(f"{url}/api/file?path={quote(pick(rng))}"),
+        "search_file": lambda rng: request(f"{url}/search-file", "POST", {"filename": pick(rng)}),
+        "get_file_from_git": lambda rng: request(f"{url}/get-file-from-git", "POST", {
+            "filename": pick(rng), "branch_left": "main", "commit_left": head,
+            "branch_right": "main", "commit_right": old}),
+        "tree_union": lambda rng: request(f"{url}/api/tree-union?commit_left={head}&commit_right={old}"),
+        "tree_local_diff": lambda rng: request(f"{url}/api/tree-local-diff"),
+        "save": lambda rng: request(f"{url}/api/file?path={quote(pick(rng))}", "POST", {
+            "content": f"# Bench save\n\n{_paragraph(rng)}\n"}),
+    }, params
+
+
+def run_scenario(fn, total, concurrency, seed):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        rng = random.Random(seed * 100003 + i)
+        started = time.perf_counter()
+        try:
+            fn(rng)
+            ok = True
+        except (OSError, ValueError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(q):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+    }
+
+
+def _git_revision():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def run_benchmark(repo, url=None, concurrency=8, total=200, scenarios=None, label=None,
+                  workers=1, seed=1, results_dir=RESULTS_DIR):
+    # The reset below discards uncommitted docs: only ever do it in a generated repository
+    if not os.path.isfile(os.path.join(repo, ".git", "bench_params.json")):
+        sys.exit(f"{repo} was not created by 'benchmark.py generate'; refusing to reset its working tree")
+    # Start from the committed state; the save scenario of earlier runs dirtied the working tree
+    subprocess.run(["git", "checkout", "-q", "-f", "main"], cwd=repo, check=True)
+    subprocess.run(["git", "clean", "-q", "-f", "-d", DOCS_DIR], cwd=repo, check=True)
+    proc = None
+    if url is None:
+        proc, url = start_server(repo, workers)
+    try:
+        available, params = build_scenarios(url, repo)
+        names = scenarios or list(available)
+        results = {}
+        for name in names:
+            available[name](random.Random(seed))  # warm the route once before timing
+            results[name] = run_scenario(available[name], total, concurrency, seed)
+            r = results[name]
+            print(f"{name:20s} p50={r['p50_ms']}ms p99={r['p99_ms']}ms "
+                  f"{r['throughput_rps']} req/s errors={r['errors']}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    record = {
+        "label": label or _git_revision() or "unlabelled",
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "concurrency": concurrency,
+        "requests": total,
+        "workers": workers,
+        "repo": {k: v for k, v in params.items() if k != "doc_paths"},
+        "results": results,
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    previous = sorted(f for f in os.listdir(results_dir) if f.endswith(".json"))
+    out = os.path.join(results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{record['label']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"Saved results to {out}")
+    if previous:
+        compare(os.path.join(results_dir, previous[-1]), out)
+    return record
+
+
+def compare(before_path, after_path, threshold=REGRESSION_THRESHOLD):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    if before.get("repo") != after.get("repo"):
+        print("Warning: the two runs used different synthetic repos")
+    print(f"Comparing {before['label']} -> {after['label']}")
+    regressions = []
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p99_ms"):
+            if old[key] and new[key]:
+                change = (new[key] - old[key]) / old[key]
+                cells.append(f"{key}={old[key]}->{new[key]} ({change:+.0%})")
+                if change > threshold:
+                    regressions.append(f"{name} {key}")
+        print(f"  {name:20s} " + "  ".join(cells))
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+    return regressions
+
+
+# ---------------------- path validation ----------------------
+def _legacy_safe_join(base, *paths):
+    """The pre-pathguard implementation, kept as the micro-benchmark baseline."""
+    def normalize(path):
+        path = path.replace("\\", "/").strip()
+        while path.startswith("../") or path.startswith("./") or path.startswith("/"):
+            path = path.lstrip("./").lstrip("/")
+        path = os.path.normpath(path).replace("\\", "/")
+        if ".." in path.split("/"):
+            raise ValueError("Invalid path: directory traversal detected")
+        return path
+    final_path = os.path.abspath(os.path.join(base, *[normalize(p) for p in paths]))
+    if not final_path.startswith(base):
+        raise ValueError("Unsafe path")
+    return final_path
+
+
+PATH_SAMPLES = [
+    "guide/intro.md", "./guide/../guide/intro.md", "a/b/c/d/e/f/page.md", "images\\logo.png",
+    "../../etc/passwd", "/abs/path.md", "guide//nested///x.md", "x/../../y", "", ".",
+]
+FUZZ_ALPHABET = ["a", "b", "..", ".", "/", "\\", "//", "x.md", " ", "\x00", "~", ":"]
+
+
+def bench_paths(iterations=200000, fuzz=0, seed=1):
+    sys.path.insert(0, SERVER_DIR)
+    from pathguard import normalize_relative_path, safe_join, validate_paths, is_within
+
+    base = os.path.abspath(os.path.join(SERVER_DIR, "docs"))
+    samples = (PATH_SAMPLES * (iterations // len(PATH_SAMPLES) + 1))[:iterations]
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        print(f"  {label:28s} {elapsed * 1e9 / iterations:8.0f} ns/path")
+
+    def each(join):
+        def loop():
+            for p in samples:
+                try:
+                    join(base, p)
+                except ValueError:
+                    pass
+        return loop
+
+    print(f"{iterations} paths against {base}")
+    timed("legacy safe_join", each(_legacy_safe_join))
+    timed("pathguard safe_join", each(safe_join))
+    timed("pathguard validate_paths", lambda: validate_paths(base, samples))
+
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(fuzz):
+        path = "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 12)))
+        try:
+            joined = safe_join(base, path)
+            normalized = normalize_relative_path(path)
+        except ValueError:
+            continue
+        if not is_within(base, joined) or normalize_relative_path(normalized) != normalized:
+            failures += 1
+            print(f"  invariant broken for {path!r}: {joined!r}")
+    if fuzz:
+        print(f"Fuzzed {fuzz} random paths, {failures} failures")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="create a synthetic docs repository")
+    gen.add_argument("--out", required=True)
+    gen.add_argument("--docs", type=int, default=1000)
+    gen.add_argument("--depth", type=int, default=3)
+    gen.add_argument("--images", type=int, default=200)
+    gen.add_argument("--commits", type=int, default=100)
+    gen.add_argument("--branches", type=int, default=3)
+    gen.add_argument("--seed", type=int, default=1)
+
+    run = sub.add_parser("run", help="benchmark the server against a generated repository")
+    run.add_argument("--repo", required=True)
+    run.add_argument("--url", help="use an already running server instead of starting one")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    run.add_argument("--scenario", action="append", help="run only these scenarios")
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--label")
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--results-dir", default=RESULTS_DIR)
+
+    cmp_ = sub.add_parser("compare", help="compare two saved result files")
+    cmp_.add_argument("before")
+    cmp_.add_argument("after")
+
+    paths = sub.add_parser("paths", help="micro-benchmark and fuzz the path validation helpers")
+    paths.add_argument("--iterations", type=int, default=200000)
+    paths.add_argument("--fuzz", type=int, default=0, help="number of random paths to check")
+    paths.add_argument("--seed", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_repo(args.out, args.docs, args.depth, args.images, args.commits, args.branches, args.seed)
+    elif args.command == "run":
+        run_benchmark(args.repo, args.url, args.concurrency, args.requests, args.scenario,
+                      args.label, args.workers, args.seed, args.results_dir)
+    elif args.command == "paths":
+        sys.exit(1 if bench_paths(args.iterations, args.fuzz, args.seed) else 0)
+    else:
+        regressions = compare(args.before, args.after)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
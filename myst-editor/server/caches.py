@@ -0,0 +1,226 @@
+"""In-process caches with size accounting.
+
+Every ``LRUCache`` registers itself in ``cache_registry``, which holds all of
+them to one global memory budget: when the total grows past it, entries are
+evicted across caches, globally least recently used first (policy ``"lru"``)
+or least used among the oldest entries of each cache (``"lfu"``). Each cache
+also keeps its own ``max_bytes`` limit, and docs roots their per-root budget.
+"""
+import fnmatch
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+DEFAULT_GLOBAL_BUDGET = 256 * 1024 * 1024  # bytes across all caches of the process; 0 = unlimited
+LFU_SAMPLE = 8  # oldest entries per cache considered by the "lfu" policy
+POLICIES = ("lru", "lfu")
+
+
+def approx_size(value) -> int:
+    """Rough byte size of a cached value (strings, bytes and JSON-like containers)."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 49
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total size of its values in bytes."""
+
+    def __init__(self, name: str, max_bytes: int, sizeof=approx_size, registry=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> [value, size, last used (monotonic), uses]
+        self._lock = threading.Lock()
+        self.registry = cache_registry if registry is None else registry
+        self.registry.register(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            entry[2] = time.monotonic()
+            entry[3] += 1
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = [value, size, time.monotonic(), 0]
+            self.bytes += size
+            self._shrink(self.max_bytes)
+        self.registry.enforce()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry[1]
+            return entry[0]
+
+    def _shrink(self, limit: int):
+        while self.bytes > limit and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry[1]
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._shrink(max_bytes)
+
+    def shrink(self, limit: int) -> int:
+        """Evict least recently used entries until at most ``limit`` bytes remain; returns the bytes freed."""
+        with self._lock:
+            before = self.bytes
+            self._shrink(limit)
+            return before - self.bytes
+
+    def oldest(self, count: int) -> list:
+        """``(key, last used, uses)`` of the ``count`` least recently used entries."""
+        with self._lock:
+            result = []
+            for key, entry in self._entries.items():
+                if len(result) >= count:
+                    break
+                result.append((key, entry[2], entry[3]))
+            return result
+
+    def evict(self, key) -> int:
+        """Drop one entry on behalf of the global budget; returns the bytes freed."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return 0
+            self.bytes -= entry[1]
+            self.evictions += 1
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CacheRegistry:
+    """All live caches of the process and the global budget they share."""
+
+    def __init__(self, budget: int = DEFAULT_GLOBAL_BUDGET, policy: str = "lru"):
+        self.budget = budget
+        self.policy = policy
+        self.evictions = 0  # entries evicted to honour the global budget
+        self._caches = weakref.WeakValueDictionary()  # name -> cache
+        self._lock = threading.Lock()
+
+    def register(self, cache):
+        self._caches[cache.name] = cache
+
+    def caches(self, pattern: str = "*") -> list:
+        """Caches whose name (``<root>:<cache>``) matches a glob pattern, by name."""
+        return [cache for name, cache in sorted(self._caches.items()) if fnmatch.fnmatchcase(name, pattern)]
+
+    def total_bytes(self) -> int:
+        return sum(cache.bytes for cache in list(self._caches.values()))
+
+    def _victim(self):
+        """``(cache, key)`` of the entry to evict next under the current policy."""
+        best = None
+        sample = 1 if self.policy == "lru" else LFU_SAMPLE
+        for cache in list(self._caches.values()):
+            for key, last_used, uses in cache.oldest(sample):
+                rank = (last_used,) if self.policy == "lru" else (uses, last_used)
+                if best is None or rank < best[0]:
+                    best = (rank, cache, key)
+        return best[1:] if best else None
+
+    def enforce(self):
+        """Evict across caches until the total fits the budget."""
+        if not self.budget or self.total_bytes() <= self.budget:
+            return
+        with self._lock:
+            excess = self.total_bytes() - self.budget
+            while excess > 0:
+                victim = self._victim()
+                if victim is None:
+                    break
+                freed = victim[0].evict(victim[1])
+                excess -= freed
+                self.evictions += 1
+
+    def configure(self, budget: int = None, policy: str = None):
+        if policy is not None:
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown eviction policy: {policy}")
+            self.policy = policy
+        if budget is not None:
+            self.budget = max(0, budget)
+        self.enforce()
+
+    def stats(self) -> dict:
+        caches = {name: cache.stats() for name, cache in sorted(self._caches.items())}
+        hits = sum(s["hits"] for s in caches.values())
+        lookups = hits + sum(s["misses"] for s in caches.values())
+        return {
+            "budget": self.budget,
+            "policy": self.policy,
+            "bytes": sum(s["bytes"] for s in caches.values()),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "global_evictions": self.evictions,
+            "caches": caches,
+        }
+
+    def render(self) -> str:
+        """Cache gauges and counters in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = [
+            "# HELP myst_cache_budget_bytes Global memory budget of the in-process caches (0 = unlimited).",
+            "# TYPE myst_cache_budget_bytes gauge",
+            f"myst_cache_budget_bytes {stats['budget']}",
+        ]
+        for metric, field, kind, help_text in (
+                ("myst_cache_bytes", "bytes", "gauge", "Approximate size of a cache."),
+                ("myst_cache_entries", "entries", "gauge", "Entries in a cache."),
+                ("myst_cache_hits_total", "hits", "counter", "Cache lookups that found an entry."),
+                ("myst_cache_misses_total", "misses", "counter", "Cache lookups that found nothing."),
+                ("myst_cache_evictions_total", "evictions", "counter", "Entries evicted from a cache.")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, cache_stats in stats["caches"].items():
+                lines.append(f'{metric}{{cache="{name}"}} {cache_stats[field]}')
+        return "\n".join(lines) + "\n"
+
+
+cache_registry = CacheRegistry()
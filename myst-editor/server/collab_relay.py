@@ -0,0 +1,390 @@
+"""Yjs collaboration relay speaking the ``y-websocket`` protocol.
+
+Each room (the ``room`` of a ``WebsocketProvider``) holds one server-side Yjs
+document (``pycrdt``). Clients sync against it and their updates are applied
+to it and relayed to the other clients of the room:
+
+- Updates arriving within ``broadcast_delay`` are merged and sent as one
+  message. Awareness (cursors, user names) is relayed immediately.
+- Every update is appended to an on-disk log. The log is compacted into a
+  single snapshot (the encoded document state) every ``snapshot_interval``
+  seconds, or sooner once it grows past ``max_log_bytes``, and when the last
+  client leaves. The room is then unloaded from memory.
+- At every compaction the ``codemirror`` text is handed to ``on_flush`` so
+  the server can write it to the page's ``.md`` file. Flushes run one at a
+  time in a worker thread, each writing the room's latest text.
+- When the last client leaves a room that ``is_stale`` reports as out of date
+  (its commit is no longer the tip of its branch), its files are deleted once
+  the final flush is done. Files of rooms unused for ``max_room_age`` seconds
+  are swept as well, so the directory does not grow with every commit.
+- Each connection has a bounded send queue. A client too slow to drain it is
+  disconnected and resyncs on reconnect, so no room buffers without limit.
+
+Rooms live in one process: with several uvicorn workers, clients of the same
+room must reach the same worker. ``pycrdt`` is imported when the first room is
+opened, so the rest of the server runs without it.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import time
+
+MSG_SYNC = 0
+MSG_AWARENESS = 1
+MSG_QUERY_AWARENESS = 3
+SYNC_STEP1 = 0
+SYNC_STEP2 = 1
+SYNC_UPDATE = 2
+EMPTY_UPDATE = b"\x00\x00"
+
+TEXT_NAME = "codemirror"  # Y.Text used by collaboration.js
+DEFAULT_SNAPSHOT_INTERVAL = 10.0  # seconds
+DEFAULT_MAX_LOG_BYTES = 1024 * 1024
+DEFAULT_BROADCAST_DELAY = 0.02  # seconds
+DEFAULT_MAX_ROOM_AGE = 7 * 24 * 3600  # seconds without a write before a closed room's files are swept
+SWEEP_INTERVAL = 3600.0  # seconds between sweeps
+SEND_QUEUE_LIMIT = 256  # messages per connection
+HEARTBEAT_INTERVAL = 2.5  # collaboration.js reconnects after 5 s without a message
+
+
+# ---------------------- lib0 encoding ----------------------
+def write_var_uint(n: int) -> bytes:
+    out = bytearray()
+    while n > 0x7F:
+        out.append(0x80 | (n & 0x7F))
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def read_var_uint(data: bytes, pos: int):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def write_var_bytes(data: bytes) -> bytes:
+    return write_var_uint(len(data)) + data
+
+
+def read_var_bytes(data: bytes, pos: int):
+    length, pos = read_var_uint(data, pos)
+    return data[pos:pos + length], pos + length
+
+
+def sync_message(sync_type: int, payload: bytes) -> bytes:
+    return write_var_uint(MSG_SYNC) + write_var_uint(sync_type) + write_var_bytes(payload)
+
+
+def awareness_message(states: dict) -> bytes:
+    """``states``: client id -> (clock, JSON state string, "null" once removed)."""
+    body = bytearray(write_var_uint(len(states)))
+    for client_id, (clock, state) in states.items():
+        body += write_var_uint(client_id) + write_var_uint(clock) + write_var_bytes(state.encode("utf-8"))
+    return write_var_uint(MSG_AWARENESS) + write_var_bytes(bytes(body))
+
+
+def parse_awareness(update: bytes) -> dict:
+    count, pos = read_var_uint(update, 0)
+    states = {}
+    for _ in range(count):
+        client_id, pos = read_var_uint(update, pos)
+        clock, pos = read_var_uint(update, pos)
+        state, pos = read_var_bytes(update, pos)
+        states[client_id] = (clock, state.decode("utf-8"))
+    return states
+
+
+# ---------------------- rooms ----------------------
+class Connection:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_LIMIT)
+        self.client_ids = set()  # awareness ids announced over this connection
+        self.closed = False
+
+    def send(self, message: bytes):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow: drop what is queued and close, the client resyncs on reconnect
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def pump(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                await self.websocket.close(code=1013)
+                return
+            await self.websocket.send_bytes(message)
+
+
+class Room:
+    def __init__(self, name: str, directory: str):
+        from pycrdt import Doc
+        self.name = name
+        stem = os.path.join(directory, hashlib.sha1(name.encode("utf-8")).hexdigest())
+        self.snapshot_path = stem + ".snapshot"
+        self.log_path = stem + ".log"
+        self.doc = Doc()
+        self.connections = set()
+        self.awareness = {}  # client id -> (clock, state)
+        self.pending = []  # (update, origin) waiting for the next broadcast
+        self.log_bytes = 0
+        self.changed = False  # updates since the last compaction
+        self.last_flushed_text = None
+        self.flush_text = None  # latest text handed to on_flush
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                self.doc.apply_update(f.read())
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                data = f.read()
+            pos = 0
+            while pos < len(data):
+                try:
+                    update, pos = read_var_bytes(data, pos)
+                    self.doc.apply_update(update)
+                except (IndexError, ValueError):
+                    break  # torn write at the end of the log
+            self.log_bytes = len(data)
+            self.changed = True
+
+    def apply(self, update: bytes, origin):
+        self.doc.apply_update(update)
+        record = write_var_bytes(update)
+        with open(self.log_path, "ab") as f:
+            f.write(record)
+        self.log_bytes += len(record)
+        self.pending.append((update, origin))
+        self.changed = True
+
+    def text(self):
+        if TEXT_NAME not in self.doc.keys():
+            return None
+        from pycrdt import Text
+        return str(self.doc.get(TEXT_NAME, type=Text))
+
+    def discard(self):
+        """Delete the room's snapshot and log."""
+        for path in (self.snapshot_path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def compact(self):
+        """Replace the update log by one snapshot of the document state."""
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.doc.get_update())
+        os.replace(tmp, self.snapshot_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.log_bytes = 0
+        self.changed = False
+
+
+class CollabRelay:
+    def __init__(self, directory: str, on_flush=None, is_stale=None,
+                 snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+                 max_log_bytes: int = DEFAULT_MAX_LOG_BYTES,
+                 broadcast_delay: float = DEFAULT_BROADCAST_DELAY,
+                 max_room_age: float = DEFAULT_MAX_ROOM_AGE):
+        self.directory = directory
+        self.on_flush = on_flush  # callable(room name, text)
+        self.is_stale = is_stale  # callable(room name) -> bool, run in the flush thread
+        self.snapshot_interval = snapshot_interval
+        self.max_log_bytes = max_log_bytes
+        self.broadcast_delay = broadcast_delay
+        self.max_room_age = max_room_age
+        self.rooms = {}
+        self._maintenance = None
+        self._closing = set()  # tasks retiring closed rooms
+        self._last_sweep = 0.0
+        self._flusher = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="collab-flush")
+
+    def room(self, name: str) -> Room:
+        room = self.rooms.get(name)
+        if room is None:
+            os.makedirs(self.directory, exist_ok=True)
+            room = self.rooms[name] = Room(name, self.directory)
+        return room
+
+    # -- persistence --
+    def checkpoint(self, room: Room):
+        """Compact the room's log and queue its text for ``on_flush`` if it changed."""
+        if not room.changed:
+            return
+        room.compact()
+        text = room.text()
+        if self.on_flush and text is not None and text != room.last_flushed_text:
+            room.flush_text = text
+            asyncio.get_running_loop().run_in_executor(self._flusher, self._flush, room)
+
+    def _flush(self, room: Room):
+        # Runs in the flusher thread; queued flushes of a room all write its latest text
+        text = room.flush_text
+        if text is None or text == room.last_flushed_text:
+            return
+        try:
+            self.on_flush(room.name, text)
+            room.last_flushed_text = text
+        except Exception as e:
+            print(f"Warning: could not flush collaboration room '{room.name}': {e}")
+
+    async def _retire(self, room: Room):
+        """After the final flush of a closed room: delete its files if stale, then sweep old rooms."""
+        loop = asyncio.get_running_loop()
+        if self.is_stale is not None:
+            # Queued behind the room's last flush; is_stale may read git, so not on the event loop
+            try:
+                stale = await loop.run_in_executor(self._flusher, self.is_stale, room.name)
+            except Exception as e:
+                print(f"Warning: could not check collaboration room '{room.name}': {e}")
+                stale = False
+            if stale and room.name not in self.rooms:
+                room.discard()
+                print(f"Deleted collaboration room '{room.name}': its commit is no longer the branch tip")
+        if self.max_room_age > 0 and time.monotonic() - self._last_sweep >= SWEEP_INTERVAL:
+            self._last_sweep = time.monotonic()
+            old = await loop.run_in_executor(self._flusher, self._old_room_files)
+            open_files = {path for r in self.rooms.values() for path in (r.snapshot_path, r.log_path)}
+            removed = 0
+            for path in old:
+                if path not in open_files and os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+            if removed:
+                print(f"Swept {removed} collaboration room files unused for {self.max_room_age / 86400:g} days")
+
+    def _old_room_files(self) -> list:
+        cutoff = time.time() - self.max_room_age
+        with os.scandir(self.directory) as entries:
+            return [entry.path for entry in entries
+                    if entry.name.endswith((".snapshot", ".log")) and entry.stat().st_mtime < cutoff]
+
+    async def _maintain(self):
+        last_checkpoint = time.monotonic()
+        while self.rooms:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            heartbeat = sync_message(SYNC_UPDATE, EMPTY_UPDATE)
+            checkpoint = time.monotonic() - last_checkpoint >= self.snapshot_interval
+            for room in list(self.rooms.values()):
+                for conn in room.connections:
+                    conn.send(heartbeat)
+                if checkpoint:
+                    self.checkpoint(room)
+            if checkpoint:
+                last_checkpoint = time.monotonic()
+        self._maintenance = None
+
+    # -- broadcasting --
+    def _broadcast(self, room: Room, message: bytes, exclude=None):
+        for conn in room.connections:
+            if conn is not exclude:
+                conn.send(message)
+
+    def _flush_pending(self, room: Room):
+        pending, room.pending = room.pending, []
+        if not pending:
+            return
+        from pycrdt import merge_updates
+        origins = {origin for _, origin in pending}
+        update = pending[0][0] if len(pending) == 1 else merge_updates(*(u for u, _ in pending))
+        # A batch from a single client is not echoed back to it
+        self._broadcast(room, sync_message(SYNC_UPDATE, update),
+                        exclude=next(iter(origins)) if len(origins) == 1 else None)
+        if room.log_bytes > self.max_log_bytes:
+            self.checkpoint(room)
+
+    def _handle(self, room: Room, conn: Connection, message: bytes):
+        msg_type, pos = read_var_uint(message, 0)
+        if msg_type == MSG_SYNC:
+            sync_type, pos = read_var_uint(message, pos)
+            payload, _ = read_var_bytes(message, pos)
+            if sync_type == SYNC_STEP1:
+                conn.send(sync_message(SYNC_STEP2, room.doc.get_update(payload)))
+            elif sync_type in (SYNC_STEP2, SYNC_UPDATE):
+                if payload == EMPTY_UPDATE:
+                    return
+                if not room.pending:
+                    asyncio.get_running_loop().call_later(self.broadcast_delay, self._flush_pending, room)
+                room.apply(payload, conn)
+        elif msg_type == MSG_AWARENESS:
+            update, _ = read_var_bytes(message, pos)
+            for client_id, (clock, state) in parse_awareness(update).items():
+                known = room.awareness.get(client_id)
+                if known is None or clock >= known[0]:
+                    room.awareness[client_id] = (clock, state)
+                if state == "null":
+                    room.awareness.pop(client_id, None)
+                    conn.client_ids.discard(client_id)
+                else:
+                    conn.client_ids.add(client_id)
+            self._broadcast(room, message, exclude=conn)
+        elif msg_type == MSG_QUERY_AWARENESS and room.awareness:
+            conn.send(awareness_message(room.awareness))
+
+    async def serve(self, websocket, room_name: str):
+        """Run one client connection (``websocket`` is an accepted Starlette WebSocket)."""
+        room = self.room(room_name)
+        conn = Connection(websocket)
+        room.connections.add(conn)
+        if self._maintenance is None:
+            self._maintenance = asyncio.create_task(self._maintain())
+        pump = asyncio.create_task(conn.pump())
+        conn.send(sync_message(SYNC_STEP1, room.doc.get_state()))
+        if room.awareness:
+            conn.send(awareness_message(room.awareness))
+        try:
+            while not conn.closed:
+                receive = asyncio.create_task(websocket.receive())
+                done, _ = await asyncio.wait({receive, pump}, return_when=asyncio.FIRST_COMPLETED)
+                if receive not in done:
+                    receive.cancel()
+                    break  # the pump ended: slow client closed, or the socket failed
+                event = receive.result()
+                if event["type"] == "websocket.disconnect":
+                    break
+                data = event.get("bytes")
+                if data:
+                    try:
+                        self._handle(room, conn, data)
+                    except (IndexError, ValueError) as e:
+                        print(f"Warning: dropped malformed message in room '{room_name}': {e}")
+        finally:
+            room.connections.discard(conn)
+            if not pump.done():
+                pump.cancel()
+            elif not pump.cancelled():
+                pump.exception()  # a failed send; retrieve it so asyncio does not log it
+            gone = {cid: (room.awareness[cid][0] + 1, "null") for cid in conn.client_ids if cid in room.awareness}
+            for client_id in gone:
+                room.awareness.pop(client_id, None)
+            if gone:
+                self._broadcast(room, awareness_message(gone))
+            if not room.connections:
+                self._flush_pending(room)
+                self.checkpoint(room)
+                self.rooms.pop(room_name, None)
+                task = asyncio.create_task(self._retire(room))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    def status(self, prefix: str = "") -> dict:
+        """Rooms under ``prefix`` with updates not yet flushed to disk."""
+        return {name: ["changed"] for name, room in self.rooms.items()
+                if name.startswith(prefix) and room.changed}
@@ -0,0 +1,171 @@
+"""Cross-process coordination for running the editor server with several workers.
+
+- ``FileLock``: an exclusive lock on a file, shared by every uvicorn worker
+  (and by threads inside one worker). Used to serialize git write operations.
+- ``SharedCache``: a small SQLite-backed key/value store that all workers read
+  and write, so an entry computed by one process is reused by the others.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+# ---------------------- FILE LOCK ----------------------
+class FileLock:
+    def __init__(self, path: str, timeout: float = 60.0, poll: float = 0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _try_lock(self, fd) -> bool:
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, timeout: float = None):
+        """Wait up to ``timeout`` seconds (default: the lock's timeout; 0 = try once)."""
+        timeout = self.timeout if timeout is None else timeout
+        if not self._thread_lock.acquire(timeout=timeout):
+            raise TimeoutError(f"Timed out waiting for {self.path}")
+        if self._depth:
+            self._depth += 1
+            return self
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + timeout
+        while not self._try_lock(fd):
+            if time.monotonic() > deadline:
+                os.close(fd)
+                self._thread_lock.release()
+                raise TimeoutError(f"Timed out waiting for {self.path}")
+            time.sleep(self.poll)
+        self._fd = fd
+        self._depth = 1
+        return self
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if os.name == "nt":
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# ---------------------- SHARED CACHE ----------------------
+MAX_ENTRIES = 50000  # rows kept after a purge, most recently written first
+PURGE_EVERY = 1000  # writes by one process between purges
+
+
+class SharedCache:
+    """
+    JSON values stored in SQLite, grouped by namespace.
+
+    Entries can expire (``ttl``) and can be tied to a named generation counter:
+    bumping the counter from any worker invalidates every entry stored under
+    an older generation. Every ``PURGE_EVERY`` writes the table is purged of
+    expired rows and capped at ``max_entries``.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires REAL, generation INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self, name: str) -> int:
+        row = self._connect().execute(
+            "SELECT value FROM generations WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name: str) -> int:
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO generations (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+        return self.generation(name)
+
+    def get(self, namespace: str, key: str, generation: int = 0, default=None):
+        row = self._connect().execute(
+            "SELECT value, expires, generation FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key)).fetchone()
+        if row is None:
+            return default
+        value, expires, entry_generation = row
+        if entry_generation != generation or (expires is not None and expires < time.time()):
+            return default
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value, ttl: float = None, generation: int = 0):
+        expires = time.time() + ttl if ttl is not None else None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires, generation)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires, generation))
+        if next(self._writes) % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Drop expired entries, then the least recently written ones beyond ``max_entries``."""
+        conn = self._connect()
+        conn.execute(
+            "DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        # INSERT OR REPLACE gives a rewritten row a new rowid, so rowid order is write order
+        conn.execute(
+            "DELETE FROM entries WHERE rowid <= "
+            "(SELECT rowid FROM entries ORDER BY rowid DESC LIMIT 1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self, namespace: str = None):
+        conn = self._connect()
+        if namespace is None:
+            conn.execute("DELETE FROM entries")
+        else:
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
@@ -0,0 +1,270 @@
+"""Incremental docs validation: broken links, missing images, bad front-matter.
+
+Problems that otherwise only show up in a Sphinx build are found from the
+editor's own view of the docs folder:
+
+- ``extract_references`` parses a page once per content and returns its
+  front-matter error, links and image references with their line numbers.
+  The result is keyed by the SHA-1 of the page, so unchanged content is never
+  parsed twice (the docs root's shared cache keeps it across workers and
+  restarts).
+- ``DocsChecker`` keeps, per page, the references and the problems found, and
+  per referenced directory its mtime and entry names. A check stats every page
+  and every referenced directory: only pages whose content changed are
+  re-parsed, and only those pages plus the pages referencing a directory whose
+  entries changed (a file added, removed or renamed) are re-resolved.
+
+Targets starting with ``/`` are relative to the docs folder (the editor
+inserts images as ``/_static/...``), others to the page's folder. URLs and
+pure ``#anchor`` links are not checked.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+from collections import defaultdict
+from urllib.parse import unquote
+
+try:
+    import yaml
+except ImportError:  # front-matter is then only checked for a closing "---"
+    yaml = None
+
+EXTRACT_VERSION = 1  # bump when extract_references changes, to ignore cached results
+CACHE_TTL = 30 * 24 * 3600  # extracted references depend on content only
+RACY_WINDOW = 2.0  # seconds; files and folders modified more recently are re-read next time
+
+FENCE_RE = re.compile(r"^\s{0,3}(`{3,}|~{3,}|:{3,})\s*(?:\{([\w:-]+)\})?\s*(.*?)\s*$")
+CODE_DIRECTIVES = {"code", "code-block", "code-cell", "sourcecode", "literalinclude",
+                   "mermaid", "math", "raw", "eval-rst"}
+IMAGE_DIRECTIVES = {"image", "figure"}
+INCLUDE_DIRECTIVES = {"include", "literalinclude"}
+INLINE_CODE_RE = re.compile(r"(`+).+?\1")
+LINK_RE = re.compile(r"(!?)\[(?:[^\]\\]|\\.)*\]\(\s*(<[^>]*>|[^)\s]+)(?:\s+[\"'(][^)]*)?\s*\)")
+LINK_DEFINITION_RE = re.compile(r"^\s{0,3}\[[^\]]+\]:\s*(<[^>]*>|\S+)")
+HTML_IMG_RE = re.compile(r"<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def _front_matter(lines):
+    """``(end line index, error)`` of a leading ``---`` block; ``(0, None)`` without one."""
+    if not lines or lines[0].rstrip() != "---":
+        return 0, None
+    for index in range(1, len(lines)):
+        if lines[index].rstrip() in ("---", "..."):
+            break
+    else:
+        return 0, {"line": 1, "message": "front-matter is not closed with '---'"}
+    if yaml is None:
+        return index + 1, None
+    try:
+        data = yaml.safe_load("\n".join(lines[1:index]))
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        return index + 1, {"line": mark.line + 2 if mark else 1,
+                           "message": f"invalid YAML front-matter: {getattr(e, 'problem', None) or e}"}
+    if data is not None and not isinstance(data, dict):
+        return index + 1, {"line": 1, "message": "front-matter must be a mapping"}
+    return index + 1, None
+
+
+def extract_references(text: str) -> dict:
+    """
+    ``{"front_matter": error or None, "links": [[line, target], ...], "images": [...]}``
+    with 1-based line numbers. Code blocks and inline code are skipped.
+    """
+    lines = text.splitlines()
+    start, front_matter_error = _front_matter(lines)
+    links, images = [], []
+    code_fence = None  # closing marker of the code block being skipped
+    for number, line in enumerate(lines[start:], start + 1):
+        fence = FENCE_RE.match(line)
+        if code_fence:
+            if fence and fence.group(1)[0] == code_fence[0] and len(fence.group(1)) >= len(code_fence) \
+                    and not fence.group(2) and not fence.group(3):
+                code_fence = None
+            continue
+        if fence:
+            marker, directive, argument = fence.groups()
+            if directive in IMAGE_DIRECTIVES and argument:
+                images.append([number, argument])
+            elif directive in INCLUDE_DIRECTIVES and argument:
+                links.append([number, argument])
+            if (marker[0] != ":" and directive is None) or directive in CODE_DIRECTIVES:
+                code_fence = marker  # a plain ``` block or a code directive: skip its content
+            continue
+        line = INLINE_CODE_RE.sub("", line)
+        for bang, target in LINK_RE.findall(line):
+            (images if bang else links).append([number, target.strip("<>")])
+        definition = LINK_DEFINITION_RE.match(line)
+        if definition:
+            links.append([number, definition.group(1).strip("<>")])
+        for target in HTML_IMG_RE.findall(line):
+            images.append([number, target])
+    return {"front_matter": front_matter_error, "links": links, "images": images}
+
+
+def resolve_target(page: str, target: str):
+    """
+    Docs-relative path a reference points to, or None for URLs and anchors.
+    Raises ValueError for targets outside the docs folder.
+    """
+    if not target or target.startswith("#") or SCHEME_RE.match(target) or target.startswith("//"):
+        return None
+    target = unquote(target.split("#", 1)[0].split("?", 1)[0])
+    if not target:
+        return None
+    if target.startswith("/"):
+        path = posixpath.normpath(target.lstrip("/"))
+    else:
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(page), target))
+    if path == ".." or path.startswith("../"):
+        raise ValueError(target)
+    return path
+
+
+class DocsChecker:
+    def __init__(self, base_dir: str, cache=None):
+        self.base_dir = base_dir
+        self.cache = cache  # SharedCache for extracted references, optional
+        self.pages = {}  # page -> {"stat", "digest", "refs", "targets", "problems"}
+        self.dirs = {}  # docs-relative directory -> (mtime_ns or None, entry names)
+        self.dependents = defaultdict(set)  # directory -> pages referencing a path in it
+
+    # -- parsing --
+    def _extract(self, data: bytes, digest: str) -> dict:
+        key = f"{EXTRACT_VERSION}:{digest}"
+        refs = self.cache.get("check_refs", key) if self.cache is not None else None
+        if refs is None:
+            text = data.decode("utf-8", errors="replace")
+            refs = extract_references(text)
+            if self.cache is not None:
+                self.cache.set("check_refs", key, refs, ttl=CACHE_TTL)
+        return refs
+
+    def _read_page(self, page: str, state: dict, stat) -> bool:
+        """Update a page from disk; returns True if its references changed."""
+        full_path = os.path.join(self.base_dir, page.replace("/", os.sep))
+        with open(full_path, "rb") as f:
+            data = f.read()
+        # Coarse mtimes may hide a write in the same tick: re-read recent files next time
+        state["stat"] = stat if time.time() - stat[0] / 1e9 > RACY_WINDOW else None
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == state.get("digest"):
+            return False
+        state["digest"] = digest
+        state["refs"] = self._extract(data, digest)
+        for directory in state.get("targets", ()):
+            self.dependents[directory].discard(page)
+        targets = set()
+        for _, target in state["refs"]["links"] + state["refs"]["images"]:
+            try:
+                path = resolve_target(page, target)
+            except ValueError:
+                continue
+            if path is not None:
+                targets.add(posixpath.dirname(path))
+        state["targets"] = targets
+        for directory in targets:
+            self.dependents[directory].add(page)
+        return True
+
+    def _forget(self, page: str):
+        state = self.pages.pop(page, None)
+        for directory in (state or {}).get("targets", ()):
+            self.dependents[directory].discard(page)
+
+    # -- resolving --
+    def _refresh_dir(self, directory: str) -> bool:
+        """Re-list a referenced directory if its mtime changed; returns True if its entries changed."""
+        full_path = os.path.join(self.base_dir, directory.replace("/", os.sep))
+        try:
+            mtime = os.stat(full_path).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            mtime = None
+        known = self.dirs.get(directory)
+        if known is not None and known[0] == mtime and mtime is not None \
+                and time.time() - mtime / 1e9 > RACY_WINDOW:
+            return False
+        try:
+            names = frozenset(os.listdir(full_path)) if mtime is not None else frozenset()
+        except OSError:
+            names = frozenset()
+        self.dirs[directory] = (mtime, names)
+        return known is None or known[1] != names
+
+    def _exists(self, path: str) -> bool:
+        directory, _, name = path.rpartition("/")
+        known = self.dirs.get(directory)
+        if known is None:
+            self._refresh_dir(directory)
+            known = self.dirs[directory]
+        return name in known[1]
+
+    def _resolve(self, page: str, refs: dict) -> list:
+        problems = []
+        if refs["front_matter"]:
+            problems.append({"path": page, "kind": "front-matter", "target": None, **refs["front_matter"]})
+        for kind, entries in (("link", refs["links"]), ("image", refs["images"])):
+            for line, target in entries:
+                try:
+                    path = resolve_target(page, target)
+                except ValueError:
+                    problems.append({"path": page, "line": line, "kind": kind, "target": target,
+                                     "message": "points outside the docs folder"})
+                    continue
+                if path is not None and path != "." and not self._exists(path):
+                    what = "image" if kind == "image" else "link target"
+                    problems.append({"path": page, "line": line, "kind": kind, "target": target,
+                                     "message": f"{what} not found: {path}"})
+        return problems
+
+    # -- checking --
+    def check(self, pages) -> dict:
+        """Bring the results up to date for ``pages`` (docs-relative .md paths); returns work counters."""
+        started = time.perf_counter()
+        pages = set(pages)
+        for page in list(self.pages):
+            if page not in pages:
+                self._forget(page)
+        stale = set()
+        parsed = 0
+        for page in pages:
+            try:
+                st = os.stat(os.path.join(self.base_dir, page.replace("/", os.sep)))
+            except FileNotFoundError:
+                self._forget(page)
+                continue
+            stat = (st.st_mtime_ns, st.st_size)
+            state = self.pages.setdefault(page, {})
+            if state.get("stat") == stat:
+                continue
+            try:
+                changed = self._read_page(page, state, stat)
+            except FileNotFoundError:
+                self._forget(page)  # removed since the stat
+                continue
+            if changed:
+                parsed += 1
+                stale.add(page)
+        for directory, dependents in list(self.dependents.items()):
+            if not dependents:
+                del self.dependents[directory]
+                self.dirs.pop(directory, None)
+            elif self._refresh_dir(directory):
+                stale.update(dependents)
+        for page in stale:
+            state = self.pages.get(page)
+            if state is not None:
+                state["problems"] = self._resolve(page, state["refs"])
+        return {"pages": len(self.pages), "parsed": parsed, "resolved": len(stale),
+                "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def problems(self, prefix: str = "") -> list:
+        """Problems of the pages under ``prefix`` (a page path or a folder), ordered by page and line."""
+        folder = prefix.rstrip("/") + "/" if prefix else ""
+        found = [problem for page, state in self.pages.items()
+                 if not prefix or page == prefix or page.startswith(folder)
+                 for problem in state.get("problems", ())]
+        return sorted(found, key=lambda p: (p["path"], p["line"]))
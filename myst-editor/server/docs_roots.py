@@ -0,0 +1,236 @@
+"""Docs roots (repository + docs folder) served by one editor server.
+
+Each root owns its git handle, write lock, shared cache and in-memory caches.
+Requests pick a root with the ``X-Docs-Root`` header or the ``root`` query
+parameter; the selection is kept in a context variable so helpers can use
+``current_root()`` without threading it through every call.
+
+Roots are opened lazily. The registry keeps at most ``max_open_roots`` open and
+closes the least recently used idle ones, releasing their git handles and
+cached data.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+
+from caches import LRUCache
+from coordination import FileLock, SharedCache
+from object_store import ObjectStore, is_url
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # bytes of in-memory cache per root
+DEFAULT_MAX_OPEN_ROOTS = 4
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # seconds
+
+
+class DocsRoot:
+    def __init__(self, name: str, repo_dir: str, docs_dir: str = "docs",
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET, object_store_dir: str = None):
+        if object_store_dir and is_url(object_store_dir):
+            raise ValueError(f"Docs root '{name}': the object store must be a directory the server can write to")
+        self.name = name
+        self.repo_dir = os.path.abspath(repo_dir)
+        self.docs_dir = docs_dir.strip("/")
+        self.base_dir = os.path.join(self.repo_dir, self.docs_dir)
+        self.state_dir = os.path.join(self.repo_dir, ".git", "myst-editor")
+        self.memory_budget = memory_budget
+        self.object_store_dir = os.path.abspath(object_store_dir) if object_store_dir else None
+        self.caches = {}
+        self.indexes = {}  # name -> in-memory index of the docs tree (see index())
+        self.last_used = time.monotonic()
+        self.active_requests = 0
+        self.git_async_lock = asyncio.Lock()  # orders git writes inside one worker
+        self._repo = None
+        self._thread_local = threading.local()  # git handles of background threads
+        self._lock = threading.Lock()
+        self._write_lock = None
+        self._shared_cache = None
+        self._object_store = None
+
+    def repo(self):
+        """
+        Open the git repository on first use (GitPython is imported lazily).
+        A handle's persistent cat-file pipes must not be shared between threads,
+        so background threads (prefetch, fetches, exports) get their own handle.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            repo = getattr(self._thread_local, "repo", None)
+            if repo is None:
+                repo = self._thread_local.repo = self._open_repo()
+            return repo
+        if self._repo is None:
+            with self._lock:
+                if self._repo is None:
+                    self._repo = self._open_repo()
+        return self._repo
+
+    def _open_repo(self):
+        # Only open existing repo
+        if not os.path.exists(os.path.join(self.repo_dir, ".git")):
+            raise FileNotFoundError(f"Git repo not found in {self.repo_dir}. Clone it manually first.")
+        from git import Repo
+        return Repo(self.repo_dir)
+
+    def write_lock(self) -> FileLock:
+        if self._write_lock is None:
+            self._write_lock = FileLock(os.path.join(self.state_dir, "git-write.lock"))
+        return self._write_lock
+
+    def shared_cache(self) -> SharedCache:
+        if self._shared_cache is None:
+            self._shared_cache = SharedCache(os.path.join(self.state_dir, "cache.sqlite"))
+        return self._shared_cache
+
+    def object_store(self) -> ObjectStore:
+        """Store for large binaries: the configured shared directory, else the Git LFS location of this repository."""
+        if self._object_store is None:
+            self._object_store = ObjectStore(
+                self.object_store_dir or os.path.join(self.repo_dir, ".git", "lfs", "objects"))
+        return self._object_store
+
+    def cache(self, name: str) -> LRUCache:
+        """In-memory cache owned by this root, bounded by the root's memory budget."""
+        cache = self.caches.get(name)
+        if cache is None:
+            cache = self.caches.setdefault(name, LRUCache(f"{self.name}:{name}", self.memory_budget))
+        return cache
+
+    def index(self, name: str, factory):
+        """
+        Index of the docs tree owned by this root (tree journal, checker, outline),
+        created by ``factory()`` on first use. Unlike cache entries it is not sized;
+        close() drops it and it is rebuilt, largely from the shared cache, on next use.
+        """
+        index = self.indexes.get(name)
+        if index is None:
+            index = self.indexes.setdefault(name, factory())
+        return index
+
+    def memory_usage(self) -> int:
+        return sum(cache.bytes for cache in self.caches.values())
+
+    def enforce_budget(self):
+        """Evict from the largest caches until the root fits its memory budget."""
+        excess = self.memory_usage() - self.memory_budget
+        while excess > 0:
+            largest = max(list(self.caches.values()), key=lambda c: c.bytes)
+            freed = largest.shrink(max(0, largest.bytes - excess))
+            if not freed:
+                break
+            excess -= freed
+
+    def is_open(self) -> bool:
+        return self._repo is not None or bool(self.indexes) or self.memory_usage() > 0
+
+    def close(self):
+        """Release the git handle and drop in-memory caches and indexes; the root reopens on next use."""
+        with self._lock:
+            repo, self._repo = self._repo, None
+            # Background threads may be using their handles: only forget them, so the
+            # next call opens a new one and each old handle closes once its thread is done
+            self._thread_local = threading.local()
+        if repo is not None:
+            repo.close()
+        for cache in self.caches.values():
+            cache.clear()
+        self.indexes.clear()
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "docs_dir": self.docs_dir,
+            "open": self.is_open(),
+            "memory_bytes": self.memory_usage(),
+            "memory_budget": self.memory_budget,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+
+class RootRegistry:
+    def __init__(self, max_open_roots: int = DEFAULT_MAX_OPEN_ROOTS,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.max_open_roots = max_open_roots
+        self.idle_timeout = idle_timeout
+        self.roots = {}
+        self.default_name = None
+        self._lock = threading.Lock()
+
+    def add(self, root: DocsRoot, default: bool = False):
+        self.roots[root.name] = root
+        if default or self.default_name is None:
+            self.default_name = root.name
+        return root
+
+    def get(self, name: str = None) -> DocsRoot:
+        """Return a root by name (default root when ``name`` is empty). Raises KeyError."""
+        root = self.roots[name or self.default_name]
+        root.last_used = time.monotonic()
+        return root
+
+    def evict_idle(self):
+        """Close roots idle for longer than the timeout and the LRU ones beyond ``max_open_roots``."""
+        now = time.monotonic()
+        with self._lock:
+            open_roots = sorted((r for r in self.roots.values() if r.is_open()),
+                                key=lambda r: r.last_used, reverse=True)
+            for index, root in enumerate(open_roots):
+                if root.active_requests:
+                    continue
+                if index >= self.max_open_roots or now - root.last_used > self.idle_timeout:
+                    print(f"Closing idle docs root '{root.name}'")
+                    root.close()
+
+    def info(self) -> dict:
+        return {
+            "default": self.default_name,
+            "max_open_roots": self.max_open_roots,
+            "roots": [root.info() for root in self.roots.values()],
+        }
+
+    def load_config(self, path: str, object_store_dir: str = None):
+        """
+        Register roots from a JSON file::
+
+            {"default": "pfx", "max_open_roots": 4, "idle_timeout": 900,
+             "roots": {"pfx": {"repo": "../..", "docs_dir": "docs", "memory_budget_mb": 64,
+                               "object_store": "/srv/myst-objects"}}}
+
+        Relative repo and object store paths are resolved against the config file's
+        folder. ``object_store_dir`` is used for roots without an ``object_store``.
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        config_dir = os.path.dirname(os.path.abspath(path))
+        self.max_open_roots = config.get("max_open_roots", self.max_open_roots)
+        self.idle_timeout = config.get("idle_timeout", self.idle_timeout)
+        for name, spec in config["roots"].items():
+            budget_mb = spec.get("memory_budget_mb")
+            store = spec.get("object_store")
+            self.add(DocsRoot(
+                name,
+                os.path.join(config_dir, spec["repo"]),
+                spec.get("docs_dir", "docs"),
+                int(budget_mb * 1024 * 1024) if budget_mb else DEFAULT_MEMORY_BUDGET,
+                os.path.join(config_dir, store) if store else object_store_dir,
+            ))
+        if config.get("default"):
+            self.default_name = config["default"]
+
+
+registry = RootRegistry()
+_current_root = contextvars.ContextVar("docs_root", default=None)
+
+
+def use_root(root: DocsRoot):
+    """Make ``root`` current for this request/task. Returns a token for ``reset_root``."""
+    return _current_root.set(root)
+
+
+def reset_root(token):
+    _current_root.reset(token)
+
+
+def current_root() -> DocsRoot:
+    return _current_root.get() or registry.get()
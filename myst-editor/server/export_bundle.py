@@ -0,0 +1,326 @@
+"""Rendered docs of any commit, built once and served precompressed.
+
+``build_sphinx.bat`` overwrites one output folder. An export bundle is instead
+the Sphinx HTML of one commit, kept under the commit SHA:
+
+    <store>/objects/ab/<sha256>[.gz|.br]   every distinct output file, once
+    <store>/commits/<commit sha>/...       the site, hardlinked to the objects
+    <store>/commits/<commit sha>/.manifest.json
+
+Files that did not change between builds are the same object, so a new bundle
+costs disk space (and compression time) only for the files that differ.
+Compressible files get ``.gz`` and, with the ``brotli`` package installed,
+``.br`` siblings; the server sends those as they are. Objects that no bundle
+links to any more (link count 1) are removed by ``prune``.
+
+Sources come from the commit itself (``git archive`` of the docs folder and
+the Sphinx config folder), so the working tree is never touched. Pointer files
+of the large-file store are replaced by their content before the build.
+
+    python export_bundle.py build HEAD --repo ../.. --store ../../.git/myst-editor/exports
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # bundles then only carry .gz files
+    brotli = None
+
+MANIFEST = ".manifest.json"
+ENCODINGS = {"br": ".br", "gzip": ".gz"}  # content encoding -> file suffix, preferred first
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml",
+                      "image/svg+xml", "application/x-javascript")
+MIN_COMPRESS_SIZE = 256  # bytes; smaller files are sent as they are
+DEFAULT_KEEP = 20  # bundles kept by prune
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_compressible(path: str) -> bool:
+    media_type = mimetypes.guess_type(path)[0] or ""
+    return media_type.startswith(COMPRESSIBLE_TYPES) or path.endswith((".js", ".map", ".txt"))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: str, target: str):
+    """Hardlink ``target`` to ``source``; copy where hardlinks are not supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def default_sphinx_command(repo_dir: str) -> list:
+    """MYST_EDITOR_SPHINX_BUILD, the repo's sphinx_venv, sphinx-build on PATH, or this interpreter."""
+    configured = os.environ.get("MYST_EDITOR_SPHINX_BUILD")
+    if configured:
+        return [configured]
+    venv = os.path.join(repo_dir, "sphinx", "sphinx_venv")
+    for candidate in (os.path.join(venv, "Scripts", "sphinx-build.exe"), os.path.join(venv, "bin", "sphinx-build")):
+        if os.path.isfile(candidate):
+            return [candidate]
+    found = shutil.which("sphinx-build")
+    return [found] if found else [sys.executable, "-m", "sphinx"]
+
+
+class BundleStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.commits_dir = os.path.join(directory, "commits")
+
+    def bundle_dir(self, commit_sha: str) -> str:
+        return os.path.join(self.commits_dir, commit_sha)
+
+    def has(self, commit_sha: str) -> bool:
+        return os.path.isfile(os.path.join(self.bundle_dir(commit_sha), MANIFEST))
+
+    def manifest(self, commit_sha: str):
+        try:
+            with open(os.path.join(self.bundle_dir(commit_sha), MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def bundles(self) -> list:
+        """Manifests of all bundles, newest first."""
+        if not os.path.isdir(self.commits_dir):
+            return []
+        found = [m for m in (self.manifest(name) for name in os.listdir(self.commits_dir)) if m]
+        return sorted(found, key=lambda m: m["built_at"], reverse=True)
+
+    # -- objects --
+    def _object(self, source: str):
+        """Add a file to the objects. Returns ``(sha256, encodings, reused)``."""
+        oid = file_sha256(source)
+        base = os.path.join(self.objects_dir, oid[:2], oid)
+        if os.path.isfile(base):
+            return oid, [e for e, suffix in ENCODINGS.items() if os.path.isfile(base + suffix)], True
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        encodings = []
+        if is_compressible(source) and os.path.getsize(source) >= MIN_COMPRESS_SIZE:
+            with open(source, "rb") as f:
+                data = f.read()
+            variants = {"gzip": lambda d: gzip.compress(d, 9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = lambda d: brotli.compress(d, quality=11)
+            for encoding, compress in variants.items():
+                packed = compress(data)
+                if len(packed) < len(data):
+                    self._write_atomically(base + ENCODINGS[encoding], packed)
+                    encodings.append(encoding)
+        tmp = base + ".tmp"
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, base)  # written last: its presence means the object is complete
+        return oid, encodings, False
+
+    @staticmethod
+    def _write_atomically(path: str, data: bytes):
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def add(self, commit_sha: str, html_dir: str, info: dict = None) -> dict:
+        """Turn a built HTML folder into the bundle of ``commit_sha``; returns its manifest."""
+        staging = tempfile.mkdtemp(dir=self._ensure(self.commits_dir), prefix=f".{commit_sha[:12]}-")
+        files, reused = {}, 0
+        try:
+            for dirpath, _, filenames in os.walk(html_dir):
+                for name in filenames:
+                    source = os.path.join(dirpath, name)
+                    rel = os.path.relpath(source, html_dir).replace(os.sep, "/")
+                    oid, encodings, was_known = self._object(source)
+                    reused += was_known
+                    target = os.path.join(staging, rel.replace("/", os.sep))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    base = os.path.join(self.objects_dir, oid[:2], oid)
+                    link_or_copy(base, target)
+                    for encoding in encodings:
+                        link_or_copy(base + ENCODINGS[encoding], target + ENCODINGS[encoding])
+                    files[rel] = {"sha256": oid, "size": os.path.getsize(source), "encodings": encodings}
+            manifest = {"commit": commit_sha, "built_at": time.time(), "files": len(files),
+                        "reused": reused, **(info or {}), "entries": files}
+            with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            final = self.bundle_dir(commit_sha)
+            if os.path.isdir(final):
+                shutil.rmtree(final)
+            os.replace(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return manifest
+
+    @staticmethod
+    def _ensure(directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def prune(self, keep: int = DEFAULT_KEEP) -> int:
+        """Drop all but the ``keep`` newest bundles and the objects only they used; returns bundles removed."""
+        removed = 0
+        for manifest in self.bundles()[keep:]:
+            shutil.rmtree(self.bundle_dir(manifest["commit"]), ignore_errors=True)
+            removed += 1
+        if removed and os.path.isdir(self.objects_dir):
+            for dirpath, _, filenames in os.walk(self.objects_dir):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if os.stat(path).st_nlink == 1:
+                        os.remove(path)  # no bundle links to it
+        return removed
+
+    # -- serving --
+    def resolve(self, commit_sha: str, path: str, accept_encoding: str = ""):
+        """
+        ``(file, content encoding or None, media type)`` for a page of a bundle,
+        picking a precompressed variant the client accepts. None if not found.
+        ``path`` must already be normalized (no ``..``).
+        """
+        bundle = self.bundle_dir(commit_sha)
+        full_path = os.path.join(bundle, path.replace("/", os.sep)) if path else bundle
+        if os.path.isdir(full_path):
+            full_path = os.path.join(full_path, "index.html")
+        if not os.path.isfile(full_path) or os.path.basename(full_path) == MANIFEST:
+            return None
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+        for encoding, suffix in ENCODINGS.items():
+            if encoding in accepted and os.path.isfile(full_path + suffix):
+                return full_path + suffix, encoding, media_type
+        return full_path, None, media_type
+
+
+def export_sources(repo, commit_sha: str, paths, target_dir: str):
+    """Extract ``paths`` (repo-relative) as they are in ``commit_sha`` into ``target_dir``."""
+    with tempfile.TemporaryFile() as archive:
+        repo.archive(archive, commit_sha, path=list(paths), format="tar")
+        archive.seek(0)
+        with tarfile.open(fileobj=archive) as tar:
+            tar.extractall(target_dir, filter="data")
+
+
+def build_bundle(repo, commit_sha: str, store: BundleStore, docs_dir: str = "docs",
+                 config_dir: str = "sphinx/source", sphinx_command=None, object_store=None) -> dict:
+    """
+    Build the HTML of ``commit_sha`` with Sphinx and store it as a bundle.
+    ``config_dir`` is repo-relative (taken from the commit) or absolute (used as is).
+    Raises RuntimeError when the build fails.
+    """
+    sphinx_command = sphinx_command or default_sphinx_command(repo.working_tree_dir)
+    started = time.time()
+    with tempfile.TemporaryDirectory(prefix="myst-export-") as work:
+        sources = os.path.join(work, "src")
+        paths = [docs_dir] + ([] if os.path.isabs(config_dir) else [config_dir])
+        export_sources(repo, commit_sha, paths, sources)
+        docs_path = os.path.join(sources, docs_dir)
+        if object_store is not None:
+            for dirpath, _, filenames in os.walk(docs_path):
+                for name in filenames:
+                    try:
+                        object_store.materialize(os.path.join(dirpath, name))
+                    except FileNotFoundError as e:
+                        print(f"Warning: {e}")
+        conf_path = config_dir if os.path.isabs(config_dir) else os.path.join(sources, config_dir)
+        html_dir = os.path.join(work, "html")
+        result = subprocess.run(
+            [*sphinx_command, "-b", "html", "-q", "-c", conf_path, docs_path, html_dir],
+            capture_output=True, text=True, errors="replace",
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Sphinx build failed ({result.returncode}): {result.stderr.strip()[-2000:]}")
+        for leftover in (".buildinfo", ".doctrees"):
+            path = os.path.join(html_dir, leftover)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        return store.add(commit_sha, html_dir, {"build_seconds": round(time.time() - started, 2)})
+
+
+class Exporter:
+    """Builds bundles one at a time in a background thread and tracks their state."""
+
+    def __init__(self, store: BundleStore, keep: int = DEFAULT_KEEP):
+        self.store = store
+        self.keep = keep
+        self.builds = {}  # commit sha -> {"state": "queued" | "building" | "ready" | "failed", ...}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def status(self, commit_sha: str) -> dict:
+        if self.store.has(commit_sha):
+            manifest = self.store.manifest(commit_sha)
+            return {"commit": commit_sha, "state": "ready",
+                    **{k: v for k, v in manifest.items() if k not in ("entries", "commit")}}
+        return {"commit": commit_sha, "state": "missing", **self.builds.get(commit_sha, {})}
+
+    def request(self, repo, commit_sha: str, **build_options) -> dict:
+        """Start building ``commit_sha`` unless it is built or being built; returns its status."""
+        with self._lock:
+            current = self.builds.get(commit_sha, {}).get("state")
+            if self.store.has(commit_sha) or current in ("queued", "building"):
+                return self.status(commit_sha)
+            self.builds[commit_sha] = {"state": "queued", "requested_at": time.time()}
+
+        def run():
+            with self._build_lock:
+                self.builds[commit_sha] = {**self.builds[commit_sha], "state": "building"}
+                try:
+                    build_bundle(repo, commit_sha, self.store, **build_options)
+                    self.store.prune(self.keep)
+                    self.builds.pop(commit_sha, None)
+                except Exception as e:
+                    print(f"Warning: export of {commit_sha[:12]} failed: {e}")
+                    self.builds[commit_sha] = {"state": "failed", "error": str(e), "finished_at": time.time()}
+
+        threading.Thread(target=run, name=f"export-{commit_sha[:12]}", daemon=True).start()
+        return self.status(commit_sha)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precompressed docs bundles per commit")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the bundle of a commit")
+    build.add_argument("commit", nargs="?", default="HEAD")
+    build.add_argument("--repo", default="../..")
+    build.add_argument("--store", default=None, help="bundle folder (default: <repo>/.git/myst-editor/exports)")
+    build.add_argument("--docs-dir", default="docs")
+    build.add_argument("--config-dir", default="sphinx/source")
+    build.add_argument("--keep", type=int, default=DEFAULT_KEEP)
+    build.add_argument("--object-store", default=None,
+                       help="large file store, directory or http(s) URL (default: <repo>/.git/lfs/objects)")
+    args = parser.parse_args()
+
+    from git import Repo
+    from object_store import ObjectStore
+    repo = Repo(args.repo)
+    store = BundleStore(args.store or os.path.join(repo.git_dir, "myst-editor", "exports"))
+    objects = ObjectStore(args.object_store or os.path.join(repo.git_dir, "lfs", "objects"))
+    commit_sha = repo.commit(args.commit).hexsha
+    manifest = build_bundle(repo, commit_sha, store, args.docs_dir, args.config_dir, object_store=objects)
+    store.prune(args.keep)
+    print(f"Built {commit_sha[:12]}: {manifest['files']} files, {manifest['reused']} reused "
+          f"in {manifest['build_seconds']} s -> {store.bundle_dir(commit_sha)}")
+
+
+if __name__ == "__main__":
+    main()
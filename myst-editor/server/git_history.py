@@ -0,0 +1,110 @@
+"""Per-file history and blame, cached so that unchanged files are never recomputed.
+
+- Blame is keyed by the file's blob SHA: as long as a page's content at HEAD
+  does not change, commits to other files never invalidate it. (A page
+  reverted to earlier content gets the blame computed for that content.)
+- History is keyed by path and HEAD. When HEAD advances, only the new commits
+  (``git log <old head>..<new head>``) are read and put in front of the stored
+  history of the old HEAD.
+
+Both follow renames: ``git blame`` does so by itself, history uses
+``git log --follow``. Results live in the docs root's shared cache, so every
+worker reuses them.
+"""
+HISTORY_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%at%x1f%s"
+CACHE_TTL = 30 * 24 * 3600  # entries never go stale; the TTL only bounds the cache file
+
+
+def parse_log(output: str) -> list:
+    """Entries of ``git log --name-status --format=HISTORY_FORMAT``, newest first."""
+    entries = []
+    for record in output.split("\x1e")[1:]:
+        header, _, files = record.partition("\n")
+        sha, author, email, timestamp, summary = header.split("\x1f", 4)
+        entry = {"commit": sha, "author": author, "email": email, "time": int(timestamp),
+                 "summary": summary, "status": None, "path": None, "old_path": None}
+        for line in files.splitlines():
+            if not line.strip():
+                continue
+            status, *paths = line.split("\t")
+            entry["status"] = status[0]
+            entry["path"] = paths[-1]
+            if len(paths) > 1:
+                entry["old_path"] = paths[0]
+        entries.append(entry)
+    return entries
+
+
+def _log(repo, repo_path: str, revision: str) -> list:
+    return parse_log(repo.git.log("--follow", "--name-status", f"--format={HISTORY_FORMAT}",
+                                  revision, "--", repo_path))
+
+
+def file_history(repo, cache, repo_path: str, head_sha: str) -> list:
+    """History of ``repo_path`` as of ``head_sha``, following renames, newest first."""
+    key = f"{repo_path}@{head_sha}"
+    cached = cache.get("history", key)
+    if cached is not None:
+        return cached
+    entries = None
+    previous_head = cache.get("history_head", repo_path)
+    if previous_head and previous_head != head_sha:
+        base = cache.get("history", f"{repo_path}@{previous_head}")
+        if base is not None and repo.is_ancestor(previous_head, head_sha):
+            entries = _log(repo, repo_path, f"{previous_head}..{head_sha}") + base
+    if entries is None:
+        entries = _log(repo, repo_path, head_sha)
+    cache.set("history", key, entries, ttl=CACHE_TTL)
+    cache.set("history_head", repo_path, head_sha, ttl=CACHE_TTL)
+    return entries
+
+
+def parse_blame(output: str) -> dict:
+    """
+    ``git blame --porcelain`` as ``{"commits": {sha: info}, "ranges": [[line, count, sha, orig_line], ...]}``.
+    Line numbers are 1-based; consecutive lines from the same commit share one range.
+    """
+    commits, ranges = {}, []
+    current = None
+    for line in output.splitlines():
+        if line.startswith("\t"):
+            continue  # line content; the client already has it
+        fields = line.split(" ")
+        if len(fields[0]) in (40, 64) and len(fields) >= 3 and fields[1].isdigit():
+            sha, orig, final = fields[0], int(fields[1]), int(fields[2])
+            current = commits.setdefault(sha, {})
+            last = ranges[-1] if ranges else None
+            if last and last[2] == sha and last[0] + last[1] == final and last[3] + last[1] == orig:
+                last[1] += 1
+            else:
+                ranges.append([final, 1, sha, orig])
+        elif current is not None:
+            name, _, value = line.partition(" ")
+            if name == "author":
+                current["author"] = value
+            elif name == "author-mail":
+                current["email"] = value.strip("<>")
+            elif name == "author-time":
+                current["time"] = int(value)
+            elif name == "summary":
+                current["summary"] = value
+            elif name == "filename":
+                current["path"] = value
+            elif name == "boundary":
+                current["boundary"] = True
+    return {"commits": commits, "ranges": ranges}
+
+
+def file_blame(repo, cache, repo_path: str, commit_sha: str) -> dict:
+    """
+    Blame of ``repo_path`` at ``commit_sha``, cached by the file's blob SHA.
+    Raises KeyError if the file is not in that commit.
+    """
+    blob_sha = (repo.commit(commit_sha).tree / repo_path).hexsha
+    key = f"{repo_path}:{blob_sha}"
+    cached = cache.get("blame", key)
+    if cached is not None:
+        return {**cached, "blob": blob_sha, "cached": True}
+    result = parse_blame(repo.git.blame("--porcelain", commit_sha, "--", repo_path))
+    cache.set("blame", key, result, ttl=CACHE_TTL)
+    return {**result, "blob": blob_sha, "cached": False}
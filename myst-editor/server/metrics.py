@@ -0,0 +1,182 @@
+"""Request metrics for the editor server, exported in Prometheus text format.
+
+Per request we record latency, request/response body sizes, the number of git
+subprocesses started and the number of audited filesystem calls (open, listdir,
+scandir, rename, remove, ...). Git processes and filesystem calls are counted
+with a ``sys.addaudithook`` hook, so nothing in the route code needs to change.
+Named spans (``with span("iter_commits"):``) add detail to the optional
+``Server-Timing`` header.
+
+Metrics are kept per process; with several workers each one reports its own.
+"""
+import contextvars
+import sys
+import threading
+import time
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+FS_AUDIT_EVENTS = {
+    "open", "os.listdir", "os.scandir", "os.rename", "os.remove", "os.mkdir",
+    "os.rmdir", "os.link", "os.symlink", "os.truncate", "os.utime", "shutil.copyfile",
+    "shutil.copytree", "shutil.move", "shutil.rmtree",
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Upper bucket bound containing the q-th observation (None when empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class RequestStats:
+    """Counters collected while one request is being handled."""
+    __slots__ = ("git_calls", "fs_calls", "spans")
+
+    def __init__(self):
+        self.git_calls = 0
+        self.fs_calls = 0
+        self.spans = defaultdict(float)  # name -> seconds, summed over repeated sections
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+_hook_installed = False
+
+
+def _audit_hook(event, args):
+    stats = _current.get()
+    if stats is None:
+        return
+    if event == "subprocess.Popen":
+        executable, argv = args[0], args[1]
+        program = executable or (argv[0] if isinstance(argv, (list, tuple)) and argv else argv)
+        if program and "git" in str(program).rsplit("/", 1)[-1].rsplit("\\", 1)[-1]:
+            stats.git_calls += 1
+    elif event in FS_AUDIT_EVENTS:
+        stats.fs_calls += 1
+
+
+def install_audit_hook():
+    """Audit hooks cannot be removed, so install at most once per process."""
+    global _hook_installed
+    if not _hook_installed:
+        sys.addaudithook(_audit_hook)
+        _hook_installed = True
+
+
+class span:
+    """Time a named section of the current request for the Server-Timing header."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stats = _current.get()
+        if stats is not None:
+            stats.spans[self.name] += time.perf_counter() - self.started
+
+
+class Metrics:
+    def __init__(self):
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.request_bytes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.response_bytes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.git_calls = defaultdict(lambda: Histogram(COUNT_BUCKETS))
+        self.fs_calls = defaultdict(lambda: Histogram(COUNT_BUCKETS))
+        self.span_seconds = defaultdict(float)
+        self.responses = defaultdict(int)  # (route, method, status) -> count
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin collecting for the current request. Returns (stats, token)."""
+        stats = RequestStats()
+        return stats, _current.set(stats)
+
+    def finish(self, token, stats: RequestStats, route: str, method: str, status: int,
+               seconds: float, request_size: int, response_size: int):
+        _current.reset(token)
+        key = (route, method)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.request_bytes[key].observe(request_size)
+            self.response_bytes[key].observe(response_size)
+            self.git_calls[key].observe(stats.git_calls)
+            self.fs_calls[key].observe(stats.fs_calls)
+            for name, spent in stats.spans.items():
+                self.span_seconds[(route, name)] += spent
+            self.responses[(route, method, status)] += 1
+
+    @staticmethod
+    def server_timing(stats: RequestStats, seconds: float) -> str:
+        parts = [f"total;dur={seconds * 1000:.1f}"]
+        parts += [f"{name};dur={spent * 1000:.1f}" for name, spent in stats.spans.items()]
+        parts.append(f'git;desc="git subprocesses: {stats.git_calls}"')
+        parts.append(f'fs;desc="fs calls: {stats.fs_calls}"')
+        return ", ".join(parts)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(metric, help_text, series):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for (route, method), h in sorted(series.items()):
+                labels = f'route="{route}",method="{method}"'
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{metric}_count{{{labels}}} {h.count}")
+
+        with self._lock:
+            histogram("myst_request_duration_seconds", "Request latency.", self.latency)
+            histogram("myst_request_size_bytes", "Request body size.", self.request_bytes)
+            histogram("myst_response_size_bytes", "Response body size.", self.response_bytes)
+            histogram("myst_request_git_subprocesses", "Git subprocesses started per request.", self.git_calls)
+            histogram("myst_request_fs_calls", "Audited filesystem calls per request.", self.fs_calls)
+            lines.append("# HELP myst_span_seconds_total Time spent in named sections of a route.")
+            lines.append("# TYPE myst_span_seconds_total counter")
+            for (route, name), spent in sorted(self.span_seconds.items()):
+                lines.append(f'myst_span_seconds_total{{route="{route}",span="{name}"}} {spent}')
+            lines.append("# HELP myst_responses_total Responses by route and status code.")
+            lines.append("# TYPE myst_responses_total counter")
+            for (route, method, status), n in sorted(self.responses.items()):
+                lines.append(f'myst_responses_total{{route="{route}",method="{method}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,201 @@
+"""Content store for large binary assets.
+
+Uploads above a size threshold are moved into a content-addressed store and
+replaced in the working tree by a small pointer file, so git only ever sees a
+few lines of text per image. The pointer format and the store layout
+(``ab/cd/<sha256>``) follow Git LFS, but objects are not pushed with git:
+the store is a plain directory. By default it is ``.git/lfs/objects`` of the
+repository, which only this machine can read, so the server uses the default
+store only for repositories without a remote. Pointing it at a shared
+directory (``MYST_EDITOR_OBJECT_STORE``, or ``object_store`` in the roots
+config) lets other clones restore the objects, from that directory or from a
+web server that serves it.
+
+The editor serves pointers transparently from ``/_static``. Anything else that
+reads the docs folder directly (a Sphinx build, an export) works on a copy with
+the pointers replaced by their content. The working tree itself is never
+materialized, or the next commit would add the full binaries back::
+
+    python object_store.py materialize ../../docs --store https://assets.example.org/objects --out ../../pfx_docs_src
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+
+POINTER_VERSION = "version https://git-lfs.github.com/spec/v1"
+POINTER_MAX_SIZE = 1024  # bytes; larger files are never parsed as pointers
+CHUNK_SIZE = 1024 * 1024
+
+
+def make_pointer(oid: str, size: int) -> bytes:
+    return f"{POINTER_VERSION}\noid sha256:{oid}\nsize {size}\n".encode("ascii")
+
+
+def read_pointer(path: str):
+    """``(oid, size)`` if ``path`` is a pointer file, otherwise None."""
+    try:
+        if os.path.getsize(path) > POINTER_MAX_SIZE:
+            return None
+        with open(path, "rb") as f:
+            lines = f.read().decode("ascii").splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if len(lines) < 3 or lines[0] != POINTER_VERSION:
+        return None
+    fields = dict(line.split(" ", 1) for line in lines[1:] if " " in line)
+    oid = fields.get("oid", "")
+    if not oid.startswith("sha256:") or not fields.get("size", "").isdigit():
+        return None
+    return oid[len("sha256:"):], int(fields["size"])
+
+
+def _replace_atomically(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        shutil.copymode(path, tmp)  # mkstemp files are owner-only
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def is_url(location: str) -> bool:
+    return location.startswith(("http://", "https://"))
+
+
+class ObjectStore:
+    """Objects under ``directory``; an http(s) URL of a served store can be read from but not written to."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path_for(self, oid: str) -> str:
+        if is_url(self.directory):
+            return f"{self.directory.rstrip('/')}/{oid[:2]}/{oid[2:4]}/{oid}"
+        return os.path.join(self.directory, oid[:2], oid[2:4], oid)
+
+    def has(self, oid: str) -> bool:
+        return not is_url(self.directory) and os.path.isfile(self.path_for(oid))
+
+    def open_object(self, oid: str):
+        """Binary file object with the content of ``oid``. Raises FileNotFoundError."""
+        location = self.path_for(oid)
+        if not is_url(self.directory):
+            if not os.path.isfile(location):
+                raise FileNotFoundError(f"Object {oid} is not in {self.directory}")
+            return open(location, "rb")
+        try:
+            return urllib.request.urlopen(location, timeout=60)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise FileNotFoundError(f"Object {oid} is not in {self.directory}") from e
+            raise
+
+    def put_file(self, path: str):
+        """Copy a file into the store. Returns ``(oid, size)``; storing the same content twice is a no-op."""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".incoming-")
+        try:
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+            oid = digest.hexdigest()
+            target = self.path_for(oid)
+            if os.path.isfile(target):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return oid, size
+
+    def store_large_file(self, path: str, threshold: int) -> bool:
+        """Move ``path`` into the store and leave a pointer if it is at least ``threshold`` bytes."""
+        if threshold <= 0 or os.path.getsize(path) < threshold or read_pointer(path):
+            return False
+        oid, size = self.put_file(path)
+        _replace_atomically(path, make_pointer(oid, size))
+        return True
+
+    def materialize(self, path: str) -> bool:
+        """Replace a pointer file with its content. Returns False if ``path`` is not a pointer."""
+        pointer = read_pointer(path)
+        if pointer is None:
+            return False
+        oid, _ = pointer
+        with self.open_object(oid) as src:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                digest = hashlib.sha256()
+                with os.fdopen(fd, "wb") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                if digest.hexdigest() != oid:
+                    raise ValueError(f"Object {oid} for {path} is corrupt in {self.directory}")
+                shutil.copymode(path, tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        return True
+
+
+MATERIALIZED_MARKER = ".materialized"  # marks a folder written by "materialize --out"
+
+
+def copy_materialized(folder: str, out: str, store: ObjectStore):
+    """
+    Copy ``folder`` to ``out`` with pointer files replaced by their content;
+    returns ``(restored, missing)``. A previous copy at ``out`` is replaced.
+    """
+    if os.path.exists(out):
+        if os.listdir(out) and not os.path.isfile(os.path.join(out, MATERIALIZED_MARKER)):
+            raise FileExistsError(f"{out} exists and was not written by materialize; refusing to replace it")
+        shutil.rmtree(out)
+    shutil.copytree(folder, out)
+    open(os.path.join(out, MATERIALIZED_MARKER), "w").close()
+    restored = missing = 0
+    for dirpath, _, filenames in os.walk(out):
+        for name in filenames:
+            try:
+                restored += store.materialize(os.path.join(dirpath, name))
+            except FileNotFoundError as e:
+                missing += 1
+                print(f"Warning: {e}")
+    return restored, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local store for large binary assets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mat = sub.add_parser("materialize", help="copy a folder with pointer files replaced by their content")
+    mat.add_argument("folder")
+    mat.add_argument("--store", required=True,
+                     help="object store directory or http(s) URL serving it, e.g. <repo>/.git/lfs/objects")
+    mat.add_argument("--out", required=True, help="folder for the copy (replaced if it exists)")
+    args = parser.parse_args()
+
+    try:
+        restored, missing = copy_materialized(args.folder, args.out, ObjectStore(args.store))
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(f"Restored {restored} files, {missing} missing from the store")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Per-page heading index with the anchors MyST gives each heading.
+
+``extract_outline`` lists a page's headings (ATX and setext) with their line,
+level, source text, explicit ``(label)=`` target and anchor slug. Slugs follow
+myst-parser for ``myst_heading_anchors``: headings up to that level get
+``default_slugify`` of their plain text (text and inline code, without roles,
+math or markup) and a repeated slug gets ``-1``, ``-2``... appended the way
+``compute_unique_slug`` does it. Headings inside directives (rendered as
+rubrics) are slugged too; code blocks are skipped.
+
+``OutlineIndex`` keeps the outline of every page. Saves update it directly;
+other changes (other workers, git operations, external edits) are found by
+stat when the index is queried, and only pages whose content changed are
+parsed again. Parsed outlines are keyed by the SHA-1 of the page in the docs
+root's shared cache, so workers and restarts reuse them.
+"""
+import hashlib
+import html
+import os
+import re
+import time
+
+from docs_checker import CODE_DIRECTIVES, FENCE_RE
+
+OUTLINE_VERSION = 1  # bump when extract_outline changes, to ignore cached results
+CACHE_TTL = 30 * 24 * 3600  # outlines depend on content and anchor level only
+RACY_WINDOW = 2.0  # seconds; files modified more recently are re-read next time
+OPAQUE_DIRECTIVES = CODE_DIRECTIVES | {"toctree", "csv-table"}  # content is not parsed as Markdown
+
+ATX_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?[ \t]*$")
+ATX_CLOSING_RE = re.compile(r"(?:^|[ \t]+)#+$")
+SETEXT_RE = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+THEMATIC_BREAK_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+BLOCK_START_RE = re.compile(r"^ {0,3}(?:[-+*](?:[ \t]|$)|\d{1,9}[.)](?:[ \t]|$)|>|<|\$\$)")
+TARGET_RE = re.compile(r"^ {0,3}\(([^()\s]+)\)=[ \t]*$")
+HEADING_ANCHORS_RE = re.compile(r"^myst_heading_anchors\s*=\s*(\d+)", re.MULTILINE)
+
+# Inline syntax whose content is not part of the heading's text tokens
+CODE_SPAN_RE = re.compile(r"(\{[\w:+-]+\})?(`+)(.+?)(?<!`)\2(?!`)", re.DOTALL)
+ESCAPE_RE = re.compile(r"\\([!-/:-@\[-`{-~])")
+IMAGE_RE = re.compile(r"!\[(?:[^\[\]]|\[[^\]]*\])*\](?:\([^)]*\)|\[[^\]]*\])?")
+AUTOLINK_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9+.-]{1,31}:[^<>\s]*|[^<>@\s]+@[^<>@\s]+)>")
+HTML_INLINE_RE = re.compile(r"</?[a-zA-Z][^<>]*>|<!--.*?-->", re.DOTALL)
+LINK_RE = re.compile(r"\[((?:[^\[\]\\]|\\.)*)\](?:\([^)]*\)|\[[^\]]*\])")
+ATTRS_RE = re.compile(r"\{(?:[#.][^{}]*|[^{}=\s]+=[^{}]*)\}")
+SUBSTITUTION_RE = re.compile(r"\{\{[^{}]*\}\}")
+MATH_RE = re.compile(r"\$\$.+?\$\$|(?<!\$)\$(?=\S)[^$]*?(?<=\S)\$(?!\d)", re.DOTALL)
+UNDERSCORE_EMPHASIS_RE = re.compile(r"(?<![\w])(_{1,3})(?=\S)(.+?)(?<=\S)\1(?![\w])")
+SOFT_BREAK_RE = re.compile(r"[ \t]*\n[ \t]*")
+# "replacements" typography (markdown-it), limited to the rules that change a slug
+SCOPED_ABBR_RE = re.compile(r"\((c|tm|r)\)", re.IGNORECASE)
+SCOPED_ABBR = {"c": "\u00a9", "r": "\u00ae", "tm": "\u2122"}
+EM_DASH_RE = re.compile(r"(^|[^-])---(?=[^-]|$)", re.MULTILINE)
+EN_DASH_RE = re.compile(r"(^|\s)--(?=\s|$)", re.MULTILINE)
+EN_DASH_INNER_RE = re.compile(r"(^|[^-\s])--(?=[^-\s]|$)", re.MULTILINE)
+SLUGIFY_CLEAN_RE = re.compile(r"[^\w\u4e00-\u9fff\- ]")
+
+
+def read_heading_anchors(conf_path: str, default: int = 0) -> int:
+    """``myst_heading_anchors`` as set in a Sphinx ``conf.py`` (MyST's default 0 if unset)."""
+    try:
+        with open(conf_path, encoding="utf-8") as f:
+            match = HEADING_ANCHORS_RE.search(f.read())
+    except OSError:
+        return default
+    return int(match.group(1)) if match else default
+
+
+def _typography(text: str) -> str:
+    text = SCOPED_ABBR_RE.sub(lambda m: SCOPED_ABBR[m.group(1).lower()], text).replace("+-", "\u00b1")
+    text = EM_DASH_RE.sub("\\1\u2014", text)
+    text = EN_DASH_RE.sub("\\1\u2013", text)
+    return EN_DASH_INNER_RE.sub("\\1\u2013", text)
+
+
+def _text_content(text: str) -> str:
+    # Escaped characters are parked in a private-use plane so no rule matches them
+    text = ESCAPE_RE.sub(lambda m: chr(0xF0000 + ord(m.group(1))), text)
+    text = SUBSTITUTION_RE.sub("", text)
+    text = MATH_RE.sub("", text)
+    text = IMAGE_RE.sub("", text)
+    text = AUTOLINK_RE.sub(r"\1", text)
+    text = HTML_INLINE_RE.sub("", text)
+    text = ATTRS_RE.sub("", text)
+    while True:
+        unwrapped = UNDERSCORE_EMPHASIS_RE.sub(r"\2", LINK_RE.sub(r"\1", text))
+        if unwrapped == text:
+            break
+        text = unwrapped
+    text = _typography(SOFT_BREAK_RE.sub("", html.unescape(text)))
+    return re.sub("[\U000F0000-\U000F007F]", lambda m: chr(ord(m.group(0)) - 0xF0000), text)
+
+
+def heading_title(source: str) -> str:
+    """Concatenated text and inline-code content of a heading, as MyST slugs it."""
+    parts = []
+    position = 0
+    for match in CODE_SPAN_RE.finditer(source):
+        if match.start() > 0 and source[match.start() - 1] == "\\":
+            continue  # an escaped backtick does not open a code span
+        parts.append(_text_content(source[position:match.start()]))
+        if match.group(1) is None:  # a role's content is not text
+            code = match.group(3).replace("\n", " ")
+            if code.startswith(" ") and code.endswith(" ") and code.strip():
+                code = code[1:-1]
+            parts.append(code)
+        position = match.end()
+    parts.append(_text_content(source[position:]))
+    return "".join(parts)
+
+
+def slugify(title: str) -> str:
+    """myst-parser's ``default_slugify``."""
+    return SLUGIFY_CLEAN_RE.sub("", title.lower().replace(" ", "-"))
+
+
+def extract_outline(text: str, anchor_level: int = 0) -> list:
+    """
+    ``[{"line", "level", "text", "anchor", "label"}, ...]`` in document order,
+    with 1-based lines. ``anchor`` is None above ``anchor_level``, ``label``
+    is None without a ``(label)=`` target right before the heading.
+    """
+    lines = text.splitlines()
+    start = 0
+    if lines and lines[0].rstrip() == "---":  # front-matter
+        for index in range(1, len(lines)):
+            if lines[index].rstrip() in ("---", "..."):
+                start = index + 1
+                break
+    headings = []
+    slugs = set()
+
+    def add(number, level, source):
+        anchor = None
+        if level <= anchor_level:
+            anchor = slugify(heading_title(source))
+            suffix = 1
+            while anchor in slugs:
+                anchor = f"{anchor}-{suffix}"
+                suffix += 1
+            slugs.add(anchor)
+        headings.append({"line": number, "level": level, "text": source, "anchor": anchor, "label": label})
+
+    fence = None  # closing marker of the code block being skipped
+    directives = []  # opening markers of the enclosing directives
+    paragraph = []  # (line number, text) of the paragraph being read
+    label = None
+    raw_block = False  # inside an HTML or math block, until a blank line
+    for number, line in enumerate(lines[start:], start + 1):
+        if fence:
+            match = FENCE_RE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+                    and not match.group(2) and not match.group(3):
+                fence = None
+            continue
+        if not line.strip():
+            paragraph, raw_block = [], False
+            continue
+        if raw_block:
+            continue
+        match = FENCE_RE.match(line)
+        if match:
+            marker, directive, argument = match.groups()
+            paragraph, label = [], None
+            if directives and marker[0] == directives[-1][0] and len(marker) >= len(directives[-1]) \
+                    and not directive and not argument:
+                directives.pop()
+            elif (marker[0] != ":" and directive is None) or directive in OPAQUE_DIRECTIVES:
+                fence = marker
+            else:
+                directives.append(marker)  # its content is Markdown
+            continue
+        match = ATX_RE.match(line)
+        if match:
+            add(number, len(match.group(1)), ATX_CLOSING_RE.sub("", match.group(2) or "").strip())
+            paragraph, label = [], None
+            continue
+        match = SETEXT_RE.match(line)
+        if match and paragraph:
+            add(paragraph[0][0], 1 if match.group(1)[0] == "=" else 2,
+                "\n".join(source for _, source in paragraph))
+            paragraph, label = [], None
+            continue
+        if not paragraph:
+            target = TARGET_RE.match(line)
+            if target:
+                label = target.group(1)
+                continue
+            if line.startswith(("    ", "\t")):
+                continue  # indented code
+        if THEMATIC_BREAK_RE.match(line) or BLOCK_START_RE.match(line):
+            paragraph, label = [], None
+            raw_block = line.lstrip().startswith(("<", "$$"))
+            continue
+        paragraph.append((number, line.strip()))
+        label = None
+    return headings
+
+
+class OutlineIndex:
+    def __init__(self, base_dir: str, anchor_level: int = 0, cache=None):
+        self.base_dir = base_dir
+        self.anchor_level = anchor_level
+        self.cache = cache  # SharedCache for parsed outlines, optional
+        self.pages = {}  # page -> {"stat", "digest", "headings"}
+
+    def _store(self, page: str, data: bytes, stat) -> bool:
+        """Record a page's content; returns True if it had to be parsed."""
+        state = self.pages.setdefault(page, {})
+        # Coarse mtimes may hide a write in the same tick: re-read recent files next time
+        state["stat"] = stat if time.time() - stat[0] / 1e9 > RACY_WINDOW else None
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == state.get("digest"):
+            return False
+        key = f"{OUTLINE_VERSION}:{self.anchor_level}:{digest}"
+        headings = self.cache.get("outline", key) if self.cache is not None else None
+        if headings is None:
+            headings = extract_outline(data.decode("utf-8", errors="replace"), self.anchor_level)
+            if self.cache is not None:
+                self.cache.set("outline", key, headings, ttl=CACHE_TTL)
+        state["digest"] = digest
+        state["headings"] = headings
+        return True
+
+    def update(self, page: str, text: str):
+        """Index a page just saved with ``text``."""
+        full_path = os.path.join(self.base_dir, page.replace("/", os.sep))
+        st = os.stat(full_path)
+        self._store(page, text.encode("utf-8"), (st.st_mtime_ns, st.st_size))
+
+    def refresh(self, pages, complete: bool = True) -> dict:
+        """
+        Bring the index up to date for ``pages`` (docs-relative .md paths); returns
+        work counters. With ``complete``, pages not listed are forgotten.
+        """
+        started = time.perf_counter()
+        pages = set(pages)
+        if complete:
+            for page in list(self.pages):
+                if page not in pages:
+                    del self.pages[page]
+        parsed = 0
+        for page in pages:
+            full_path = os.path.join(self.base_dir, page.replace("/", os.sep))
+            try:
+                st = os.stat(full_path)
+                stat = (st.st_mtime_ns, st.st_size)
+                if self.pages.get(page, {}).get("stat") == stat:
+                    continue
+                with open(full_path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                self.pages.pop(page, None)
+                continue
+            parsed += self._store(page, data, stat)
+        return {"pages": len(pages), "parsed": parsed,
+                "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def outlines(self, pages) -> dict:
+        """Headings of the indexed ``pages``, by page."""
+        return {page: self.pages[page]["headings"] for page in sorted(pages) if page in self.pages}
+
+    def search(self, query: str, pages, limit: int = 50) -> list:
+        """
+        Headings of ``pages`` whose text, anchor or label contains ``query``
+        (case-insensitive), those starting with it first, then by page and line.
+        """
+        query = query.lower()
+        found = []
+        for page, headings in self.outlines(pages).items():
+            for heading in headings:
+                fields = [(heading[key] or "").lower() for key in ("text", "anchor", "label")]
+                if any(query in field for field in fields):
+                    rank = 0 if any(field.startswith(query) for field in fields) else 1
+                    found.append((rank, page, heading["line"], {"path": page, **heading}))
+        found.sort(key=lambda item: item[:3])
+        return [item[3] for item in found[:limit]]
@@ -0,0 +1,84 @@
+"""Path validation for everything the editor reads or writes under a docs root.
+
+``normalize_relative_path`` turns client input into a clean relative path
+(forward slashes, no leading ``/``, ``./`` or ``../``, no empty or ``.``
+segments, no traversal) in a single pass over its segments. ``safe_join``
+joins it onto a base directory and checks containment with
+``os.path.commonpath``, which compares whole segments (so a sibling such as
+``docs2`` is not inside ``docs``). Resolved base directories are cached, and
+``validate_paths`` checks a whole list against one base in a single call.
+"""
+import functools
+import os
+
+
+def normalize_relative_path(path: str) -> str:
+    """Normalize and sanitize a relative path."""
+    if "\x00" in path:
+        raise ValueError("Invalid path: NUL byte")
+    parts = []
+    seen_name = False
+    # Convert backslashes → forward slashes, then walk the segments once
+    for part in path.replace("\\", "/").strip().split("/"):
+        if not part or part == ".":
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+            elif seen_name:
+                # Prevent navigating above root
+                raise ValueError("Invalid path: directory traversal detected")
+            # Leading "../" segments are dropped, like leading "/" and "./"
+            continue
+        parts.append(part)
+        seen_name = True
+    normalized = "/".join(parts) or "."
+    if normalized != normalized.strip():
+        # Dropped prefixes exposed outer whitespace ("/ a.md"): strip it as well, so
+        # that normalizing a normalized path never changes it
+        return normalize_relative_path(normalized)
+    return normalized
+
+
+@functools.lru_cache(maxsize=256)
+def resolve_base(base: str) -> str:
+    """Absolute, normalized form of a base directory (cached per distinct base)."""
+    return os.path.abspath(base)
+
+
+def is_within(base_abs: str, path_abs: str) -> bool:
+    """True if ``path_abs`` is ``base_abs`` or inside it (both absolute and normalized)."""
+    try:
+        common = os.path.commonpath([base_abs, path_abs])
+    except ValueError:  # different drives on Windows
+        return False
+    return os.path.normcase(common) == os.path.normcase(base_abs)
+
+
+def safe_join(base: str, *paths) -> str:
+    """Join paths safely to prevent directory traversal."""
+    base_abs = resolve_base(base)
+    parts = [p for p in map(normalize_relative_path, paths) if p != "."]
+    if not parts:
+        return base_abs
+    # A segment such as "C:x" is still absolute on Windows; the containment check catches it
+    final_path = os.path.normpath(os.path.join(base_abs, *parts))
+    if not is_within(base_abs, final_path):
+        raise ValueError("Unsafe path")
+    return final_path
+
+
+def validate_paths(base: str, paths):
+    """
+    Resolve many relative paths against one base.
+    Returns (resolved, errors): ``resolved[i]`` is the absolute path or None,
+    ``errors`` maps the index of each rejected path to the reason.
+    """
+    resolved, errors = [], {}
+    for index, path in enumerate(paths):
+        try:
+            resolved.append(safe_join(base, path))
+        except (ValueError, TypeError, AttributeError) as e:
+            resolved.append(None)
+            errors[index] = str(e)
+    return resolved, errors
@@ -0,0 +1,120 @@
+"""Background warming of the documents a user is likely to open next.
+
+Opening a page costs ``/api/file`` plus ``/get-file-from-git`` for its HEAD
+version, each a cold read the first time. After a page is opened the server
+guesses the next ones and reads them into the caches in a background thread:
+
+- pages opened right after this one before (``AccessStats`` transitions),
+- the nearest sibling pages in the same folder,
+- pages changed in the working tree, then recently opened pages.
+
+``AccessStats`` lives in memory, per process and docs root: with several
+workers each one learns from the requests it serves.
+"""
+import collections
+import queue
+import threading
+
+from docs_roots import use_root, reset_root
+
+DEFAULT_MAX_TRACKED = 1024  # pages with remembered transitions
+DEFAULT_HISTORY = 64  # recently opened pages kept
+DEFAULT_QUEUE_SIZE = 64
+
+
+class AccessStats:
+    """Which pages were opened, and which page followed which."""
+
+    def __init__(self, max_tracked: int = DEFAULT_MAX_TRACKED, history: int = DEFAULT_HISTORY):
+        self.max_tracked = max_tracked
+        self.recent = collections.deque(maxlen=history)  # newest last
+        self._transitions = collections.OrderedDict()  # path -> Counter of the pages opened next
+        self._lock = threading.Lock()
+
+    def record(self, path: str):
+        with self._lock:
+            previous = self.recent[-1] if self.recent else None
+            if previous is not None and previous != path:
+                counts = self._transitions.pop(previous, None) or collections.Counter()
+                counts[path] += 1
+                self._transitions[previous] = counts
+                if len(self._transitions) > self.max_tracked:
+                    self._transitions.popitem(last=False)
+            self.recent.append(path)
+
+    def likely_next(self, path: str, limit: int) -> list:
+        with self._lock:
+            counts = self._transitions.get(path)
+            return [p for p, _ in counts.most_common(limit)] if counts else []
+
+    def recently_opened(self, limit: int) -> list:
+        """Distinct recently opened pages, newest first."""
+        with self._lock:
+            recent = list(self.recent)
+        return list(dict.fromkeys(reversed(recent)))[:limit]
+
+
+def nearest_siblings(entries, path: str, limit: int) -> list:
+    """
+    Files next to ``path`` in its folder, closest first (alternating after and
+    before it). ``entries`` are ``(path, flags)`` pairs as in ``TreeJournal.entries``.
+    """
+    folder = path.rpartition("/")[0]
+    siblings = sorted(p for p, flags in entries if not flags and p.rpartition("/")[0] == folder)
+    if path not in siblings:
+        return siblings[:limit]
+    index = siblings.index(path)
+    result = []
+    for distance in range(1, len(siblings)):
+        for candidate in (index + distance, index - distance):
+            if 0 <= candidate < len(siblings):
+                result.append(siblings[candidate])
+        if len(result) >= limit:
+            break
+    return result[:limit]
+
+
+class Prefetcher:
+    """
+    One daemon thread running ``warm(path)`` for opened pages, with the page's
+    docs root selected. Requests for a page already queued are dropped, and so
+    are requests while the queue is full: prefetching never delays a request.
+    """
+
+    def __init__(self, warm, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.warm = warm
+        self.enabled = True
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, root, path: str) -> bool:
+        if not self.enabled:
+            return False
+        key = (root.name, path)
+        with self._lock:
+            if key in self._pending:
+                return False
+            try:
+                self._queue.put_nowait((root, path))
+            except queue.Full:
+                return False
+            self._pending.add(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+                self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            root, path = self._queue.get()
+            token = use_root(root)
+            try:
+                self.warm(path)
+            except Exception as e:
+                print(f"Warning: prefetch after '{path}' failed: {e}")
+            finally:
+                reset_root(token)
+                with self._lock:
+                    self._pending.discard((root.name, path))
@@ -0,0 +1,208 @@
+"""Opt-in profiling of slow requests.
+
+When enabled, every request is profiled while it runs and the profile is kept
+only if the request took longer than the threshold. Kept profiles go to a
+bounded ring of files (oldest deleted first), tagged with route, method and
+query parameters, and are listed by ``/debug/profiles``.
+
+Two modes:
+
+- ``sample`` (default): a background thread samples the stack of the thread
+  serving the request every few milliseconds and writes folded stacks
+  (``frame;frame;frame count``), the input format of flamegraph tools.
+  Route handlers share the event loop thread, so samples taken while
+  requests overlap can include work from the other requests.
+- ``cprofile``: deterministic ``cProfile`` trace saved as ``.pstats``. Only one
+  request per process is traced at a time.
+
+When disabled the ASGI middleware passes requests straight through.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_THRESHOLD_MS = 1000
+DEFAULT_MAX_PROFILES = 50
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+
+
+class StackSampler:
+    """Samples the stacks of registered threads while at least one is registered."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active = {}  # token -> (thread id, Counter of folded stacks)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def begin(self, thread_id: int):
+        token = object()
+        with self._lock:
+            self._active[token] = (thread_id, Counter())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return token
+
+    def end(self, token) -> Counter:
+        with self._lock:
+            _, samples = self._active.pop(token)
+        return samples
+
+    @staticmethod
+    def _fold(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[self._fold(frame)] += 1
+            time.sleep(self.interval)
+
+
+class SlowRequestProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.mode = "sample"
+        self.threshold_ms = DEFAULT_THRESHOLD_MS
+        self.max_profiles = DEFAULT_MAX_PROFILES
+        self.directory = None
+        self.sampler = StackSampler()
+        self._cprofile_busy = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def configure(self, directory: str, threshold_ms: float = DEFAULT_THRESHOLD_MS,
+                  mode: str = "sample", max_profiles: int = DEFAULT_MAX_PROFILES):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.directory = directory
+        self.threshold_ms = threshold_ms
+        self.mode = mode
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    # -- ring of profile files --
+    def _prune(self):
+        metas = sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+        for meta in metas[:max(0, len(metas) - self.max_profiles)]:
+            stem = meta[:-len(".json")]
+            for name in os.listdir(self.directory):
+                if name.startswith(stem):
+                    os.remove(os.path.join(self.directory, name))
+
+    def save(self, info: dict, write_profile, extension: str):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", info["route"]).strip("_") or "root"
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{slug}-{int(info['duration_ms'])}ms"
+        info["file"] = f"{stem}.{extension}"
+        with self._write_lock:
+            write_profile(os.path.join(self.directory, info["file"]))
+            with open(os.path.join(self.directory, f"{stem}.json"), "w", encoding="utf-8") as f:
+                json.dump(info, f, indent=2)
+            self._prune()
+
+    def list(self) -> list:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+        return profiles
+
+    def path_for(self, name: str):
+        """Absolute path of a stored profile file, or None if ``name`` is not one of ours."""
+        if not self.directory or os.path.basename(name) != name:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: a single attribute check per request while profiling is off."""
+
+    def __init__(self, app, profiler: SlowRequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.enabled or scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            return await self.app(scope, receive, send)
+
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        cprof = None
+        token = None
+        if profiler.mode == "cprofile":
+            if profiler._cprofile_busy.acquire(blocking=False):
+                cprof = cProfile.Profile()
+                cprof.enable()
+        else:
+            token = profiler.sampler.begin(threading.get_ident())
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            samples = None
+            if cprof is not None:
+                cprof.disable()
+                profiler._cprofile_busy.release()
+            elif token is not None:
+                samples = profiler.sampler.end(token)
+            if duration_ms >= profiler.threshold_ms and (cprof is not None or samples):
+                route = scope.get("route")
+                info = {
+                    "route": getattr(route, "path", None) or scope["path"],
+                    "path": scope["path"],
+                    "method": scope["method"],
+                    "params": scope.get("query_string", b"").decode("latin-1"),
+                    "path_params": scope.get("path_params", {}),
+                    "status": status.get("code"),
+                    "duration_ms": round(duration_ms, 1),
+                    "mode": profiler.mode,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                if cprof is not None:
+                    profiler.save(info, cprof.dump_stats, "pstats")
+                else:
+                    def write_folded(path):
+                        with open(path, "w", encoding="utf-8") as f:
+                            for stack, count in samples.most_common():
+                                f.write(f"{stack} {count}\n")
+                    info["samples"] = sum(samples.values())
+                    profiler.save(info, write_folded, "folded")
+
+
+profiler = SlowRequestProfiler()
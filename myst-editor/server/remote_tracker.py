@@ -0,0 +1,135 @@
+"""Background tracking of the remote branch of each docs root.
+
+A daemon thread fetches ``origin`` for every open docs root on an interval and
+records when that happened in the root's shared cache, so with several workers
+only one of them fetches per interval. Ahead/behind counts of the active branch
+are computed locally from the remote-tracking ref (``git rev-list --count``)
+and cached per (local, remote) commit pair.
+
+Routes read this state instead of fetching: ``status()`` never touches the
+network, and ``ensure_fresh()`` fetches only when the last fetch is older than
+the caller's bound.
+"""
+import threading
+import time
+
+DEFAULT_FETCH_INTERVAL = 60.0  # seconds between background fetches
+FETCH_NAMESPACE = "refs/myst-editor/fetch"  # private refs the network part of a fetch writes to
+STATE_TTL = 7 * 24 * 3600  # the fetch record only needs to outlive the interval
+
+
+class RemoteTracker:
+    def __init__(self, interval: float = DEFAULT_FETCH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- state --
+    @staticmethod
+    def last_fetch(root) -> dict:
+        return root.shared_cache().get("remote", "fetch", default=None) or {"at": None, "error": None}
+
+    @staticmethod
+    def record_fetch(root, error: str = None):
+        """Note a fetch of ``origin`` (also call after a pull, which fetches too)."""
+        previous = RemoteTracker.last_fetch(root)
+        record = {"at": time.time() if error is None else previous["at"], "error": error}
+        root.shared_cache().set("remote", "fetch", record, ttl=STATE_TTL)
+
+    @staticmethod
+    def ahead_behind(root, repo, branch: str):
+        """``(ahead, behind)`` of ``branch`` against ``origin/<branch>``, or None without a remote branch."""
+        remote_ref = f"origin/{branch}"
+        if remote_ref not in repo.refs:
+            return None
+        local_sha = repo.commit(branch).hexsha
+        remote_sha = repo.commit(remote_ref).hexsha
+        key = f"{local_sha}...{remote_sha}"
+        cache = root.shared_cache()
+        counts = cache.get("ahead_behind", key)
+        if counts is None:
+            counts = [int(n) for n in repo.git.rev_list("--left-right", "--count", key).split()]
+            cache.set("ahead_behind", key, counts, ttl=STATE_TTL)
+        return tuple(counts)
+
+    def status(self, root) -> dict:
+        """Branch, ahead/behind counts and fetch age from cached state; never fetches."""
+        repo = root.repo()
+        fetch = self.last_fetch(root)
+        state = {
+            "fetched_at": fetch["at"],
+            "age_seconds": round(time.time() - fetch["at"], 1) if fetch["at"] else None,
+            "fetch_error": fetch["error"],
+            "fetch_interval": self.interval,
+        }
+        if repo.head.is_detached:
+            return {**state, "branch": None, "detached": True, "ahead": None, "behind": None}
+        branch = repo.active_branch.name
+        counts = self.ahead_behind(root, repo, branch)
+        ahead, behind = counts if counts else (None, None)
+        return {**state, "branch": branch, "detached": False, "ahead": ahead, "behind": behind,
+                "has_remote_branch": counts is not None}
+
+    # -- fetching --
+    def fetch(self, root, wait: bool = True) -> bool:
+        """
+        Fetch ``origin``. The network transfer only writes private refs and runs
+        without the root's git write lock; the remote-tracking refs are then
+        updated from them locally, under the lock. With ``wait=False`` that
+        update is skipped (returns False) while another git write holds the lock.
+        """
+        repo = root.repo()
+        try:
+            # An empty --refmap keeps git from updating origin/* opportunistically
+            repo.git.fetch("--prune", "--no-write-fetch-head", "--refmap=", "origin",
+                           f"+refs/heads/*:{FETCH_NAMESPACE}/*")
+        except Exception as e:
+            self.record_fetch(root, error=str(e))
+            raise
+        lock = root.write_lock()
+        try:
+            lock.acquire(timeout=None if wait else 0)
+        except TimeoutError:
+            return False
+        try:
+            repo.git.fetch("--no-write-fetch-head", ".",
+                           f"+{FETCH_NAMESPACE}/*:refs/remotes/origin/*")
+        finally:
+            lock.release()
+        self.record_fetch(root)
+        return True
+
+    def ensure_fresh(self, root, max_age: float) -> dict:
+        """Fetch if the last fetch is older than ``max_age`` seconds, then return ``status()``."""
+        fetched_at = self.last_fetch(root)["at"]
+        if fetched_at is None or time.time() - fetched_at > max_age:
+            self.fetch(root)
+        return self.status(root)
+
+    # -- background thread --
+    def start(self, registry):
+        """Fetch every open root whose last fetch (by any worker) is older than the interval."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                for root in list(registry.roots.values()):
+                    if not root.is_open():
+                        continue  # not opened yet, or closed as idle
+                    try:
+                        if not root.repo().remotes:
+                            continue
+                        fetched_at = self.last_fetch(root)["at"]
+                        if fetched_at is None or time.time() - fetched_at >= self.interval * 0.9:
+                            self.fetch(root, wait=False)
+                    except Exception as e:
+                        print(f"Warning: background fetch for docs root '{root.name}' failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="remote-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
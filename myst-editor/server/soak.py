@@ -0,0 +1,401 @@
+"""Concurrent-load soak test for the save and git routes.
+
+Runs simulated editors against a throwaway repository with a local bare
+remote, all on this machine::
+
+    python soak.py --editors 8 --ops 200 --workers 2
+    python soak.py --keep /tmp/soak  # keep the repositories for inspection
+
+Each editor owns a folder of pages and images and randomly interleaves saves,
+read-backs, new pages, renames, uploads (into its own folder and into one
+folder shared by all editors), commits and syncs, keeping a model of what its
+files must contain. A peer clone pushes unrelated commits to the remote
+meanwhile, so commits and syncs meet a moving remote.
+
+Afterwards everything is committed and synced once more and checked:
+
+- every page and image holds the last content its editor wrote (lost writes),
+  renamed-away paths are gone, shared-folder uploads never share a name;
+- the working tree is clean, HEAD contains exactly the model's content, no
+  index.lock, stash entry or rebase is left behind, ``git fsck`` passes;
+- the remote branch equals HEAD and contains every peer commit.
+
+Throughput, latency and outcome counts per operation are printed and saved
+as JSON in ``bench_results/``. Responses are counted as ``ok``, ``rejected``
+(an expected 409 such as REMOTE_AHEAD while the peer is ahead), ``busy``
+(503 GIT_BUSY) or ``error``. The exit status is 1 on integrity failures or
+errors.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+from benchmark import DOCS_DIR, RESULTS_DIR, generate_repo, start_server
+
+BRANCH = "main"
+OPERATIONS = {  # operation -> weight
+    "save": 35, "read": 15, "create": 10, "rename": 10,
+    "upload": 10, "upload_shared": 5, "commit": 8, "sync": 7,
+}
+SHARED_FOLDER = "_static/soak/shared"
+FINAL_ATTEMPTS = 20  # retries of the final commit/sync while the git lock is busy
+REQUEST_TIMEOUT = 60  # seconds; a request not answered by then counts as an error (status 0)
+
+
+# ---------------------- HTTP ----------------------
+def call(url, method="GET", body=None, files=None, fields=None):
+    """
+    ``(status, parsed JSON or text)``; never raises for HTTP error statuses.
+    Connection failures and timeouts give status 0 and the error message.
+    """
+    headers = {}
+    data = None
+    if files is not None:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in (fields or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, payload) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f"Content-Type: application/octet-stream\r\n\r\n".encode() + payload + b"\r\n")
+        data = b"".join(parts) + f"--{boundary}--\r\n".encode()
+        headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+    elif body is not None:
+        data = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as resp:
+            status, raw = resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    except (urllib.error.URLError, OSError) as e:  # includes timeouts
+        return 0, str(getattr(e, "reason", e))
+    try:
+        return status, json.loads(raw)
+    except ValueError:
+        return status, raw.decode("utf-8", "replace")
+
+
+def git(repo, *args, check=True):
+    return subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True, check=check).stdout.strip()
+
+
+# ---------------------- REPOSITORIES ----------------------
+def prepare_repos(workdir, docs):
+    """Generate the served repo, a bare remote it tracks and a peer clone; returns their paths."""
+    repo, remote, peer = (os.path.join(workdir, name) for name in ("repo", "remote.git", "peer"))
+    generate_repo(repo, docs=docs, depth=2, images=10, commits=3, branches=0)
+    subprocess.run(["git", "clone", "-q", "--bare", repo, remote], check=True)
+    git(repo, "remote", "add", "origin", remote)
+    git(repo, "fetch", "-q", "origin")
+    git(repo, "branch", "-q", "--set-upstream-to", f"origin/{BRANCH}")
+    subprocess.run(["git", "clone", "-q", remote, peer], check=True)
+    for path in (repo, peer):
+        git(path, "config", "user.name", "Soak")
+        git(path, "config", "user.email", "soak@example.com")
+    return repo, remote, peer
+
+
+class Peer(threading.Thread):
+    """Someone else pushing to the remote: commits outside the editors' folders every ``interval`` seconds."""
+
+    def __init__(self, path, interval):
+        super().__init__(name="soak-peer", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.commits = []
+        self.failures = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        n = 0
+        while not self.stop.wait(self.interval):
+            n += 1
+            try:
+                git(self.path, "pull", "-q", "--rebase", "origin", BRANCH)
+                target = os.path.join(self.path, DOCS_DIR, "peer", f"note_{n % 5}.md")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "w", encoding="utf-8") as f:
+                    f.write(f"# Peer note {n}\n")
+                git(self.path, "add", "-A")
+                git(self.path, "commit", "-q", "-m", f"Peer commit {n}")
+                git(self.path, "push", "-q", "origin", BRANCH)
+                self.commits.append(git(self.path, "rev-parse", "HEAD"))
+            except subprocess.CalledProcessError:
+                self.failures += 1  # lost a push race; retried at the next tick
+
+
+# ---------------------- EDITORS ----------------------
+class Stats:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(list)  # op -> sample of error responses
+        self._lock = threading.Lock()
+
+    def record(self, op, started, outcome, detail=None):
+        with self._lock:
+            self.latency[op].append(time.perf_counter() - started)
+            self.outcomes[op][outcome] += 1
+            if outcome == "error" and len(self.errors[op]) < 5:
+                self.errors[op].append(detail)
+
+    def report(self, wall) -> dict:
+        result = {}
+        for op in sorted(self.latency):
+            times = sorted(self.latency[op])
+            result[op] = {
+                **self.outcomes[op],
+                "p50_ms": round(times[len(times) // 2] * 1000, 2),
+                "p99_ms": round(times[min(len(times) - 1, int(0.99 * len(times)))] * 1000, 2),
+                "mean_ms": round(statistics.fmean(times) * 1000, 2),
+                "errors_sample": self.errors.get(op, []),
+            }
+        total = sum(len(t) for t in self.latency.values())
+        errors = sum(o.get("error", 0) for o in self.outcomes.values())
+        return {"operations": total, "ops_per_second": round(total / wall, 1) if wall else None,
+                "error_rate": round(errors / total, 4) if total else 0.0, "by_operation": result}
+
+
+def classify(status, body):
+    if status == 200 and not (isinstance(body, dict) and body.get("error")):
+        return "ok"
+    if status == 503:
+        return "busy"
+    if status == 409 and isinstance(body, dict) and body.get("error") in (
+            "REMOTE_AHEAD", "DIVERGED", "NON_FAST_FORWARD"):
+        return "rejected"
+    return "error"
+
+
+class Editor(threading.Thread):
+    def __init__(self, index, url, ops, seed, stats):
+        super().__init__(name=f"soak-editor-{index}", daemon=True)
+        self.url = url
+        self.ops = ops
+        self.rng = random.Random(seed * 7919 + index)
+        self.stats = stats
+        self.folder = f"soak/editor_{index}"
+        self.image_folder = f"_static/soak/editor_{index}"
+        self.pages = {}  # docs-relative path -> content this editor last wrote
+        self.images = {}  # docs-relative path -> sha256 of the uploaded bytes
+        self.gone = set()  # paths renamed away
+        self.shared_uploads = {}  # path returned for an upload to the shared folder -> sha256
+        self.counter = 0
+
+    def _content(self):
+        self.counter += 1
+        return f"# {self.name} edit {self.counter}\n\n{uuid.uuid4().hex}\n" * self.rng.randint(1, 20)
+
+    def _upload(self, folder, name):
+        payload = os.urandom(self.rng.randint(256, 8192))
+        status, body = call(f"{self.url}/api/upload_image", "POST", files={"file": (name, payload)},
+                            fields={"path": folder, "action": "increment"})
+        return status, body, hashlib.sha256(payload).hexdigest()
+
+    def step(self, op):
+        started = time.perf_counter()
+        quote = urllib.parse.quote
+        if op == "create" or (op in ("save", "read", "rename") and not self.pages):
+            op = "create"
+            path, content = f"{self.folder}/page_{self.counter}_{self.rng.randrange(10**6)}.md", self._content()
+            status, body = call(f"{self.url}/api/file?path={quote(path)}", "POST", {"content": content})
+            if status == 200:
+                self.pages[path] = content
+                self.gone.discard(path)
+        elif op == "save":
+            path, content = self.rng.choice(sorted(self.pages)), self._content()
+            status, body = call(f"{self.url}/api/file?path={quote(path)}", "POST", {"content": content})
+            if status == 200:
+                self.pages[path] = content
+        elif op == "read":
+            path = self.rng.choice(sorted(self.pages))
+            status, body = call(f"{self.url}/api/file?path={quote(path)}")
+            if status == 200 and body.get("content") != self.pages[path]:
+                status, body = 599, {"error": f"read-back mismatch for {path}"}
+        elif op == "rename":
+            old = self.rng.choice(sorted(self.pages))
+            status, body = call(f"{self.url}/api/rename", "POST", {
+                "oldPath": old, "newPath": f"{self.folder}/renamed_{self.counter}.md", "action": "increment"})
+            self.counter += 1
+            if status == 200 and body.get("status") == "saved":
+                self.pages[body["newPath"]] = self.pages.pop(old)
+                self.gone.add(old)
+        elif op in ("upload", "upload_shared"):
+            folder = self.image_folder if op == "upload" else SHARED_FOLDER
+            status, body, digest = self._upload(folder, "shot.png" if op == "upload_shared" else f"img_{self.counter}.png")
+            self.counter += 1
+            if status == 200 and body.get("status") == "saved":
+                (self.images if op == "upload" else self.shared_uploads)[body["newPath"]] = digest
+        elif op == "commit":
+            status, body = call(f"{self.url}/api/git-commit-all", "POST", {"message": f"{self.name} commit"})
+        else:
+            status, body = call(f"{self.url}/api/git-sync", "POST", {})
+        self.stats.record(op, started, classify(status, body), {"status": status, "body": body})
+
+    def run(self):
+        names, weights = zip(*OPERATIONS.items())
+        for _ in range(self.ops):
+            self.step(self.rng.choices(names, weights)[0])
+
+
+# ---------------------- VERIFICATION ----------------------
+def finish(url):
+    """Commit and sync everything left; returns the error of the last attempt or None."""
+    for route in ("/api/git-commit-all", "/api/git-sync"):
+        for _ in range(FINAL_ATTEMPTS):
+            status, body = call(url + route, "POST", {"message": "Soak final commit"})
+            if status == 200:
+                break
+            if status == 409 and route.endswith("commit-all"):
+                break  # behind the peer: the sync below pulls first
+            time.sleep(0.5)
+        else:
+            return f"{route}: {status} {body}"
+    return None
+
+
+def verify(repo, remote, editors, peer) -> list:
+    failures = []
+    docs = os.path.join(repo, DOCS_DIR)
+
+    def disk(path):
+        try:
+            with open(os.path.join(docs, path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def head(path):
+        result = subprocess.run(["git", "show", f"HEAD:{DOCS_DIR}/{path}"], cwd=repo, capture_output=True)
+        return result.stdout if result.returncode == 0 else None
+
+    shared_names = []
+    for editor in editors:
+        for path, content in editor.pages.items():
+            data = disk(path)
+            if data is None:
+                failures.append(f"missing page {path}")
+            elif data.decode("utf-8").replace("\r\n", "\n") != content:
+                failures.append(f"lost write in {path}")
+            elif head(path) != data:
+                failures.append(f"HEAD differs from working tree for {path}")
+        for path in editor.gone - set(editor.pages):
+            if disk(path) is not None:
+                failures.append(f"renamed-away page still present: {path}")
+        for path, digest in {**editor.images, **editor.shared_uploads}.items():
+            data = disk(path)
+            if data is None or hashlib.sha256(data).hexdigest() != digest:
+                failures.append(f"image {path} lost or overwritten")
+        shared_names += list(editor.shared_uploads)
+    if len(shared_names) != len(set(shared_names)):
+        failures.append("two uploads to the shared folder were given the same name")
+
+    status = git(repo, "status", "--porcelain", "--", DOCS_DIR)
+    if status:
+        failures.append(f"working tree not clean after the final commit: {status.splitlines()[:5]}")
+    git_dir = os.path.join(repo, ".git")
+    for leftover in ("index.lock", "rebase-merge", "rebase-apply", "MERGE_HEAD"):
+        if os.path.exists(os.path.join(git_dir, leftover)):
+            failures.append(f"leftover .git/{leftover}")
+    if git(repo, "stash", "list"):
+        failures.append("stash entries left behind")
+    fsck = subprocess.run(["git", "fsck", "--no-dangling"], cwd=repo, capture_output=True, text=True)
+    if fsck.returncode != 0:
+        failures.append(f"git fsck failed: {fsck.stderr.strip()[:500]}")
+    local_head = git(repo, "rev-parse", "HEAD")
+    remote_head = git(remote, "rev-parse", BRANCH)
+    if local_head != remote_head:
+        failures.append(f"remote {remote_head[:12]} != HEAD {local_head[:12]}")
+    for sha in peer.commits:
+        if subprocess.run(["git", "merge-base", "--is-ancestor", sha, "HEAD"], cwd=repo).returncode != 0:
+            failures.append(f"peer commit {sha[:12]} missing from HEAD")
+    return failures
+
+
+# ---------------------- MAIN ----------------------
+def run_soak(editors=8, ops=200, workers=1, docs=200, peer_interval=2.0, fetch_interval=5.0,
+             seed=1, keep=None, results_dir=RESULTS_DIR):
+    workdir = keep or tempfile.mkdtemp(prefix="myst-soak-")
+    os.makedirs(workdir, exist_ok=True)
+    repo, remote, peer_path = prepare_repos(workdir, docs)
+    proc, url = start_server(repo, workers, ["--fetch-interval", str(fetch_interval)])
+    stats = Stats()
+    peer = Peer(peer_path, peer_interval)
+    try:
+        if peer_interval > 0:
+            peer.start()
+        clients = [Editor(i, url, ops, seed, stats) for i in range(editors)]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        wall = time.perf_counter() - started
+        peer.stop.set()
+        if peer.is_alive():
+            peer.join()
+        final_error = finish(url)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    report = stats.report(wall)
+    failures = ([f"final commit/sync failed: {final_error}"] if final_error else []) + \
+        verify(repo, remote, clients, peer)
+    report.update({"editors": editors, "ops_per_editor": ops, "workers": workers,
+                   "peer_commits": len(peer.commits), "seconds": round(wall, 2), "integrity_failures": failures})
+
+    print(f"{report['operations']} operations in {wall:.1f} s ({report['ops_per_second']} ops/s), "
+          f"error rate {report['error_rate']:.2%}, {len(peer.commits)} peer commits")
+    for op, r in report["by_operation"].items():
+        outcomes = " ".join(f"{k}={r[k]}" for k in ("ok", "rejected", "busy", "error") if k in r)
+        print(f"{op:14s} p50={r['p50_ms']}ms p99={r['p99_ms']}ms {outcomes}")
+        for sample in r["errors_sample"][:2]:
+            print(f"    {str(sample)[:200]}")
+    print("Integrity: OK" if not failures else "Integrity failures:\n  " + "\n  ".join(failures))
+
+    os.makedirs(results_dir, exist_ok=True)
+    out = os.path.join(results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-soak.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Saved results to {out}")
+    if keep is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--editors", type=int, default=8, help="simulated editors running at once")
+    parser.add_argument("--ops", type=int, default=200, help="operations per editor")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--docs", type=int, default=200, help="pages in the generated repository")
+    parser.add_argument("--peer-interval", type=float, default=2.0, help="seconds between peer pushes (0 disables)")
+    parser.add_argument("--fetch-interval", type=float, default=5.0, help="server background fetch interval")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", default=None, metavar="DIR", help="work in DIR and keep it afterwards")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+    report = run_soak(args.editors, args.ops, args.workers, args.docs, args.peer_interval,
+                      args.fetch_interval, args.seed, args.keep, args.results_dir)
+    errors = sum(r.get("error", 0) for r in report["by_operation"].values())
+    raise SystemExit(1 if report["integrity_failures"] or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
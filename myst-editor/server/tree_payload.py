@@ -0,0 +1,137 @@
+"""Compact encoding of the docs file tree and versioned tree deltas.
+
+``scan_dir`` returns nested ``{"type", "name", "path", "children"}`` dicts in
+which every node repeats its full relative path. The compact form is a flat
+array instead::
+
+    {
+        "format": "compact",
+        "version": "<epoch>.<n>",
+        "segments": ["guide", "intro.md", ...],  # interned names
+        "nodes": [parent, segment, flags, parent, segment, flags, ...],
+    }
+
+Node ``i`` occupies ``nodes[3*i:3*i+3]``. ``parent`` is the index of the parent
+node (-1 at the top level and always lower than ``i``), ``segment`` indexes
+``segments`` and ``flags`` is a bitfield (``FOLDER``). Paths are rebuilt by
+joining the segments along the parent chain.
+
+``TreeJournal`` remembers which paths were added or removed between versions,
+so a client holding version N can ask for only the changes since N. Versions
+are ``<epoch>.<n>``: the epoch is unique per journal (per process), so a
+client that hits another worker or a restarted server gets a full reset.
+"""
+import collections
+import os
+import threading
+import time
+
+FOLDER = 1  # flags bit: node is a folder
+
+DEFAULT_JOURNAL_LENGTH = 256  # versions kept for delta requests
+
+
+def flatten(tree, out=None):
+    """``(path, flags)`` for every node of a ``scan_dir`` tree, parents before children."""
+    if out is None:
+        out = []
+    for node in tree:
+        is_folder = node["type"] == "folder"
+        out.append((node["path"], FOLDER if is_folder else 0))
+        if is_folder:
+            flatten(node.get("children", []), out)
+    return out
+
+
+def encode_compact(entries) -> dict:
+    """Compact payload for ``(path, flags)`` pairs listed parents first (see ``flatten``)."""
+    segments, segment_ids = [], {}
+    nodes, node_ids = [], {}
+    for path, flags in entries:
+        parent_path, _, name = path.rpartition("/")
+        segment = segment_ids.get(name)
+        if segment is None:
+            segment = segment_ids[name] = len(segments)
+            segments.append(name)
+        node_ids[path] = len(node_ids)
+        nodes += (node_ids.get(parent_path, -1), segment, flags)
+    return {"format": "compact", "segments": segments, "nodes": nodes}
+
+
+def decode_compact(payload) -> list:
+    """Rebuild the nested ``scan_dir`` structure from a compact payload."""
+    segments, nodes = payload["segments"], payload["nodes"]
+    roots, built = [], []
+    for i in range(0, len(nodes), 3):
+        parent, segment, flags = nodes[i:i + 3]
+        name = segments[segment]
+        siblings = roots if parent < 0 else built[parent]["children"]
+        path = name if parent < 0 else f"{built[parent]['path']}/{name}"
+        node = {"type": "folder" if flags & FOLDER else "file", "name": name, "path": path}
+        if flags & FOLDER:
+            node["children"] = []
+        siblings.append(node)
+        built.append(node)
+    return roots
+
+
+class TreeJournal:
+    """Versions of one docs tree and the paths added/removed between them."""
+
+    def __init__(self, max_length: int = DEFAULT_JOURNAL_LENGTH):
+        self.epoch = f"{os.getpid():x}{int(time.time() * 1000) % 0xFFFFFF:x}"
+        self.version = 0
+        self.entries = []  # (path, flags) of the latest snapshot, parents first
+        self.scanned_at = 0.0  # time.monotonic() of the latest update
+        self.scanned_generation = None
+        self._snapshot = {}  # path -> flags
+        self._log = collections.deque(maxlen=max_length)  # (version, added, removed)
+        self._lock = threading.Lock()
+
+    def token(self, version: int = None) -> str:
+        return f"{self.epoch}.{self.version if version is None else version}"
+
+    def update(self, entries, generation=None) -> str:
+        """Record a new snapshot; bumps the version only if something changed."""
+        snapshot = dict(entries)
+        with self._lock:
+            added = [[path, flags] for path, flags in entries if self._snapshot.get(path) != flags]
+            removed = [path for path in self._snapshot if path not in snapshot]
+            if added or removed or not self.version:
+                self.version += 1
+                self._log.append((self.version, added, removed))
+            self._snapshot = snapshot
+            self.entries = entries
+            self.scanned_at = time.monotonic()
+            self.scanned_generation = generation
+            return self.token()
+
+    def changes_since(self, token: str):
+        """
+        Net changes between ``token`` and the current version as
+        ``{"added": [[path, flags], ...], "removed": [path, ...]}``.
+        Returns None when the token is from another epoch or too old to replay.
+        """
+        epoch, _, number = (token or "").rpartition(".")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        since = int(number)
+        with self._lock:
+            if since > self.version:
+                return None
+            log = [item for item in self._log if item[0] > since]
+            if since < self.version and (not log or log[0][0] != since + 1):
+                return None  # the journal no longer covers this version
+            added, removed = {}, set()
+            for _, step_added, step_removed in log:
+                for path in step_removed:
+                    added.pop(path, None)
+                    removed.add(path)
+                for path, flags in step_added:
+                    removed.discard(path)
+                    added[path] = flags
+        # Parents before children, so clients can insert in order
+        return {
+            "added": sorted(([path, flags] for path, flags in added.items()), key=lambda a: a[0].count("/")),
+            "removed": sorted(removed),
+        }
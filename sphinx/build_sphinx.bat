@@ -5,7 +5,18 @@ cd /d "%~dp0"
 REM Activate the virtual environment
 call sphinx_venv\Scripts\activate.bat
 
-sphinx-build -b html -c ./source ../docs ../pfx_docs_build
+REM Large uploads kept in the editor's object store are restored into a copy, never into ../docs
+REM Set MYST_EDITOR_OBJECT_STORE to the shared store (a folder or an http(s) URL serving it)
+set DOCS_SRC=../docs
+set OBJECT_STORE=%MYST_EDITOR_OBJECT_STORE%
+IF "%OBJECT_STORE%"=="" IF EXIST ..\.git\lfs\objects set OBJECT_STORE=../.git/lfs/objects
+IF NOT "%OBJECT_STORE%"=="" (
+    python ../myst-editor/server/object_store.py materialize ../docs --store "%OBJECT_STORE%" --out ../pfx_docs_src
+    IF ERRORLEVEL 1 exit /b 1
+    set DOCS_SRC=../pfx_docs_src
+)
+
+sphinx-build -b html -c ./source %DOCS_SRC% ../pfx_docs_build
 
 IF %ERRORLEVEL% NEQ 0 (
     echo Build error.
@@ -10,7 +10,6 @@ import os  # Importing OS module for path manipulations
 import sys  # Importing sys to manipulate the Python path
 import re 
 from datetime import date
-import json
 
 sys.path.insert(0, os.path.abspath('../docs'))  # Adds the project root to sys.path
 
@@ -74,18 +73,13 @@ myst_enable_extensions = [  # Additional MyST extensions
 ]
 myst_heading_anchors = 4  # Numbered anchors for Markdown headings
 
-# Define path to substitutions file
-subs_path = os.path.join(os.path.dirname(__file__), '_substitutions.json')  # or .json
+# Substitutions and external links are shared with the editor server through docs_config
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import docs_config  # noqa: E402
 
-# Load the JSON content into myst_substitutions
-with open(subs_path, encoding='utf-8') as f:
-    myst_substitutions = json.load(f)
-
-ext_path = os.path.join(os.path.dirname(__file__), '_external_links.json')
-
-with open(ext_path, encoding='utf-8') as f:
-    data = json.load(f)
-    extlinks = {key: tuple(value) for key, value in data.items()}
+_docs_config = docs_config.get_config()
+myst_substitutions = _docs_config.substitutions()  # _substitutions.json
+extlinks = _docs_config.extlinks()  # _external_links.json
 
 # ------------ HTML settings --------------#
 html_theme = 'furo'  # HTML theme to use for the docs
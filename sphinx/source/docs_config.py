@@ -0,0 +1,181 @@
+"""Shared loader for the Sphinx substitution and external-link files.
+
+Both ``conf.py`` and the editor server (``myst-editor/server/app.py``) read
+``_substitutions.json`` and ``_external_links.json`` through this module, so
+the files are parsed and validated in one place and only re-read when they
+actually change on disk.
+"""
+import hashlib
+import json
+import os
+import threading
+
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+SUBSTITUTIONS_FILE = "_substitutions.json"
+EXTERNAL_LINKS_FILE = "_external_links.json"
+
+
+class ConfigError(ValueError):
+    """Raised when a config file cannot be parsed or fails validation."""
+
+
+# ---------------------- VALIDATORS ----------------------
+def validate_substitutions(data):
+    """MyST substitutions: a flat mapping of identifier -> JSON value."""
+    if not isinstance(data, dict):
+        raise ConfigError("substitutions must be a JSON object")
+    for key in data:
+        if not key.isidentifier():
+            raise ConfigError(f"substitution key {key!r} is not a valid identifier")
+    return data
+
+
+def validate_external_links(data):
+    """Sphinx extlinks: name -> [url pattern with one %s, caption or null]."""
+    if not isinstance(data, dict):
+        raise ConfigError("external links must be a JSON object")
+    for key, value in data.items():
+        if not isinstance(value, list) or len(value) != 2:
+            raise ConfigError(f"external link {key!r} must be a [url, caption] pair")
+        url, caption = value
+        if not isinstance(url, str) or url.count("%s") != 1:
+            raise ConfigError(f"external link {key!r} url must contain exactly one '%s'")
+        if caption is not None and (not isinstance(caption, str) or caption.count("%s") != 1):
+            raise ConfigError(f"external link {key!r} caption must be null or contain exactly one '%s'")
+    return data
+
+
+# ---------------------- CACHED FILE ----------------------
+class ConfigFile:
+    """A JSON file parsed once and re-parsed only when its stat signature changes.
+
+    If the file becomes invalid the last good value is kept and the problem is
+    reported through ``error``.
+    """
+
+    def __init__(self, path, validator):
+        self.path = path
+        self.validator = validator
+        self.data = None
+        self.etag = None
+        self.error = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reload the file if it changed. Returns True when the value changed."""
+        signature = self._stat_signature()
+        if signature == self._signature and self.data is not None:
+            return False
+        with self._lock:
+            if signature == self._signature and self.data is not None:
+                return False
+            if signature is None:
+                self.error = f"{os.path.basename(self.path)} not found"
+                self._signature = None
+                return False
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            etag = hashlib.sha1(raw).hexdigest()
+            self._signature = signature
+            if etag == self.etag:
+                self.error = None
+                return False
+            try:
+                data = self.validator(json.loads(raw.decode("utf-8")))
+            except (ValueError, UnicodeDecodeError) as e:
+                self.error = f"{os.path.basename(self.path)}: {e}"
+                return False
+            self.data, self.etag, self.error = data, etag, None
+            return True
+
+    def get(self):
+        self.refresh()
+        if self.data is None:
+            raise ConfigError(self.error or f"{self.path} could not be loaded")
+        return self.data
+
+
+# ---------------------- DOCS CONFIG ----------------------
+class DocsConfig:
+    def __init__(self, config_dir=CONFIG_DIR):
+        self.config_dir = config_dir
+        self.substitutions_file = ConfigFile(
+            os.path.join(config_dir, SUBSTITUTIONS_FILE), validate_substitutions)
+        self.external_links_file = ConfigFile(
+            os.path.join(config_dir, EXTERNAL_LINKS_FILE), validate_external_links)
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def substitutions(self):
+        return self.substitutions_file.get()
+
+    def external_links(self):
+        return self.external_links_file.get()
+
+    def extlinks(self):
+        """External links in the tuple form Sphinx expects for ``extlinks``."""
+        return {key: tuple(value) for key, value in self.external_links().items()}
+
+    def refresh(self):
+        changed_subs = self.substitutions_file.refresh()
+        changed_links = self.external_links_file.refresh()
+        return changed_subs or changed_links
+
+    def etag(self):
+        """Combined ETag for both files (quoted, as sent in HTTP headers)."""
+        return '"{}-{}"'.format(self.substitutions_file.etag, self.external_links_file.etag)
+
+    def errors(self):
+        return [e for e in (self.substitutions_file.error, self.external_links_file.error) if e]
+
+    def snapshot(self):
+        """Current values as one dict. Uses the cached state, no disk access."""
+        return {
+            "substitutions": self.substitutions_file.data or {},
+            "external_links": self.external_links_file.data or {},
+            "errors": self.errors(),
+        }
+
+    # -- background watcher --
+    def start_watcher(self, interval=2.0):
+        """Poll both files for changes in a daemon thread."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh():
+                        print(f"Reloaded docs config from {self.config_dir}")
+                except OSError as e:
+                    print(f"Warning: could not reload docs config: {e}")
+
+        self._watcher = threading.Thread(target=run, name="docs-config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        self._watcher = None
+
+
+_configs = {}
+_configs_lock = threading.Lock()
+
+
+def get_config(config_dir=CONFIG_DIR):
+    """Return the process-wide DocsConfig for ``config_dir``."""
+    config_dir = os.path.abspath(config_dir)
+    with _configs_lock:
+        config = _configs.get(config_dir)
+        if config is None:
+            config = _configs[config_dir] = DocsConfig(config_dir)
+        return config